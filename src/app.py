@@ -1,15 +1,33 @@
 from ttkbootstrap import Window
 from ui.login import LoginFrame
 from ui.main_app_frame import MainAppFrame
-from db import Base, engine
+from db import Base, engine, create_read_schema
+from utils import metrics, timestamps
+from utils.lifecycle import scheduler
+from scanner import capture
+from scanner.ingest_client import client_from_env, start_stats_reporter
 import models
 
 def main():
     print("Checking & creating tables if needed...")
     Base.metadata.create_all(engine)
+    create_read_schema()
+    timestamps.ensure_columns(engine)
+    # old rows get their full timestamps in the background; see utils/timestamps.py
+    timestamps.backfill_in_background(engine)
     print("Database Ready!")
+    # closes sessions past their end time (catching up on any missed while the app was off)
+    scheduler.start()
+    # open the camera now so the kiosk does not wait for it when a session starts
+    capture.manager.start()
 
     app = Window(title="Haajar Lab Registry", themename="superhero", size=(1024, 720))
+    metrics.start_from_env()
+    metrics.watch_event_loop(app)
+    ingest = client_from_env()
+    if ingest:
+        # lets admin dashboards on other machines see this kiosk
+        start_stats_reporter(ingest)
 
     def redirect_to_home(user):
         login_frame.pack_forget()
@@ -20,6 +38,7 @@ def main():
     login_frame.pack(fill="both", expand=True)
 
     app.mainloop()
+    capture.manager.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,255 @@
+"""
+Synthetic dataset generator for scale testing.
+
+    python -m bench.dataset --db-url sqlite:///bench.db --users 2 --students 2000 --registry 1000000
+                            [--class-size 40] [--years 3] [--attendance 0.85] [--late 0.08]
+                            [--no-checkout 0.1] [--reset]
+
+Users, faculty, subjects, students and sessions are loaded with chunked
+executemany inserts. Registry rows, by far the largest table, are produced
+set-based: one INSERT ... SELECT per block of sessions joins each session to
+its class and derives attendance, lateness and check-out times from a hash of
+(student id, session id), so nothing is built row by row in Python and runs are
+reproducible. The attendance rollup is rebuilt at the end.
+
+Every session belongs to one class: students and sessions of a user are split
+into classes of roughly --class-size students by id. When --sessions is not
+given it is derived from --registry.
+"""
+import argparse
+import math
+import os
+import random
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from sqlalchemy import and_, bindparam, case, create_engine, func, insert, literal, null, select
+from sqlalchemy.orm import sessionmaker
+from db import Base, DATABASE_URL, engine_options
+from models import Faculty, Registry, Session, Student, Subject, User
+from utils import rollup, timestamps
+from utils.logger import get_logger
+
+logger = get_logger("dataset")
+
+CHUNK = 10000               # rows per executemany batch
+SESSION_BLOCK = 2000        # sessions per INSERT ... SELECT
+SLOTS = [dtime(h) for h in range(9, 17)]
+CHECKIN_WINDOW = 15 * 60    # seconds, see scanner.attendance.CHECKIN_WINDOW
+LATE_REASON = "Synthetic late check-in"
+
+
+def _chunks(rows, size=CHUNK):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _bulk(conn, table, rows):
+    for chunk in _chunks(rows):
+        conn.execute(insert(table), chunk)
+
+
+def _draw(salt, modulo=1000):
+    """Deterministic pseudo-random integer in [0, modulo) per (student, session) pair."""
+    return (Student.id * (7919 + salt * 104) + Session.id * (104729 + salt * 31) + salt * 613) % modulo
+
+
+def _add_seconds(dialect, time_col, seconds):
+    if dialect == "sqlite":
+        return func.time(time_col, func.printf("%+d seconds", seconds))
+    if dialect in ("mysql", "mariadb"):
+        return func.addtime(time_col, func.sec_to_time(seconds))
+    if dialect == "postgresql":
+        return time_col + func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+    raise ValueError(f"Unsupported dialect for dataset generation: {dialect}")
+
+
+def _next_id(conn, column):
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _load_reference_data(conn, users, faculty, subjects, students, rnd):
+    """Users, faculty, subjects and students. Returns {user_id: (faculty_ids, subject_ids)}."""
+    user_id = _next_id(conn, User.id)
+    faculty_id = _next_id(conn, Faculty.id)
+    subject_id = _next_id(conn, Subject.id)
+    student_id = _next_id(conn, Student.id)
+
+    layout = {}
+    user_rows, faculty_rows, subject_rows, student_rows = [], [], [], []
+    for u in range(user_id, user_id + users):
+        user_rows.append({
+            "id": u, "department_email": f"dept{u}@bench.example", "department_name": f"Department {u}",
+            "password": "-", "is_verified": True,
+        })
+        f_ids = list(range(faculty_id, faculty_id + faculty))
+        s_ids = list(range(subject_id, subject_id + subjects))
+        faculty_rows += [{"id": i, "name": f"Faculty {i}", "faculty_no": f"F{i:05d}",
+                          "department": f"Department {u}", "user_id": u} for i in f_ids]
+        subject_rows += [{"id": i, "title": f"Subject {i}", "course_code": f"C{i:05d}", "user_id": u} for i in s_ids]
+        student_rows += [{
+            "id": student_id + n, "name": f"Student {u}-{n}", "roll_no": f"U{u}S{n:06d}",
+            "admission_no": f"A{u}{n:06d}", "user_id": u,
+            "dob": date(2000, 1, 1) + timedelta(days=rnd.randrange(3650)),
+        } for n in range(students)]
+        layout[u] = (f_ids, s_ids)
+        faculty_id += faculty
+        subject_id += subjects
+        student_id += students
+
+    _bulk(conn, User, user_rows)
+    _bulk(conn, Faculty, faculty_rows)
+    _bulk(conn, Subject, subject_rows)
+    _bulk(conn, Student, student_rows)
+    return layout
+
+
+def _load_sessions(conn, layout, sessions_per_user, classes, years, rnd):
+    """Sessions spread over the last `years` years on weekdays. Returns (first_id, last_id)."""
+    first_id = session_id = _next_id(conn, Session.id)
+    today = date.today()
+    days = [today - timedelta(days=d) for d in range(int(365 * years)) if (today - timedelta(days=d)).weekday() < 5]
+    rows = []
+    for u, (f_ids, s_ids) in layout.items():
+        for n in range(sessions_per_user):
+            d = rnd.choice(days)
+            start = rnd.choice(SLOTS)
+            end = (datetime.combine(d, start) + timedelta(hours=1)).time()
+            # session ids are assigned in order, so id % classes picks the class
+            rows.append({
+                "id": session_id, "subject_id": rnd.choice(s_ids), "faculty_id": rnd.choice(f_ids),
+                "date": d, "start_time": start, "end_time": end, "is_active": d == today,
+                "remarks": f"class {session_id % classes}", "user_id": u,
+            })
+            session_id += 1
+            if len(rows) >= CHUNK:
+                conn.execute(insert(Session), rows)
+                rows = []
+    if rows:
+        conn.execute(insert(Session), rows)
+    return first_id, session_id - 1
+
+
+def _registry_select(dialect, classes, attendance, late, no_checkout):
+    """SELECT producing registry rows for a block of sessions (bound by :lo / :hi)."""
+    present = _draw(1) < int(attendance * 1000)
+    is_late = _draw(2) < int(late * 1000)
+    checks_out = _draw(3) >= int(no_checkout * 1000)
+
+    # on time: -10..+14 min around start; late: 16..45 min after start;
+    # check-out: 0..10 min before end
+    check_in_offset = case(
+        (is_late, CHECKIN_WINDOW + 60 + _draw(5, 30 * 60)),
+        else_=_draw(4, 25 * 60) - 10 * 60,
+    )
+    check_out_offset = -_draw(6, 10 * 60)
+    check_in = _add_seconds(dialect, Session.start_time, check_in_offset)
+    check_out = _add_seconds(dialect, Session.end_time, check_out_offset)
+
+    return select(
+        Student.id,
+        Session.id,
+        check_in,
+        case((checks_out, check_out), else_=null()),
+        case((is_late, literal(LATE_REASON)), else_=null()),
+        timestamps.combine(dialect, Session.date, check_in),
+        case((checks_out, timestamps.combine(dialect, Session.date, check_out)), else_=null()),
+    ).join(
+        Student, and_(Student.user_id == Session.user_id, Student.id % classes == Session.id % classes)
+    ).where(
+        Session.id.between(bindparam("lo"), bindparam("hi")),
+        present,
+    )
+
+
+def _load_registry(conn, dialect, first_session, last_session, classes, attendance, late, no_checkout):
+    stmt = insert(Registry).from_select(
+        ["student_id", "session_id", "check_in_time", "check_out_time", "late_check_in_reason",
+         "checked_in_at", "checked_out_at"],
+        _registry_select(dialect, classes, attendance, late, no_checkout),
+    )
+    total = 0
+    for lo in range(first_session, last_session + 1, SESSION_BLOCK):
+        hi = min(lo + SESSION_BLOCK - 1, last_session)
+        result = conn.execute(stmt, {"lo": lo, "hi": hi})
+        total += max(result.rowcount or 0, 0)
+        conn.commit()
+        logger.info(f"Registry: sessions {lo}-{hi} loaded ({total} rows so far)")
+    return total
+
+
+def generate(engine, users=1, faculty=20, subjects=30, students=2000, sessions=None, registry=100000,
+             class_size=40, years=3, attendance=0.85, late=0.08, no_checkout=0.1, seed=42, reset=False,
+             build_rollup=True):
+    """
+    Load a synthetic dataset into `engine` (appending unless reset=True).
+    `students` and `sessions` are per user. Returns a summary dict.
+    """
+    rnd = random.Random(seed)
+    if reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    classes = max(1, students // class_size)
+    if sessions is None:
+        per_session = (students / classes) * attendance
+        sessions = max(1, math.ceil(registry / (users * per_session)))
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        layout = _load_reference_data(conn, users, faculty, subjects, students, rnd)
+        first_session, last_session = _load_sessions(conn, layout, sessions, classes, years, rnd)
+        conn.commit()
+        logger.info(f"Loaded {users} users, {users * students} students, {users * sessions} sessions")
+        rows = _load_registry(conn, engine.dialect.name, first_session, last_session,
+                              classes, attendance, late, no_checkout)
+
+    if build_rollup:
+        db = sessionmaker(bind=engine)()
+        try:
+            for user_id in layout:
+                rollup.rebuild(db, user_id=user_id)
+        finally:
+            db.close()
+
+    return {
+        "users": users,
+        "students": users * students,
+        "sessions": users * sessions,
+        "registry": rows,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic attendance dataset.")
+    parser.add_argument("--db-url", default=os.getenv("HAAJAR_BENCH_DB", "sqlite:///bench.db"),
+                        help="target database (use --db-url=env for DATABASE_URL / DB_*)")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--faculty", type=int, default=20, help="per user")
+    parser.add_argument("--subjects", type=int, default=30, help="per user")
+    parser.add_argument("--students", type=int, default=2000, help="per user")
+    parser.add_argument("--sessions", type=int, help="per user (default: derived from --registry)")
+    parser.add_argument("--registry", type=int, default=100000, help="approximate registry rows")
+    parser.add_argument("--class-size", type=int, default=40)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--attendance", type=float, default=0.85, help="share of a class that shows up")
+    parser.add_argument("--late", type=float, default=0.08, help="share of check-ins that are late")
+    parser.add_argument("--no-checkout", type=float, default=0.1, help="share that never check out")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-rollup", action="store_true", help="skip rebuilding attendance_rollup")
+    parser.add_argument("--reset", action="store_true", help="DROP and recreate all tables first")
+    args = parser.parse_args(argv)
+
+    url = DATABASE_URL if args.db_url == "env" else args.db_url
+    engine = create_engine(url, **engine_options(url))
+    summary = generate(
+        engine, args.users, args.faculty, args.subjects, args.students, args.sessions, args.registry,
+        args.class_size, args.years, args.attendance, args.late, args.no_checkout, args.seed,
+        args.reset, not args.no_rollup,
+    )
+    print(f"Generated {summary['registry']} registry rows for {summary['sessions']} sessions and "
+          f"{summary['students']} students in {summary['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Scan-path load generator.
+
+Simulates N kiosks, each firing M scans per second, through the same write path
+the kiosk uses (attendance.record_scan, one DB session per scan on a worker
+thread), against a local database with a generated roster.
+
+    python -m bench.loadgen --kiosks 8 --rate 5 --duration 30 [--db-url sqlite:///loadgen.db]
+                            [--students 500] [--pool-size 5 --max-overflow 10] [--json out.json]
+
+Scans are scheduled open-loop, so latency is measured from the moment a scan
+*should* have happened to its commit and includes any queueing behind a slow
+database. The first half of the run is the check-in window, the second half
+check-out. Reports throughput, p50/p99/max latency, errors by type and how often
+the connection pool was exhausted.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+from sqlalchemy import create_engine, delete, insert, select
+from sqlalchemy.orm import sessionmaker
+from db import Base, DATABASE_URL, engine_options
+from models import Faculty, Registry, Session, Student, Subject, User
+from scanner import attendance
+from utils import sql_telemetry
+from utils.logger import get_logger
+
+logger = get_logger("loadgen")
+
+ROLL_PREFIX = "LG"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def build_engine(url, pool_size=None, max_overflow=None, pool_timeout=None):
+    options = engine_options(url)
+    if pool_size is not None:
+        options["pool_size"] = pool_size
+    if max_overflow is not None:
+        options["max_overflow"] = max_overflow
+    if pool_timeout is not None:
+        options["pool_timeout"] = pool_timeout
+    engine = create_engine(url, **options)
+    sql_telemetry.install(engine)
+    return engine
+
+
+def prepare_roster(engine, students):
+    """Create (or reuse) one user, subject, faculty and session with `students` students."""
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    try:
+        user_id = db.execute(
+            select(User.id).where(User.department_email == "loadgen@example.com")
+        ).scalar()
+        if user_id is None:
+            user_id = db.execute(insert(User).values(
+                department_email="loadgen@example.com", department_name="Load test",
+                password="-", is_verified=True,
+            )).inserted_primary_key[0]
+            db.execute(insert(Subject).values(title="Load test", course_code="LG101", user_id=user_id))
+            db.execute(insert(Faculty).values(name="Load test", faculty_no="LG", user_id=user_id))
+
+        have = db.execute(select(Student.roll_no).where(Student.user_id == user_id)).scalars().all()
+        missing = [f"{ROLL_PREFIX}{i:06d}" for i in range(len(have), students)]
+        if missing:
+            db.execute(insert(Student), [{"name": f"Student {r}", "roll_no": r, "user_id": user_id} for r in missing])
+
+        subject_id = db.execute(select(Subject.id).where(Subject.user_id == user_id)).scalar()
+        faculty_id = db.execute(select(Faculty.id).where(Faculty.user_id == user_id)).scalar()
+        now = datetime.now()
+        session_id = db.execute(insert(Session).values(
+            subject_id=subject_id, faculty_id=faculty_id, date=now.date(),
+            start_time=now.time(), end_time=(now + timedelta(hours=2)).time(),
+            is_active=True, remarks="loadgen", user_id=user_id,
+        )).inserted_primary_key[0]
+        db.commit()
+        session_row = db.get(Session, session_id)
+        db.expunge(session_row)
+    finally:
+        db.close()
+    return session_row, [f"{ROLL_PREFIX}{i:06d}" for i in range(students)]
+
+
+class PoolMonitor(Thread):
+    """Samples pool checkouts every `interval` seconds."""
+    def __init__(self, pool, interval=0.05):
+        super().__init__(daemon=True, name="pool-monitor")
+        self.pool = pool
+        self.interval = interval
+        self.samples = 0
+        self.saturated = 0
+        self.max_checked_out = 0
+        self._stop_event = Event()
+        size = getattr(pool, "size", None)
+        overflow = getattr(pool, "_max_overflow", 0)
+        self.capacity = size() + max(overflow, 0) if callable(size) and overflow >= 0 else None
+
+    def run(self):
+        checkedout = getattr(self.pool, "checkedout", None)
+        if checkedout is None:
+            return
+        while not self._stop_event.wait(self.interval):
+            n = checkedout()
+            self.samples += 1
+            self.max_checked_out = max(self.max_checked_out, n)
+            if self.capacity and n >= self.capacity:
+                self.saturated += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class LoadRun:
+    def __init__(self, factory, session_row, rolls, kiosks, rate, duration, workers):
+        self.factory = factory
+        self.session_row = session_row
+        self.rolls = rolls
+        self.kiosks = kiosks
+        self.rate = rate
+        self.duration = duration
+        self.workers = workers
+        self.latencies = []
+        self.outcomes = Counter()
+        self.errors = Counter()
+        self.statements = 0
+        self._lock = Lock()
+
+    def _scan(self, payload, scheduled, is_checkin_time):
+        db = self.factory()
+        with sql_telemetry.capture("loadgen.scan") as stats:
+            try:
+                result = attendance.record_scan(db, self.session_row, payload, is_checkin_time)
+                outcome, error = result.outcome, None
+            except Exception as e:
+                db.rollback()
+                outcome, error = "error", type(e).__name__
+            finally:
+                db.close()
+        elapsed = time.perf_counter() - scheduled
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.statements += stats.count
+            self.outcomes[outcome] += 1
+            if error:
+                self.errors[error] += 1
+
+    def _kiosk(self, index, pool, t0):
+        rnd = random.Random(index)
+        interval = 1.0 / self.rate
+        n = 0
+        while True:
+            scheduled = t0 + n * interval + rnd.random() * interval
+            offset = scheduled - t0
+            if offset >= self.duration:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(self._scan, rnd.choice(self.rolls), scheduled, offset < self.duration / 2)
+            n += 1
+
+    def run(self):
+        # like the kiosk: decoding never waits, writes run on worker threads
+        pools = [ThreadPoolExecutor(max_workers=self.workers) for _ in range(self.kiosks)]
+        t0 = time.perf_counter()
+        threads = [Thread(target=self._kiosk, args=(i, pools[i], t0), daemon=True) for i in range(self.kiosks)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for pool in pools:
+            pool.shutdown(wait=True)
+        return time.perf_counter() - t0
+
+
+def run(url, kiosks=4, rate=5.0, duration=30.0, students=500, workers=4,
+        pool_size=None, max_overflow=None, pool_timeout=None, reset=False):
+    engine = build_engine(url, pool_size, max_overflow, pool_timeout)
+    session_row, rolls = prepare_roster(engine, students)
+    factory = sessionmaker(bind=engine)
+    logger.info(f"Load test: {kiosks} kiosks x {rate}/s for {duration}s against {engine.url.render_as_string()}")
+
+    monitor = PoolMonitor(engine.pool)
+    monitor.start()
+    load = LoadRun(factory, session_row, rolls, kiosks, rate, duration, workers)
+    wall = load.run()
+    monitor.stop()
+
+    if reset:
+        with engine.begin() as conn:
+            conn.execute(delete(Registry).where(Registry.session_id == session_row.id))
+            conn.execute(delete(Session).where(Session.id == session_row.id))
+    engine.dispose()
+
+    lat = sorted(load.latencies)
+    total = len(lat)
+    errors = sum(load.errors.values())
+    return {
+        "db": engine.url.render_as_string(),
+        "kiosks": kiosks,
+        "rate_per_kiosk": rate,
+        "duration_s": duration,
+        "students": students,
+        "scans": total,
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(total / wall, 2) if wall else 0,
+        "latency_ms": {
+            "p50": round(percentile(lat, 50) * 1000, 2) if lat else None,
+            "p99": round(percentile(lat, 99) * 1000, 2) if lat else None,
+            "max": round(lat[-1] * 1000, 2) if lat else None,
+        },
+        "outcomes": dict(load.outcomes),
+        "error_rate": round(errors / total, 4) if total else 0,
+        "errors": dict(load.errors),
+        "statements": load.statements,
+        "pool": {
+            "capacity": monitor.capacity,
+            "max_checked_out": monitor.max_checked_out,
+            "saturated_pct": round(100 * monitor.saturated / monitor.samples, 1) if monitor.samples else None,
+        },
+    }
+
+
+def print_report(report):
+    lat = report["latency_ms"]
+    pool = report["pool"]
+    print(f"\n{report['kiosks']} kiosks x {report['rate_per_kiosk']}/s for {report['duration_s']}s on {report['db']}")
+    print(f"  scans          {report['scans']}  ({report['throughput_per_s']}/s)")
+    print(f"  latency ms     p50 {lat['p50']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"  outcomes       {report['outcomes']}")
+    print(f"  error rate     {report['error_rate']:.2%}  {report['errors'] or ''}")
+    print(f"  statements     {report['statements']}")
+    print(f"  pool           max checked out {pool['max_checked_out']}/{pool['capacity']}, "
+          f"saturated {pool['saturated_pct']}% of samples")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kiosk scan-path load generator.")
+    parser.add_argument("--db-url", default=os.getenv("HAAJAR_LOADGEN_DB", "sqlite:///loadgen.db"),
+                        help="database to load (use --db-url=env for DATABASE_URL / DB_*)")
+    parser.add_argument("--kiosks", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5.0, help="scans per second per kiosk")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4, help="write threads per kiosk")
+    parser.add_argument("--pool-size", type=int)
+    parser.add_argument("--max-overflow", type=int)
+    parser.add_argument("--pool-timeout", type=float)
+    parser.add_argument("--reset", action="store_true", help="delete the test session's rows afterwards")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    url = DATABASE_URL if args.db_url == "env" else args.db_url
+    report = run(url, args.kiosks, args.rate, args.duration, args.students, args.workers,
+                 args.pool_size, args.max_overflow, args.pool_timeout, args.reset)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
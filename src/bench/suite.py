@@ -0,0 +1,271 @@
+"""
+Hot-path benchmark suite.
+
+Times the data paths behind the screens, at several registry sizes:
+
+    KioskScanner._process_payload      attendance.record_scan, direct mode
+    ViewRegistryTab.fetch_records      read_model.registry_rows + export.as_record
+                                       (default = latest session, wide = last --wide-days days)
+    ViewSessionsTab.fetch_sessions     read_model.session_rows, no filters
+    HomePage stats                     read_model.home_stats
+    export.write_excel / write_pdf     on up to --export-rows records of the wide fetch
+
+    python -m bench.suite --sizes 10k,1m,10m [--data-dir bench-data] [--out results.json]
+    python -m bench.suite --db-url mysql+pymysql://... --out results.json     # existing large DB
+    python -m bench.suite --sizes 10k --compare baseline.json                  # exit 1 on regression
+
+Databases for --sizes are generated once with bench.dataset (SQLite files in
+--data-dir) and reused. Each case runs --repeat times after one warm-up; the
+JSON keeps min/median/max seconds, statement counts and row counts per case.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import sqlalchemy
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import sessionmaker
+from db import DATABASE_URL, engine_options
+from models import Registry, Session, Student
+from scanner import attendance
+from utils import export, read_model, sql_telemetry
+from utils.logger import get_logger
+from bench import dataset
+
+logger = get_logger("bench")
+
+SUFFIXES = {"k": 1000, "m": 1000000}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(n):
+    for suffix, factor in (("m", 1000000), ("k", 1000)):
+        if n >= factor and n % factor == 0:
+            return f"{n // factor}{suffix}"
+    return str(n)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def prepare_database(size, data_dir):
+    """SQLite file with ~`size` registry rows, generated on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    url = f"sqlite:///{os.path.join(data_dir, f'bench-{size_label(size)}.db')}"
+    engine = create_engine(url, **engine_options(url))
+    try:
+        with engine.connect() as conn:
+            have = conn.execute(select(func.count(Registry.id))).scalar()
+    except sqlalchemy.exc.OperationalError:
+        have = 0
+    if not have:
+        logger.info(f"Generating {size_label(size)} registry rows in {url}")
+        dataset.generate(engine, users=1, students=max(200, min(20000, size // 500)), registry=size, reset=True)
+    engine.dispose()
+    return url
+
+
+class Bench:
+    def __init__(self, url, repeat=5, wide_days=120, export_rows=10000, scans=200):
+        self.engine = create_engine(url, **engine_options(url))
+        sql_telemetry.install(self.engine)
+        self.factory = sessionmaker(bind=self.engine)
+        self.repeat = repeat
+        self.wide_days = wide_days
+        self.export_rows = export_rows
+        self.scans = scans
+        with self.factory() as db:
+            # the user with the most registry rows
+            self.user_id = db.execute(
+                select(Session.user_id).join(Registry, Registry.session_id == Session.id)
+                .group_by(Session.user_id).order_by(func.count(Registry.id).desc()).limit(1)
+            ).scalar()
+            self.registry_rows = db.execute(select(func.count(Registry.id))).scalar()
+        self._records = None
+
+    def time_case(self, fn):
+        """Warm up once, then run `repeat` times. fn(db) returns a row count."""
+        with self.factory() as db:
+            fn(db)
+        timings, statements, rows = [], 0, 0
+        for _ in range(self.repeat):
+            with self.factory() as db, sql_telemetry.capture("bench") as stats:
+                start = time.perf_counter()
+                rows = fn(db)
+                timings.append(time.perf_counter() - start)
+            statements = stats.count
+        return {
+            "min_s": round(min(timings), 6),
+            "median_s": round(statistics.median(timings), 6),
+            "max_s": round(max(timings), 6),
+            "statements": statements,
+            "rows": rows,
+        }
+
+    # --- cases -------------------------------------------------------------
+
+    def fetch_registry_default(self, db):
+        return len([export.as_record(r) for r in read_model.registry_rows(db, self.user_id)])
+
+    def fetch_registry_wide(self, db):
+        filters = {"start_date": date.today() - timedelta(days=self.wide_days), "end_date": date.today()}
+        records = [export.as_record(r) for r in read_model.registry_rows(db, self.user_id, filters)]
+        self._records = records[:self.export_rows]
+        return len(records)
+
+    def fetch_sessions(self, db):
+        return len(read_model.session_rows(db, self.user_id))
+
+    def home_stats(self, db):
+        read_model.home_stats(db, self.user_id)
+        return 1
+
+    def write_excel(self, db):
+        with tempfile.TemporaryDirectory() as tmp:
+            export.write_excel(self._records, os.path.join(tmp, "registry.xlsx"))
+        return len(self._records)
+
+    def write_pdf(self, db):
+        with tempfile.TemporaryDirectory() as tmp:
+            export.write_pdf(self._records, os.path.join(tmp, "registry.pdf"))
+        return len(self._records)
+
+    def process_payload(self):
+        """`scans` check-ins then check-outs on a throwaway session; per-scan latency."""
+        with self.factory() as db:
+            s = db.execute(select(Session).where(Session.user_id == self.user_id).limit(1)).scalar()
+            now = datetime.now()
+            session_id = db.execute(insert(Session).values(
+                subject_id=s.subject_id, faculty_id=s.faculty_id, date=now.date(), start_time=now.time(),
+                end_time=(now + timedelta(hours=1)).time(), is_active=True, remarks="bench", user_id=self.user_id,
+            )).inserted_primary_key[0]
+            rolls = db.execute(
+                select(Student.roll_no).where(Student.user_id == self.user_id).limit(self.scans)
+            ).scalars().all()
+            db.commit()
+            session_row = db.get(Session, session_id)
+            db.expunge(session_row)
+
+        timings, statements = [], 0
+        try:
+            for is_checkin_time in (True, False):
+                for roll in random.Random(0).sample(rolls, len(rolls)):
+                    with self.factory() as db, sql_telemetry.capture("bench") as stats:
+                        start = time.perf_counter()
+                        attendance.record_scan(db, session_row, roll, is_checkin_time)
+                        timings.append(time.perf_counter() - start)
+                    statements += stats.count
+        finally:
+            with self.engine.begin() as conn:
+                conn.execute(delete(Registry).where(Registry.session_id == session_id))
+                conn.execute(delete(Session).where(Session.id == session_id))
+        timings.sort()
+        return {
+            "min_s": round(timings[0], 6),
+            "median_s": round(statistics.median(timings), 6),
+            "p99_s": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 6),
+            "max_s": round(timings[-1], 6),
+            "statements": round(statements / len(timings), 2),
+            "rows": len(timings),
+        }
+
+    def run(self):
+        results = {
+            "KioskScanner._process_payload": self.process_payload(),
+            "ViewRegistryTab.fetch_records[default]": self.time_case(self.fetch_registry_default),
+            "ViewRegistryTab.fetch_records[wide]": self.time_case(self.fetch_registry_wide),
+            "ViewSessionsTab.fetch_sessions": self.time_case(self.fetch_sessions),
+            "HomePage.stats": self.time_case(self.home_stats),
+            "export.write_excel": self.time_case(self.write_excel),
+            "export.write_pdf": self.time_case(self.write_pdf),
+        }
+        self.engine.dispose()
+        return results
+
+
+def compare(current, baseline, threshold):
+    """Cases whose median got slower than `threshold` (0.2 = 20%) versus the baseline run."""
+    regressions = []
+    for label, cases in current["results"].items():
+        for case, stats in cases.items():
+            old = baseline.get("results", {}).get(label, {}).get(case)
+            if not old or not old.get("median_s"):
+                continue
+            ratio = stats["median_s"] / old["median_s"]
+            print(f"  {label:>5} {case:<42} {old['median_s'] * 1000:10.2f} ms -> {stats['median_s'] * 1000:10.2f} ms  x{ratio:.2f}")
+            if ratio > 1 + threshold:
+                regressions.append((label, case, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DB hot paths.")
+    parser.add_argument("--sizes", default="10k,1m,10m", help="registry sizes to generate, e.g. 10k,1m")
+    parser.add_argument("--db-url", help="benchmark this existing database instead (use 'env' for DATABASE_URL)")
+    parser.add_argument("--data-dir", default="bench-data")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--wide-days", type=int, default=120)
+    parser.add_argument("--export-rows", type=int, default=10000)
+    parser.add_argument("--scans", type=int, default=200, help="scans per direction for _process_payload")
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing --compare")
+    args = parser.parse_args(argv)
+
+    if args.db_url:
+        targets = [(None, DATABASE_URL if args.db_url == "env" else args.db_url)]
+    else:
+        sizes = [parse_size(s) for s in args.sizes.split(",")]
+        targets = [(size_label(n), prepare_database(n, args.data_dir)) for n in sizes]
+
+    report = {
+        "revision": _git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "results": {},
+        "databases": {},
+    }
+    for label, url in targets:
+        bench = Bench(url, args.repeat, args.wide_days, args.export_rows, args.scans)
+        label = label or size_label(bench.registry_rows)
+        logger.info(f"Benchmarking {label} registry rows ({bench.engine.url.render_as_string()})")
+        report["results"][label] = bench.run()
+        report["databases"][label] = bench.engine.url.render_as_string()
+        for case, stats in report["results"][label].items():
+            print(f"  {label:>5} {case:<42} median {stats['median_s'] * 1000:10.2f} ms  "
+                  f"{stats['statements']} stmts  {stats['rows']} rows")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for label, case, ratio in regressions:
+            print(f"REGRESSION {label} {case}: x{ratio:.2f}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,8 @@ TAB_CREATE_SESSION = "Create Session"
 TAB_VIEW_REGISTRY  = "View Registry"
 TAB_VIEW_SESSIONS = "View Sessions"
 TAB_KIOSK_SCANNER = "Kiosk Scanner"
+TAB_ANALYTICS = "Analytics"
+TAB_ADMIN_DASHBOARD = "Admin Dashboard"
 
 # grouped for convenience
 TABS = {
@@ -10,5 +12,7 @@ TABS = {
     "create_session": TAB_CREATE_SESSION,
     "view_sessions": TAB_VIEW_SESSIONS,
     "view_registry": TAB_VIEW_REGISTRY,
+    "analytics": TAB_ANALYTICS,
+    "admin_dashboard": TAB_ADMIN_DASHBOARD,
     "kiosk_scanner": TAB_KIOSK_SCANNER,
 }
@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
+from utils import metrics, sql_telemetry
 import os
 
 # Load environment variables
@@ -11,10 +12,65 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_NAME = os.getenv("DB_NAME")
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# DATABASE_URL overrides the DB_* settings, e.g. sqlite:///bench.db for load tests
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, echo=True)
+
+# Reporting reads can go to a replica (e.g. sqlite:///replica.db locally); by
+# default they use the primary through a pool of their own.
+READ_DATABASE_URL = os.getenv("HAAJAR_DB_READ_URL") or DATABASE_URL
+
+
+def engine_options(url, prefix="HAAJAR_DB"):
+    """Pool settings from <prefix>_POOL_SIZE / <prefix>_MAX_OVERFLOW / <prefix>_POOL_TIMEOUT."""
+    options = {"echo": os.getenv("DB_ECHO") == "1"}
+    if url.startswith("sqlite"):
+        # kiosk scans write from worker threads
+        options["connect_args"] = {"check_same_thread": False, "timeout": 30}
+    if os.getenv(f"{prefix}_POOL_SIZE"):
+        options["pool_size"] = int(os.getenv(f"{prefix}_POOL_SIZE"))
+    if os.getenv(f"{prefix}_MAX_OVERFLOW"):
+        options["max_overflow"] = int(os.getenv(f"{prefix}_MAX_OVERFLOW"))
+    if os.getenv(f"{prefix}_POOL_TIMEOUT"):
+        options["pool_timeout"] = float(os.getenv(f"{prefix}_POOL_TIMEOUT"))
+    return options
+
+
+def _make_engine(url, prefix, pool_name):
+    # Set DB_ECHO=1 to print every statement (noisy); statement timing, its
+    # metrics and the slow-query log come from utils/sql_telemetry.py instead.
+    new_engine = create_engine(url, **engine_options(url, prefix))
+    metrics.watch_pool(pool_name, new_engine.pool)
+    sql_telemetry.install(new_engine)
+    return new_engine
+
+
+def _refuse_writes(session, flush_context, instances):
+    raise RuntimeError("ReadSessionLocal sessions are read-only; use SessionLocal to write")
+
+
+# Three pools, so one kind of traffic can never take another's connections:
+#   engine        general app traffic (login, session setup, edits, maintenance)
+#   kiosk_engine  scan writes only, reserved (HAAJAR_DB_KIOSK_POOL_SIZE ...)
+#   read_engine   reports, list views and exports (HAAJAR_DB_READ_POOL_SIZE ...)
+engine = _make_engine(DATABASE_URL, "HAAJAR_DB", "main")
+kiosk_engine = _make_engine(DATABASE_URL, "HAAJAR_DB_KIOSK", "kiosk")
+read_engine = _make_engine(READ_DATABASE_URL, "HAAJAR_DB_READ", "read")
 
 SessionLocal = sessionmaker(bind=engine)
+# scan results are read after commit; skip reloading them
+KioskSessionLocal = sessionmaker(bind=kiosk_engine, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False)
+event.listen(ReadSessionLocal, "before_flush", _refuse_writes)
 
 Base = declarative_base()
+
+
+def create_read_schema(metadata=None):
+    """
+    Create missing tables in a separate read database. A real replica gets them
+    by replication; a local stand-in (HAAJAR_DB_READ_URL=sqlite:///replica.db)
+    does not, and reports would fail with "no such table".
+    """
+    if READ_DATABASE_URL != DATABASE_URL:
+        (metadata or Base.metadata).create_all(read_engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, Time, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Date, Time, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from db import Base
 
@@ -14,6 +14,10 @@ class Student(Base):
     
     user = relationship("User")
 
+    # Natural key: a roll number is unique within a department (user).
+    # Existing databases get it from utils.roster_import.ensure_roster_key().
+    __table_args__ = (Index("uq_students_user_roll", "user_id", "roll_no", unique=True),)
+
 
 class Subject(Base):
     __tablename__ = "subjects"
@@ -50,11 +54,15 @@ class Session(Base):
     is_active = Column(Boolean)
     remarks = Column(String(200))
     user_id = Column(Integer, ForeignKey("users.id"))
+    # Last write to the row (auto-close, mark inactive), on the database clock
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     subject = relationship("Subject")
     faculty = relationship("Faculty")
     user = relationship("User")
 
+    __table_args__ = (Index("ix_sessions_updated_at", "updated_at"),)
+
 
 class Registry(Base):
     __tablename__ = "registry"
@@ -65,6 +73,34 @@ class Registry(Base):
     check_in_time = Column(Time)
     check_out_time = Column(Time)
     late_check_in_reason = Column(String(200))
+    # Full timestamps for time-range queries (see utils/timestamps.py).
+    # Existing databases get them from utils.timestamps.migrate().
+    checked_in_at = Column(DateTime)
+    checked_out_at = Column(DateTime)
+    # Last write to the row, on the database clock: the list views' change watermark.
+    # checked_out_at cannot serve: auto check-out stamps the (past) session end.
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_registry_checked_in_at", "checked_in_at"),
+        Index("ix_registry_checked_out_at", "checked_out_at"),
+        Index("ix_registry_updated_at", "updated_at"),
+        # one row per student and session; also serves the absentee anti-join
+        Index("uq_registry_session_student", "session_id", "student_id", unique=True),
+    )
+
+
+class AttendanceRollup(Base):
+    """Daily attendance counters, maintained incrementally by the kiosk (see utils/rollup.py)."""
+    __tablename__ = "attendance_rollup"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), primary_key=True)
+    faculty_id = Column(Integer, ForeignKey("faculty.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    present = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    checked_out = Column(Integer, nullable=False, default=0)
 
 
 class User(Base):
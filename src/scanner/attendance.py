@@ -0,0 +1,134 @@
+"""
+Registry write path shared by every scanner front end (Tk kiosk, headless
+kiosk, ingestion service). No UI imports here.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import Registry as RegistryModel, Student as StudentModel
+from utils import rollup
+from utils.events import bus, ScanEvent, SCAN_CHECKED_IN, SCAN_CHECKED_OUT
+
+# Outcomes
+CHECKED_IN = "checked_in"
+CHECKED_OUT = "checked_out"
+ALREADY_IN = "already_in"
+LATE = "late"              # no check-in and the check-in window has closed
+UNKNOWN = "unknown"
+
+ScanResult = namedtuple("ScanResult", "outcome student_id student_name message written roll_no registry_id",
+                        defaults=(None, None))
+# written: "in" / "out" when a row was committed for this scan, else None
+# registry_id: the row written in direct mode (None through the ingestion service)
+
+CHECKIN_WINDOW = timedelta(minutes=15)   # after session start, scans become check-outs
+
+
+def in_checkin_window(session_row, now=None):
+    """True while scans of session_row count as check-ins."""
+    start = datetime.combine(session_row.date, session_row.start_time)
+    return (now or datetime.now()) <= start + CHECKIN_WINDOW
+
+
+def normalize_payload(payload):
+    """Card payloads are 'ROLLNO[,extra,...]'; only the first field identifies the student."""
+    return payload.split(',')[0] if payload else payload
+
+
+# Card payload lookup order, shared with the ingestion service's roster
+LOOKUP_KEYS = ("roll_no", "admission_no", "name")
+
+
+def find_student(db, payload, user_id=None):
+    """
+    The student a payload names within user_id's department: roll no, then
+    admission no, then name; the oldest student wins a tie.
+    """
+    if not payload:
+        return None
+    for key in LOOKUP_KEYS:
+        query = db.query(StudentModel).filter(getattr(StudentModel, key) == payload)
+        if user_id is not None:
+            query = query.filter(StudentModel.user_id == user_id)
+        student = query.order_by(StudentModel.id).first()
+        if student is not None:
+            return student
+    return None
+
+
+def roster_index(rows):
+    """{payload: row} over a department's student rows, resolving exactly as find_student does."""
+    by_key = {}
+    ordered = sorted(rows, key=lambda row: row.id)
+    for key in LOOKUP_KEYS:
+        for row in ordered:
+            value = getattr(row, key)
+            if value:
+                by_key.setdefault(value, row)
+    return by_key
+
+
+def _registry_row(db, session_id, student_id):
+    return db.query(RegistryModel).filter(
+        RegistryModel.session_id == session_id,
+        RegistryModel.student_id == student_id
+    ).order_by(RegistryModel.id.desc()).first()
+
+
+def record_scan(db, session_row, payload, is_checkin_time, now=None, late_reason=None):
+    """
+    Check a student in or out of session_row and commit.
+    session_row needs id, user_id, subject_id, faculty_id and date.
+    With late_reason, a missing check-in is recorded as a late one (the kiosk's
+    late check-in dialog) instead of returning LATE.
+    """
+    payload = normalize_payload(payload)
+    student = find_student(db, payload, session_row.user_id)
+    if student is None:
+        return ScanResult(UNKNOWN, None, None, f"Unknown QR: {payload}", None)
+
+    reg = _registry_row(db, session_row.id, student.id)
+
+    now_dt = now or datetime.now()
+    if reg is None:
+        if not is_checkin_time and late_reason is None:
+            return ScanResult(LATE, student.id, student.name, f"Late: {student.name}", None, student.roll_no)
+        reg = RegistryModel(student_id=student.id, session_id=session_row.id, check_in_time=now_dt.time(), check_out_time=None,
+                            checked_in_at=now_dt, late_check_in_reason=late_reason)
+        try:
+            # flush first: the rollup upsert would autoflush the insert outside this handler
+            db.add(reg)
+            db.flush()
+            rollup.record_check_in(db, session_row, late=late_reason is not None)
+            db.commit()
+        except IntegrityError:
+            # another kiosk (or the ingestion service) checked this student in first
+            db.rollback()
+            return ScanResult(ALREADY_IN, student.id, student.name, f"Already Checked IN: {student.name}", None,
+                              student.roll_no)
+        return ScanResult(CHECKED_IN, student.id, student.name, f"Checked IN: {student.name}", "in",
+                          student.roll_no, reg.id)
+
+    if is_checkin_time or late_reason is not None:
+        return ScanResult(ALREADY_IN, student.id, student.name, f"Already Checked IN: {student.name}", None,
+                          student.roll_no, reg.id)
+
+    first_check_out = reg.check_out_time is None
+    if first_check_out:
+        rollup.record_check_out(db, session_row)
+    reg.check_out_time = now_dt.time()
+    reg.checked_out_at = now_dt
+    db.commit()
+    return ScanResult(CHECKED_OUT, student.id, student.name, f"Checked OUT: {student.name}",
+                      "out" if first_check_out else None, student.roll_no, reg.id)
+
+
+def publish(session_row, result, at=None, late_reason=None):
+    """Announce a committed check-in / check-out on the in-process event bus."""
+    if result.written not in ("in", "out"):
+        return
+    bus.publish(SCAN_CHECKED_IN if result.written == "in" else SCAN_CHECKED_OUT, ScanEvent(
+        session_row.id, session_row.user_id, session_row.subject_id, session_row.faculty_id, session_row.date,
+        result.student_id, result.student_name, result.roll_no, result.registry_id,
+        at or datetime.now(), late_reason,
+    ))
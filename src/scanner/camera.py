@@ -1,112 +1,268 @@
-import cv2
-from pyzbar import pyzbar
+"""
+Headless kiosk for low-power devices (e.g. a Raspberry Pi at the lab door).
+
+    python -m scanner.camera --session 42 [--feedback window|led|none] [--device 0]
+
+Uses the same decoder (scanner/decoder.py) and registry write path
+(scanner/attendance.py, or the ingestion service when HAAJAR_INGEST_URL is set)
+as the Tk kiosk, but never imports Tk, ttkbootstrap, pandas or ReportLab.
+
+Feedback modes:
+    window  OpenCV preview with the scan overlay (press q to quit)
+    led     one coloured status line per scan on the terminal, bell on errors
+    none    log only
+"""
+import argparse
+import sys
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import cv2
+from sqlalchemy import select
+from db import KioskSessionLocal, SessionLocal
+from models import Session, Subject
+from scanner import attendance, capture
+from scanner.capture import CameraManager
+from scanner.decoder import FrameDecoder, Debouncer
+from scanner.ingest_client import client_from_env, start_stats_reporter, IngestUnavailable
+from utils import kiosk_stats, metrics, profiling, sql_telemetry
+from utils.events import bus, CAMERA_STATE
+from utils.logger import get_logger
+
+logger = get_logger("HeadlessKiosk")
+
+KioskSession = namedtuple(
+    "KioskSession",
+    "id user_id subject_id faculty_id date start_time end_time is_active subject",
+)
+
+# outcome -> (BGR colour for the overlay, ANSI background for the LED line)
+# Not a scan outcome: neutral device status (e.g. the camera recovered), so it
+# never looks or sounds like a successful check-in.
+STATUS = "status"
+
+_COLORS = {
+    STATUS: ((255, 160, 0), "44"),
+    attendance.CHECKED_IN: ((0, 255, 0), "42"),
+    attendance.CHECKED_OUT: ((255, 200, 0), "43"),
+    attendance.ALREADY_IN: ((0, 0, 255), "41"),
+    attendance.LATE: ((0, 0, 255), "41"),
+    attendance.UNKNOWN: ((0, 0, 255), "41"),
+}
+_ERROR = ((0, 0, 255), "41")
+
+
+def load_session(session_id):
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(Session.id, Session.user_id, Session.subject_id, Session.faculty_id, Session.date,
+                   Session.start_time, Session.end_time, Session.is_active, Subject.title)
+            .outerjoin(Subject, Session.subject_id == Subject.id)
+            .where(Session.id == session_id)
+        ).first()
+    finally:
+        db.close()
+    return KioskSession._make(row) if row else None
+
 
-def main():
+# --- feedback ----------------------------------------------------------------
 
-    # Timer variables
-    show_message = False
-    message_start_time = 0
-    message_text = ""
+class NoFeedback:
+    def show(self, outcome, msg, rect=None):
+        pass
 
-    # Student list
-    QR_list = [f"25MCA{str(i).zfill(2)}" for i in range(1, 61)]
+    def frame(self, frame):
+        """Called once per captured frame; return False to stop the kiosk."""
+        return True
 
-    Present_studs = []
+    def close(self):
+        pass
 
-    cap = cv2.VideoCapture(0)
 
-    if not cap.isOpened():
-        print("Cannot access camera")
-        return
-    
-    print("Camera started. Show the QR code in the ID card to the webcam to Mark Attendance")
+class LedFeedback(NoFeedback):
+    """Status-light style output for a bare terminal or serial console."""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.ansi = self.stream.isatty()
+        self._lock = Lock()
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        qr_codes = pyzbar.decode(frame)
-  
-        if not qr_codes:
-            inverted_frame = cv2.bitwise_not(frame)
-            qr_codes = pyzbar.decode(inverted_frame)
+    def show(self, outcome, msg, rect=None):
+        _, bg = _COLORS.get(outcome, _ERROR)
+        ok = outcome in (attendance.CHECKED_IN, attendance.CHECKED_OUT)
+        label = "[ OK ]" if ok else "[INFO]" if outcome == STATUS else "[FAIL]"
+        light = f"\x1b[{bg}m    \x1b[0m" if self.ansi else label
+        bell = "" if ok or outcome == STATUS else "\a"
+        with self._lock:
+            self.stream.write(f"{time.strftime('%H:%M:%S')} {light} {msg}{bell}\n")
+            self.stream.flush()
 
-        for qr in qr_codes:
 
-            qr_data = qr.data.decode("utf-8")
-            qr_id = qr_data[0:7]
-            # print("QR Code Detected:", qr_id)
+class WindowFeedback(NoFeedback):
+    """OpenCV preview window with the same overlay as the Tk kiosk."""
+    def __init__(self, title="Haajar Kiosk", ttl=1.5):
+        self.title = title
+        self.ttl = ttl
+        self.overlay = None     # (rect, msg, color, ts); replaced atomically by worker threads
 
-            (x, y, w, h) = qr.rect
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (200, 200, 255), 2)
+    def show(self, outcome, msg, rect=None):
+        color, _ = _COLORS.get(outcome, _ERROR)
+        self.overlay = (rect, msg, color, time.time())
 
+    def frame(self, frame):
+        overlay = self.overlay
+        if overlay and time.time() - overlay[3] <= self.ttl:
+            rect, msg, color, _ = overlay
+            if rect:
+                x, y, w, h = rect
+                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 3)
+            cv2.rectangle(frame, (8, 8), (8 + len(msg) * 9 + 12, 36), (0, 0, 0), -1)
+            cv2.putText(frame, msg, (12, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        with profiling.stage("camera.render"):
+            cv2.imshow(self.title, frame)
+        return cv2.waitKey(1) & 0xFF != ord('q')
 
-            if qr_id in QR_list:
+    def close(self):
+        cv2.destroyAllWindows()
 
-                Present_studs.append(qr_id)
-                QR_list.remove(qr_id)
 
-                # Set message for 3 seconds
-                message_text = "Attendance Marked Successfully: " + qr_id
-                show_message = True
-                message_start_time = time.time()
+FEEDBACK = {"window": WindowFeedback, "led": LedFeedback, "none": NoFeedback}
 
-                cv2.putText(frame, "Attendance Marked: " + qr_id,
-                            (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6, (200, 200, 255), 2)
 
+# --- kiosk -------------------------------------------------------------------
 
+class HeadlessKiosk:
+    def __init__(self, session_row, feedback=None, device=0, width=None, height=None, workers=2):
+        self.session_row = session_row
+        self.feedback = feedback or NoFeedback()
+        self.camera = CameraManager(device, width, height)
+        self.decoder = FrameDecoder()
+        self.debouncer = Debouncer()
+        self.ingest = client_from_env()   # None -> direct DB writes only
+        self.stats = kiosk_stats.get()
+        self.stats.set_session(session_row.id, session_row.subject or "")
+        bus.subscribe(CAMERA_STATE, self._on_camera_state)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan-writer")
 
-            elif qr_id in Present_studs:
+    def run(self):
+        self.camera.acquire()
+        if not self.camera.wait_ready():
+            self.close()
+            raise RuntimeError(self.camera.error or f"Cannot open camera {self.camera.device}")
+        self.stats.set_active(True)
+        logger.info(f"Headless kiosk scanning for session {self.session_row.id} ({self.session_row.subject})")
+        try:
+            while True:
+                with profiling.loop_window("headless_loop"):
+                    ret, frame = self.camera.read(timeout=0.5)
+                    if not ret:
+                        continue
 
-                # message_text = "Attendance Already Marked: " + qr_id
-                # show_message = True
-                # message_start_time = time.time()
+                    for code in self.decoder.decode(frame):
+                        self._handle_scan(code.payload, code.rect)
+                    self.stats.frame_decoded()
 
-                cv2.putText(frame, "Attendance Already Marked: ",
-                            (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6, (0, 255, 0), 2)
+                    if not self.feedback.frame(frame):
+                        break
+                time.sleep(0.02)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
 
+    def _on_camera_state(self, event):
+        # runs in the camera thread; the watchdog already logs the change
+        if event.device != self.camera.device:
+            return
+        self.stats.set_camera(event.state)
+        if event.state in (capture.STALLED, capture.RECONNECTING, capture.FAILED):
+            self.feedback.show(None, f"Camera {event.state}")
+        elif event.state == capture.OK and self.stats.active:
+            self.feedback.show(STATUS, "Camera OK")     # recovered; not a scan, so no success light
 
-            else:
-                message_text = "Unknown QR Code"
-                show_message = True
-                message_start_time = time.time()
+    def _handle_scan(self, payload, rect):
+        now = time.time()
+        if not self.debouncer.accept(payload, now):
+            return
+        self.stats.scan_accepted()
+        # DB writes happen on the pool so decoding never waits on the network
+        self._pool.submit(self._process_payload, payload, rect, now)
 
-                cv2.putText(frame, "Unknown QR Code",
-                            (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6, (0, 0, 255), 2)
+    @profiling.profiled("process_payload")
+    @sql_telemetry.tracked("kiosk.scan")
+    def _process_payload(self, payload, rect, scanned_at=None):
+        result = None
+        ok = True
+        try:
+            is_checkin_time = attendance.in_checkin_window(self.session_row)
+            if self.ingest and self.ingest.available():
+                try:
+                    result = self.ingest.submit(self.session_row.id, payload, is_checkin_time, kiosk=self.stats.name)
+                except IngestUnavailable:
+                    result = None   # fall back to direct mode
+            if result is None:
+                db = KioskSessionLocal()
+                try:
+                    result = attendance.record_scan(db, self.session_row, payload, is_checkin_time)
+                except Exception:
+                    db.rollback()
+                    raise
+                finally:
+                    db.close()
+                if self.ingest and result.written:
+                    self.ingest.note_direct_write(self.session_row.id)
+            attendance.publish(self.session_row, result)
 
-        if show_message:
-            cv2.putText(frame,
-                        message_text,
-                        (20, frame.shape[0] - 20),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.8,
-                        (255, 255, 255), 3)
+            msg = result.message
+            if result.outcome == attendance.LATE:
+                msg = f"{msg} - use Late Check-IN at the faculty desk"
+            logger.info(f"{result.outcome}: {result.student_name or payload} (session {self.session_row.id})")
+            self.feedback.show(result.outcome, msg, rect)
+        except Exception as e:
+            ok = False
+            logger.error(f"Database error during processing payload: {e}")
+            self.feedback.show(None, "DB error", rect)
+        finally:
+            self.stats.write_finished(scanned_at, kind=result.written if result else None, ok=ok)
 
-            if time.time() - message_start_time > 3:
-                show_message = False
+    def close(self):
+        self.stats.set_active(False)
+        self._pool.shutdown(wait=True)
+        self.camera.close()
+        bus.unsubscribe(CAMERA_STATE, self._on_camera_state)
+        self.feedback.close()
+        logger.info("Headless kiosk stopped.")
 
-        # Heading
-        cv2.putText(frame,"Take Haajar",
-                    (20, 30), cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,(255, 180, 180), 1)
 
-        cv2.imshow("QR Scanner", frame)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless attendance kiosk.")
+    parser.add_argument("--session", type=int, required=True, help="session id to record attendance for")
+    parser.add_argument("--feedback", choices=sorted(FEEDBACK), default="led")
+    parser.add_argument("--device", type=int, default=0, help="camera index")
+    parser.add_argument("--width", type=int, help="capture width, e.g. 640 on slow boards")
+    parser.add_argument("--height", type=int, help="capture height")
+    args = parser.parse_args(argv)
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    session_row = load_session(args.session)
+    if session_row is None:
+        logger.error(f"Session {args.session} not found")
+        return 1
+    if not session_row.is_active:
+        logger.error(f"Session {args.session} is not active")
+        return 1
 
-    cap.release()
-    cv2.destroyAllWindows()
-    return Present_studs
-    # print("\nAttendance List:")
-    # print(Present_studs)
+    metrics.start_from_env()
+    kiosk = HeadlessKiosk(session_row, FEEDBACK[args.feedback](), args.device, args.width, args.height)
+    if kiosk.ingest:
+        start_stats_reporter(kiosk.ingest)
+    try:
+        kiosk.run()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    a=main()
-    print(a)
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Shared, always-warm camera capture.
+
+Opening a camera takes one to three seconds on kiosk hardware, and used to
+happen every time a scanner started. CameraManager opens the device once, in a
+background thread (app start calls start()), and keeps it streaming: while
+nobody is scanning it only grab()s frames so the driver buffer stays fresh and
+the device stays awake; while a scanner holds it (acquire / release) frames are
+decoded and handed out through read(), which has the cv2.VideoCapture
+signature.
+
+The backend and resolution that worked for a device are cached in
+HAAJAR_CAMERA_CACHE (default .camera_cache.json), so the next open goes straight
+to them instead of probing. HAAJAR_CAMERA_DEVICE picks the device (default 0).
+
+A watchdog keeps the device alive. The capture thread reopens it, with
+exponential backoff up to HAAJAR_CAMERA_BACKOFF_MAX seconds (default 30), after
+HAAJAR_CAMERA_MAX_FAILURES consecutive failed reads (default 20) or when no
+frame arrived for HAAJAR_CAMERA_STALL_SECONDS (default 3). A separate monitor
+thread catches reads that block instead of failing: it reports the stall and,
+if the read is still stuck, abandons that capture thread for a fresh one, with
+the same backoff. At most one abandoned thread (which still holds its device
+open) is kept: if the fresh one blocks too before the old one has returned, the
+camera is reported failed instead of opening it yet again.
+State changes (opening, ok, stalled, reconnecting, failed, closed) are
+published on the event bus as CAMERA_STATE and exported as metrics. Consumers
+are never interrupted: read() just times out until frames flow again.
+"""
+import json
+import os
+import platform
+import time
+from datetime import datetime
+from threading import Condition, Event, Lock, Thread
+import cv2
+from utils import metrics, profiling
+from utils.events import bus, CAMERA_STATE, CameraStateEvent
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_PATH = os.getenv("HAAJAR_CAMERA_CACHE", ".camera_cache.json")
+DEFAULT_DEVICE = int(os.getenv("HAAJAR_CAMERA_DEVICE", 0))
+STALL_SECONDS = float(os.getenv("HAAJAR_CAMERA_STALL_SECONDS", 3))
+MAX_READ_FAILURES = int(os.getenv("HAAJAR_CAMERA_MAX_FAILURES", 20))
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = float(os.getenv("HAAJAR_CAMERA_BACKOFF_MAX", 30))
+
+# Camera states
+OPENING = "opening"
+OK = "ok"
+STALLED = "stalled"             # no frame for STALL_SECONDS, read still blocked
+RECONNECTING = "reconnecting"   # device released, waiting to reopen
+FAILED = "failed"               # open failed, retrying with backoff
+CLOSED = "closed"
+_cache_lock = Lock()
+
+
+def _backends():
+    """(name, cv2 constant) to try, most specific first, for this platform."""
+    names = {
+        "Windows": ("CAP_DSHOW", "CAP_MSMF"),
+        "Linux": ("CAP_V4L2",),
+        "Darwin": ("CAP_AVFOUNDATION",),
+    }.get(platform.system(), ())
+    found = [(name, getattr(cv2, name)) for name in names if hasattr(cv2, name)]
+    return found + [("CAP_ANY", cv2.CAP_ANY)]
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(device, entry):
+    with _cache_lock:
+        cache = _load_cache()
+        cache[str(device)] = entry
+        tmp = f"{CACHE_PATH}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp, CACHE_PATH)
+        except OSError as e:
+            logger.warning(f"Could not write camera cache {CACHE_PATH}: {e}")
+
+
+class CameraManager:
+    def __init__(self, device=DEFAULT_DEVICE, width=None, height=None):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.backend = None         # name of the backend in use
+        self.resolution = None      # (width, height) actually delivered
+        self.error = None           # last open failure, shown by the UI
+        self.state = CLOSED
+        self.state_detail = None
+        self._cap = None
+        self._users = 0
+        self._frame = None
+        self._seq = 0               # bumps on every retrieved frame
+        self._read_seq = 0
+        self._last_frame = None     # monotonic time of the last good read or grab
+        self._generation = 0        # bumped to abandon a capture thread stuck in a read
+        self._abandoned = None      # the abandoned capture thread, until its read returns
+        self._good_reads = 0        # successful reads/grabs, to tell whether a reopen helped
+        self._ready = Event()       # set while the device is open
+        self._attempted = Event()   # set once an open attempt finished, successful or not
+        self._stop_event = Event()
+        self._new_frame = Condition()
+        self._lock = Lock()
+        self._thread = None
+        self._monitor = None
+        metrics.CAMERA_FRAME_AGE.labels(device=device).set_function(self.frame_age)
+
+    # --- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        """Open the device in the background and keep it warm. Idempotent."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._attempted.clear()
+            self._spawn()
+            self._monitor = Thread(target=self._watch, name=f"camera-{self.device}-watchdog", daemon=True)
+            self._monitor.start()
+
+    def close(self):
+        """Stop streaming and release the device (app exit)."""
+        self._stop_event.set()
+        with self._new_frame:
+            self._new_frame.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._set_state(CLOSED)
+
+    @property
+    def is_open(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """Wait for the first open attempt; True if the device is open (False on failure or timeout)."""
+        self._attempted.wait(timeout)
+        return self._ready.is_set()
+
+    def frame_age(self):
+        """Seconds since the device last delivered a frame (0 before the first open)."""
+        last = self._last_frame
+        return time.monotonic() - last if last is not None else 0.0
+
+    # --- consumers -----------------------------------------------------------
+
+    def acquire(self):
+        """Start handing out decoded frames (a scanner became visible)."""
+        self.start()
+        with self._lock:
+            self._users += 1
+            self._read_seq = self._seq
+
+    def release(self):
+        """Stop decoding frames; the device itself stays open and warm."""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+
+    def read(self, timeout=1.0):
+        """Next frame not yet returned, as (ok, frame) like cv2.VideoCapture.read()."""
+        deadline = time.monotonic() + timeout
+        with self._new_frame:
+            while self._seq == self._read_seq and not self._stop_event.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, None
+                self._new_frame.wait(remaining)
+            if self._seq == self._read_seq:
+                return False, None
+            self._read_seq = self._seq
+            return True, self._frame
+
+    # --- state ---------------------------------------------------------------
+
+    def _set_state(self, state, detail=None):
+        if state == self.state and detail == self.state_detail:
+            return
+        self.state, self.state_detail = state, detail
+        metrics.CAMERA_UP.labels(device=self.device).set(1 if state == OK else 0)
+        message = f"Camera {self.device} {state}" + (f": {detail}" if detail else "")
+        if state in (STALLED, RECONNECTING, FAILED):
+            logger.warning(message)
+        else:
+            logger.info(message)
+        bus.publish(CAMERA_STATE, CameraStateEvent(self.device, state, detail, datetime.now()))
+
+    # --- device --------------------------------------------------------------
+
+    def _try_open(self, backend_name, backend, width, height):
+        cap = cv2.VideoCapture(self.device, backend)
+        if not cap or not cap.isOpened():
+            return None
+        if width and height:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)     # ignored by backends without it
+        ok, _ = cap.read()
+        if not ok:
+            cap.release()
+            return None
+        self.backend = backend_name
+        self.resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        return cap
+
+    def _open(self):
+        """Open with the cached backend/resolution first, then probe the others."""
+        started = time.perf_counter()
+        backends = _backends()
+        cached = _load_cache().get(str(self.device))
+        width, height = self.width, self.height
+        if cached:
+            backends.sort(key=lambda b: b[0] != cached.get("backend"))
+            if not (width and height):
+                width, height = cached.get("width"), cached.get("height")
+
+        for backend_name, backend in backends:
+            cap = self._try_open(backend_name, backend, width, height)
+            if cap is None:
+                continue
+            elapsed = time.perf_counter() - started
+            logger.info(f"Camera {self.device} opened with {backend_name} at "
+                        f"{self.resolution[0]}x{self.resolution[1]} in {elapsed:.2f}s")
+            entry = {"backend": backend_name, "width": self.resolution[0], "height": self.resolution[1]}
+            if entry != cached:
+                _save_cache(self.device, entry)
+            self.error = None
+            return cap
+        self.error = f"Cannot open camera {self.device}"
+        return None
+
+    def _spawn(self, delay=0):
+        self._generation += 1
+        self._thread = Thread(target=self._run, args=(self._generation, delay),
+                              name=f"camera-{self.device}", daemon=True)
+        self._thread.start()
+
+    def _current(self, generation):
+        return generation == self._generation and not self._stop_event.is_set()
+
+    def _run(self, generation, delay=0):
+        """Open (after `delay` seconds), stream, and reopen with backoff until closed or abandoned."""
+        if delay:
+            self._stop_event.wait(delay)
+        backoff = BACKOFF_MIN
+        while self._current(generation):
+            self._set_state(OPENING)
+            cap = self._open()
+            if cap is None:
+                self._attempted.set()
+                self._set_state(FAILED, f"{self.error}, retrying in {backoff:.1f}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+                continue
+            self._cap = cap
+            self._last_frame = time.monotonic()
+            self._ready.set()
+            self._attempted.set()
+            self._set_state(OK)
+            try:
+                reason, delivered = self._stream(cap, generation)
+            finally:
+                if generation == self._generation:
+                    self._ready.clear()
+                try:
+                    cap.release()
+                except Exception:
+                    pass
+                if self._cap is cap:
+                    self._cap = None
+                logger.info(f"Camera {self.device} released")
+            if reason is None:
+                return
+            if delivered:
+                backoff = BACKOFF_MIN
+            metrics.CAMERA_RECONNECTS.labels(device=self.device).inc()
+            self._set_state(RECONNECTING, f"{reason}, reopening in {backoff:.1f}s")
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, BACKOFF_MAX)
+
+    def _stream(self, cap, generation):
+        """
+        Read (or grab, when idle) until stopped or the device misbehaves.
+        Returns (reason to reconnect or None when stopped, whether any frame arrived).
+        """
+        failures = 0
+        delivered = False
+        while self._current(generation):
+            reading = bool(self._users)
+            if reading:
+                with profiling.stage("camera.read"):
+                    ret, frame = cap.read()
+            else:
+                # idle: keep the stream running without decoding
+                ret, frame = cap.grab(), None
+            if not self._current(generation):
+                break
+            now = time.monotonic()
+            if ret:
+                failures = 0
+                delivered = True
+                self._good_reads += 1
+                self._last_frame = now
+                if self.state != OK:
+                    self._set_state(OK)     # recovered from a stall the monitor reported
+                if frame is not None:
+                    metrics.FRAMES_CAPTURED.inc()
+                    with self._new_frame:
+                        self._frame = frame
+                        self._seq += 1
+                        self._new_frame.notify_all()
+                continue
+            if reading:
+                metrics.FRAME_READ_FAILURES.inc()
+            failures += 1
+            if failures >= MAX_READ_FAILURES:
+                return f"{failures} consecutive read failures", delivered
+            if now - self._last_frame > STALL_SECONDS:
+                metrics.CAMERA_STALLS.labels(device=self.device).inc()
+                return f"no frame for {now - self._last_frame:.1f}s", delivered
+            time.sleep(0.05)
+        return None, delivered
+
+    def _watch(self):
+        """Catch reads that block instead of failing, which _stream cannot see."""
+        interval = min(1.0, STALL_SECONDS / 2)
+        backoff = BACKOFF_MIN
+        reads_at_abandon = None
+        while not self._stop_event.wait(interval):
+            if self._abandoned is not None and not self._abandoned.is_alive():
+                self._abandoned = None      # its read returned and it released the device
+            # a stuck read leaves the device "ready"; FAILED here means we gave up on it
+            if not self._ready.is_set() or self.state not in (OK, STALLED, FAILED):
+                continue
+            age = self.frame_age()
+            if age > STALL_SECONDS and self.state == OK:
+                metrics.CAMERA_STALLS.labels(device=self.device).inc()
+                self._set_state(STALLED, f"no frame for {age:.1f}s")
+            elif age > 3 * STALL_SECONDS and self.state in (STALLED, FAILED):
+                if self._abandoned is not None:
+                    # the last abandoned thread still holds the device: opening
+                    # another one would only pile up stuck threads and handles
+                    self._set_state(FAILED, "read blocked again while an earlier capture thread is stuck")
+                    continue
+                if reads_at_abandon is not None and self._good_reads != reads_at_abandon:
+                    backoff = BACKOFF_MIN   # the last reopen delivered frames
+                # the read never returned: leave that thread (it releases its
+                # device if the read ever comes back) and open a fresh one
+                with self._lock:
+                    self._abandoned = self._thread
+                    reads_at_abandon = self._good_reads
+                    self._ready.clear()
+                    metrics.CAMERA_RECONNECTS.labels(device=self.device).inc()
+                    self._set_state(RECONNECTING, f"read blocked for {age:.1f}s, reopening in {backoff:.1f}s")
+                    self._spawn(delay=backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+
+
+# Shared instance for the Tk app
+manager = CameraManager()
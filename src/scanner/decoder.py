@@ -0,0 +1,82 @@
+"""
+QR/barcode decoding shared by the Tk kiosk and the headless kiosk.
+
+Only OpenCV, pyzbar and the metrics/profiling hooks are imported here, so it is
+safe to use on devices without a display stack.
+"""
+import time
+from collections import namedtuple
+import cv2
+from pyzbar import pyzbar
+from utils import metrics, profiling
+from utils.logger import get_logger, SampledLogger
+
+Decoded = namedtuple("Decoded", "payload rect")
+# rect: (x, y, w, h) in frame coordinates, or None when the cv2 fallback found it
+
+DEBOUNCE_SECONDS = 1.5
+
+
+class FrameDecoder:
+    """pyzbar on the inverted frame, falling back to cv2.QRCodeDetector."""
+    def __init__(self):
+        self.logger = get_logger(self.__class__.__name__)
+        self.frame_log = SampledLogger(self.logger, interval=1.0)
+        self.cv2_detector = cv2.QRCodeDetector()
+        self._t_invert = metrics.DECODE_SECONDS.labels(stage="invert")
+        self._t_pyzbar = metrics.DECODE_SECONDS.labels(stage="pyzbar")
+        self._t_cv2 = metrics.DECODE_SECONDS.labels(stage="cv2")
+
+    def decode(self, frame):
+        """Return a list of Decoded for one BGR frame."""
+        # Invert frame for better detection
+        with self._t_invert.time():
+            inverted_frame = cv2.bitwise_not(frame)
+
+        # Method 1: pyzbar
+        with self._t_pyzbar.time(), profiling.stage("camera.decode"):
+            codes = pyzbar.decode(inverted_frame)
+        self.frame_log.debug("pyzbar", "QR-Codes: %s", codes)
+        metrics.FRAMES_DECODED.inc()
+
+        found = []
+        for code in codes:
+            try:
+                payload = code.data.decode("utf-8")
+            except Exception as e:
+                self.logger.error(f"Error decoding payload: {e}")
+                continue
+            rect = code.rect
+            found.append(Decoded(payload, (rect.left, rect.top, rect.width, rect.height)))
+        if codes:
+            self.frame_log.debug("detected", "Detected %d codes", len(codes))
+            return found
+
+        # Method 2: cv2 detector (fallback)
+        try:
+            with self._t_cv2.time():
+                data, bbox, _ = self.cv2_detector.detectAndDecode(frame)
+            if data:
+                self.frame_log.debug("cv2", "cv2 detected: %s", data)
+                found.append(Decoded(data, None))
+        except Exception as e:
+            self.logger.error(f"cv2 detection error: {e}")
+        return found
+
+
+class Debouncer:
+    """Drops repeats of the same payload seen within `window` seconds."""
+    def __init__(self, window=DEBOUNCE_SECONDS):
+        self.window = window
+        self.recent = {}        # payload -> last_seen_ts (float)
+
+    def accept(self, payload, now=None):
+        now = now or time.time()
+        if now - self.recent.get(payload, 0) < self.window:
+            metrics.SCANS.labels(outcome="debounced").inc()
+            return False
+        if len(self.recent) > 1000:
+            self.recent = {p: ts for p, ts in self.recent.items() if now - ts < self.window}
+        self.recent[payload] = now
+        metrics.SCANS.labels(outcome="accepted").inc()
+        return True
@@ -0,0 +1,124 @@
+"""
+Kiosk-side client for scanner/ingest_service.py.
+
+Enabled by HAAJAR_INGEST_URL (e.g. http://10.0.0.5:8765). When the service
+cannot be reached, or did not commit a scan, the client reports
+IngestUnavailable and stays in backoff for `retry_after` seconds, during which
+kiosks write directly to the database. A scan the service rejected (422) falls
+back for that scan only. Kiosks call note_direct_write() after writing a
+session themselves, so the next scan sent for it asks the service to re-read
+that session's registry rows.
+
+The same service collects every kiosk's live counters (utils/kiosk_stats.py):
+start_stats_reporter() posts this process's kiosks every few seconds
+(HAAJAR_KIOSK_REPORT_SECONDS, default 5) and the admin dashboard reads them all
+back with fetch_stats().
+"""
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from threading import Thread, Event
+from scanner.attendance import ScanResult
+from utils import kiosk_stats
+from utils.logger import get_logger
+
+
+class IngestUnavailable(Exception):
+    pass
+
+
+class IngestClient:
+    def __init__(self, url, token=None, timeout=2.0, retry_after=30):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.logger = get_logger(self.__class__.__name__)
+        self._down_until = 0.0
+        self._stale = set()     # sessions written directly since the service last saw them
+
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def note_direct_write(self, session_id):
+        self._stale.add(session_id)
+
+    def submit(self, session_id, payload, is_checkin_time, kiosk=None):
+        reload = session_id in self._stale
+        body = json.dumps({
+            "session_id": session_id,
+            "payload": payload,
+            "checkin": bool(is_checkin_time),
+            "kiosk": kiosk,
+            "reload": reload,
+        }).encode("utf-8")
+        req = urllib.request.Request(f"{self.url}/scan", data=body, method="POST",
+                                     headers={"Content-Type": "application/json"})
+        if self.token:
+            req.add_header("X-Haajar-Token", self.token)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                data = json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            if e.code != 422:
+                self._down_until = time.monotonic() + self.retry_after
+                self.logger.warning(f"Ingestion service failed ({e}); direct mode for {self.retry_after}s")
+            # 422: the service could not store this one scan; write it directly
+            raise IngestUnavailable(str(e)) from e
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            self._down_until = time.monotonic() + self.retry_after
+            self.logger.warning(f"Ingestion service unavailable ({e}); direct mode for {self.retry_after}s")
+            raise IngestUnavailable(str(e)) from e
+        if reload:
+            self._stale.discard(session_id)
+        return ScanResult(**{f: data.get(f) for f in ScanResult._fields})
+
+    def _call(self, path, body=None):
+        data = None if body is None else json.dumps(body, default=str).encode("utf-8")
+        req = urllib.request.Request(f"{self.url}{path}", data=data, method="GET" if data is None else "POST",
+                                     headers={"Content-Type": "application/json"})
+        if self.token:
+            req.add_header("X-Haajar-Token", self.token)
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read())
+
+    def report_stats(self, snaps):
+        """Send kiosk snapshots to the service; errors are the caller's to log."""
+        self._call("/kiosks", {"kiosks": snaps})
+
+    def fetch_stats(self):
+        """Latest snapshot of every kiosk that reported to the service."""
+        return self._call("/kiosks")["kiosks"]
+
+
+def start_stats_reporter(client, interval=None):
+    """Post this process's kiosk snapshots to the service every `interval` seconds."""
+    interval = interval or float(os.getenv("HAAJAR_KIOSK_REPORT_SECONDS", 5))
+    stop = Event()
+
+    def _loop():
+        failed = False
+        while not stop.wait(interval):
+            snaps = kiosk_stats.snapshots()
+            if not snaps:
+                continue
+            try:
+                client.report_stats(snaps)
+                failed = False
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                if not failed:      # once per outage, not every interval
+                    client.logger.warning(f"Could not report kiosk stats: {e}")
+                failed = True
+
+    Thread(target=_loop, daemon=True, name="kiosk-stats-reporter").start()
+    return stop
+
+
+def client_from_env():
+    url = os.getenv("HAAJAR_INGEST_URL")
+    if not url:
+        return None
+    return IngestClient(url, token=os.getenv("HAAJAR_INGEST_TOKEN"),
+                        timeout=float(os.getenv("HAAJAR_INGEST_TIMEOUT", 2.0)))
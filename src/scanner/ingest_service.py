@@ -0,0 +1,462 @@
+"""
+Central scan-ingestion service for many kiosks.
+
+Kiosks POST scans here instead of talking to MySQL themselves (see
+scanner/ingest_client.py). The service keeps rosters and per-session check-in
+state in memory (re-read from the database every HAAJAR_INGEST_SESSION_TTL
+seconds, default 30, and whenever a kiosk reports it wrote that session
+directly) and decides each scan immediately; a single writer thread
+commits the resulting registry inserts/updates and rollup counts in batches.
+A scan that writes is only acknowledged once its batch has committed.
+
+A batch that fails on bad data is split in halves until the offending rows are
+isolated; those go to a dead-letter file (HAAJAR_INGEST_DEAD_LETTER, default
+~/.haajar/ingest_dead_letter.jsonl) and their kiosks get a 422, while the rest
+of the batch is written. Any other failure (e.g. the database is down) fails
+the batch with a 503 so kiosks fall back to direct writes. Either way the
+session's in-memory state is dropped and reloaded from the database.
+
+    python -m scanner.ingest_service [--host 0.0.0.0] [--port 8765]
+
+API (JSON):
+    POST /scan    {"session_id", "payload", "checkin": bool, "kiosk", "reload": bool} -> ScanResult fields
+    GET  /health  {"status", "pending_writes", "sessions"}
+    POST /kiosks  {"kiosks": [kiosk_stats snapshot, ...]}     from each kiosk
+    GET  /kiosks  {"kiosks": [...]}   latest snapshot per kiosk, "age" in seconds
+
+Set HAAJAR_INGEST_TOKEN on both sides to require an X-Haajar-Token header.
+"""
+import argparse
+import json
+import os
+import queue
+import time
+from collections import namedtuple
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread, Event
+from sqlalchemy import select, insert, update, bindparam
+from sqlalchemy.exc import DataError, IntegrityError
+from db import KioskSessionLocal
+from models import Registry, Session, Student
+from scanner.attendance import ScanResult, normalize_payload, roster_index, CHECKED_IN, CHECKED_OUT, ALREADY_IN, LATE, UNKNOWN
+from utils import rollup, metrics
+from utils.logger import get_logger
+
+SessionInfo = namedtuple("SessionInfo", "id user_id subject_id faculty_id date")
+_Write = namedtuple("_Write", "kind info student_id at first ack")
+
+ROSTER_TTL = 300          # seconds before a roster is reloaded
+ROSTER_MISS_RELOAD = 30   # reload early on an unknown card, at most this often
+SESSION_TTL = float(os.getenv("HAAJAR_INGEST_SESSION_TTL", 30))   # seconds before check-in state is re-read
+ACK_TIMEOUT = float(os.getenv("HAAJAR_INGEST_ACK_TIMEOUT", 5))
+DEAD_LETTER_PATH = os.getenv("HAAJAR_INGEST_DEAD_LETTER") or os.path.join(
+    os.path.expanduser("~"), ".haajar", "ingest_dead_letter.jsonl")
+
+
+class WriteFailed(Exception):
+    """The scan's registry write was not committed; `rejected` when the row itself was bad."""
+    def __init__(self, message, rejected=False):
+        super().__init__(message)
+        self.rejected = rejected
+
+
+class _Ack:
+    """Completed by the writer thread once a write is committed or given up on."""
+    def __init__(self):
+        self._done = Event()
+        self.error = None
+
+    def set(self, error=None):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout):
+        return self._done.wait(timeout)
+
+
+class _SessionState:
+    def __init__(self, info, checked_in):
+        self.info = info
+        self.checked_in = checked_in    # student_id -> already checked out?
+        self.loaded_at = time.monotonic()
+        self.lock = Lock()
+
+    def merge(self, rows):
+        """
+        Fold in registry rows written elsewhere (direct-mode kiosks, late
+        check-ins, scheduler auto check-outs). Only adds or upgrades entries, so
+        writes still queued here are kept.
+        """
+        with self.lock:
+            for student_id, out in rows:
+                self.checked_in[student_id] = self.checked_in.get(student_id, False) or bool(out)
+            self.loaded_at = time.monotonic()
+
+
+class _Roster:
+    def __init__(self, by_key):
+        self.by_key = by_key            # payload -> (student_id, name, roll_no)
+        self.loaded_at = time.time()
+
+
+class IngestService:
+    def __init__(self, session_factory=KioskSessionLocal, flush_interval=0.2, batch_size=500,
+                 ack_timeout=ACK_TIMEOUT, dead_letter_path=DEAD_LETTER_PATH):
+        self.logger = get_logger(self.__class__.__name__)
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.ack_timeout = ack_timeout
+        self.dead_letter_path = dead_letter_path
+        self._sessions = {}
+        self._rosters = {}
+        self._kiosks = {}               # kiosk name -> (received at, snapshot)
+        self._lock = Lock()
+        self._writes = queue.Queue()
+        self._stop_event = Event()
+        self._writer = Thread(target=self._writer_loop, daemon=True, name="ingest-writer")
+        self._writer.start()
+
+    # --- state -----------------------------------------------------------
+
+    def _registry_state(self, db, session_id):
+        return db.execute(
+            select(Registry.student_id, Registry.check_out_time.isnot(None))
+            .where(Registry.session_id == session_id)
+        ).all()
+
+    def _session_state(self, session_id, reload=False):
+        state = self._sessions.get(session_id)
+        if state is not None:
+            if reload or time.monotonic() - state.loaded_at > SESSION_TTL:
+                db = self.session_factory()
+                try:
+                    state.merge(self._registry_state(db, session_id))
+                finally:
+                    db.close()
+            return state
+        db = self.session_factory()
+        try:
+            row = db.execute(
+                select(Session.id, Session.user_id, Session.subject_id, Session.faculty_id, Session.date)
+                .where(Session.id == session_id)
+            ).first()
+            if row is None:
+                return None
+            existing = self._registry_state(db, session_id)
+        finally:
+            db.close()
+        state = _SessionState(SessionInfo(*row), {sid: bool(out) for sid, out in existing})
+        with self._lock:
+            return self._sessions.setdefault(session_id, state)
+
+    def _load_roster(self, user_id):
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(Student.id, Student.name, Student.roll_no, Student.admission_no)
+                .where(Student.user_id == user_id)
+            ).all()
+        finally:
+            db.close()
+        by_key = {key: (row.id, row.name, row.roll_no) for key, row in roster_index(rows).items()}
+        roster = _Roster(by_key)
+        with self._lock:
+            self._rosters[user_id] = roster
+        return roster
+
+    def _lookup(self, user_id, key):
+        roster = self._rosters.get(user_id)
+        if roster is None or time.time() - roster.loaded_at > ROSTER_TTL:
+            roster = self._load_roster(user_id)
+        student = roster.by_key.get(key)
+        if student is None and time.time() - roster.loaded_at > ROSTER_MISS_RELOAD:
+            student = self._load_roster(user_id).by_key.get(key)
+        return student
+
+    # --- scans -----------------------------------------------------------
+
+    def submit(self, session_id, payload, is_checkin_time, kiosk=None, reload=False):
+        """
+        Decide the outcome from in-memory state, queue the DB write and wait
+        for it to commit. Raises WriteFailed if it did not. `reload` re-reads
+        the session's registry rows first (the kiosk wrote some directly).
+        """
+        result, ack = self._decide(session_id, payload, is_checkin_time, reload)
+        if ack is not None:
+            if not ack.wait(self.ack_timeout):
+                metrics.INGEST_SCANS.labels(kiosk=kiosk or "-", outcome="write_timeout").inc()
+                raise WriteFailed(f"Write not committed within {self.ack_timeout}s")
+            if ack.error is not None:
+                metrics.INGEST_SCANS.labels(kiosk=kiosk or "-", outcome="write_failed").inc()
+                raise WriteFailed(str(ack.error), rejected=isinstance(ack.error, (IntegrityError, DataError)))
+        metrics.INGEST_SCANS.labels(kiosk=kiosk or "-", outcome=result.outcome).inc()
+        return result
+
+    def _decide(self, session_id, payload, is_checkin_time, reload=False):
+        """(ScanResult, _Ack of the queued write or None)."""
+        state = self._session_state(session_id, reload)
+        key = normalize_payload(payload)
+        if state is None:
+            return ScanResult(UNKNOWN, None, None, f"Unknown session: {session_id}", None), None
+
+        student = self._lookup(state.info.user_id, key)
+        if student is None:
+            return ScanResult(UNKNOWN, None, None, f"Unknown QR: {key}", None), None
+        student_id, name, roll_no = student
+
+        now = datetime.now()
+        with state.lock:
+            if student_id not in state.checked_in:
+                if not is_checkin_time:
+                    return ScanResult(LATE, student_id, name, f"Late: {name}", None, roll_no), None
+                state.checked_in[student_id] = False
+                ack = self._queue("in", state.info, student_id, now, True)
+                return ScanResult(CHECKED_IN, student_id, name, f"Checked IN: {name}", "in", roll_no), ack
+
+            if is_checkin_time:
+                return ScanResult(ALREADY_IN, student_id, name, f"Already Checked IN: {name}", None, roll_no), None
+
+            first = not state.checked_in[student_id]
+            state.checked_in[student_id] = True
+            ack = self._queue("out", state.info, student_id, now, first)
+            return ScanResult(CHECKED_OUT, student_id, name, f"Checked OUT: {name}", "out" if first else None, roll_no), ack
+
+    def _queue(self, kind, info, student_id, at, first):
+        ack = _Ack()
+        self._writes.put(_Write(kind, info, student_id, at, first, ack))
+        return ack
+
+    def _forget_session(self, session_id):
+        """Drop cached state so the next scan reloads it from the database."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def pending_writes(self):
+        return self._writes.qsize()
+
+    # --- kiosk stats -----------------------------------------------------
+
+    def report_kiosks(self, snaps):
+        now = time.monotonic()
+        with self._lock:
+            for snap in snaps:
+                self._kiosks[str(snap["name"])] = (now, snap)
+
+    def kiosk_snapshots(self):
+        now = time.monotonic()
+        with self._lock:
+            kiosks = list(self._kiosks.values())
+        return [dict(snap, age=now - received) for received, snap in kiosks]
+
+    # --- batched writer --------------------------------------------------
+
+    def _writer_loop(self):
+        batch = []
+        while not (self._stop_event.is_set() and self._writes.empty() and not batch):
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._writes.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            self._write(batch)
+            batch = []
+
+    def _write(self, batch):
+        """Commit a batch, splitting it to isolate rows the database rejects."""
+        try:
+            self._flush(batch)
+        except (IntegrityError, DataError) as e:
+            if len(batch) == 1:
+                self._dead_letter(batch[0], e)
+            else:
+                mid = len(batch) // 2
+                self._write(batch[:mid])
+                self._write(batch[mid:])
+            return
+        except Exception as e:
+            # not the rows' fault (connection lost, lock timeout, ...): fail
+            # them so kiosks fall back to direct writes instead of waiting
+            self.logger.error(f"Batch write of {len(batch)} scans failed: {e}")
+            for w in batch:
+                self._fail(w, e)
+            time.sleep(min(5.0, self.flush_interval * 10))
+            return
+        for w in batch:
+            w.ack.set()
+
+    def _fail(self, write, error):
+        self._forget_session(write.info.id)     # in-memory state assumed the write
+        write.ack.set(error)
+
+    def _dead_letter(self, write, error):
+        metrics.INGEST_DEAD_LETTERS.inc()
+        reason = str(error).splitlines()[0]
+        self.logger.error(f"Rejected {write.kind} of student {write.student_id} in session {write.info.id}: {reason}")
+        record = {
+            "kind": write.kind, "session_id": write.info.id, "student_id": write.student_id,
+            "at": write.at.isoformat(), "error": reason,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            self.logger.error(f"Could not write dead letter {record}: {e}")
+        self._fail(write, error)
+
+    def _flush(self, batch):
+        check_ins = [w for w in batch if w.kind == "in"]
+        check_outs = [w for w in batch if w.kind == "out"]
+
+        db = self.session_factory()
+        try:
+            with metrics.DB_QUERY_SECONDS.labels(kind="ingest_batch").time():
+                conn = db.connection()
+                if check_ins:
+                    conn.execute(insert(Registry), [
+                        {"student_id": w.student_id, "session_id": w.info.id, "check_in_time": w.at.time(), "check_out_time": None,
+                         "checked_in_at": w.at}
+                        for w in check_ins
+                    ])
+                if check_outs:
+                    conn.execute(
+                        update(Registry)
+                        .where(Registry.session_id == bindparam("s_id"), Registry.student_id == bindparam("st_id"))
+                        .values(check_out_time=bindparam("at"), checked_out_at=bindparam("at_dt")),
+                        [{"s_id": w.info.id, "st_id": w.student_id, "at": w.at.time(), "at_dt": w.at}
+                         for w in check_outs],
+                    )
+
+                totals = {}
+                for w in batch:
+                    present, out = totals.get(w.info, (0, 0))
+                    if w.kind == "in":
+                        present += 1
+                    elif w.first:
+                        out += 1
+                    totals[w.info] = (present, out)
+                for info, (present, out) in totals.items():
+                    if present or out:
+                        rollup.bump(db, info, present=present, checked_out=out)
+
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.logger.debug(f"Flushed {len(check_ins)} check-ins, {len(check_outs)} check-outs")
+
+    def close(self, timeout=10):
+        """Stop the writer thread once the queue is drained."""
+        self._stop_event.set()
+        self._writer.join(timeout)
+
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    service = None
+    token = None
+
+    def _reply(self, code, body):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        return not self.token or self.headers.get("X-Haajar-Token") == self.token
+
+    def do_GET(self):
+        if self.path == "/kiosks":
+            self._reply(200, {"kiosks": self.service.kiosk_snapshots()})
+            return
+        if self.path != "/health":
+            self._reply(404, {"error": "not found"})
+            return
+        self._reply(200, {
+            "status": "ok",
+            "pending_writes": self.service.pending_writes(),
+            "sessions": len(self.service._sessions),
+        })
+
+    def do_POST(self):
+        if self.path not in ("/scan", "/kiosks"):
+            self._reply(404, {"error": "not found"})
+            return
+        if not self._authorized():
+            self._reply(403, {"error": "forbidden"})
+            return
+        if self.path == "/kiosks":
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                self.service.report_kiosks(json.loads(self.rfile.read(length) or b"{}")["kiosks"])
+            except (KeyError, TypeError, ValueError) as e:
+                self._reply(400, {"error": f"bad request: {e}"})
+                return
+            self._reply(200, {"status": "ok"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            result = self.service.submit(
+                int(req["session_id"]), str(req["payload"]), bool(req.get("checkin", True)), req.get("kiosk"),
+                bool(req.get("reload", False)),
+            )
+        except (KeyError, ValueError) as e:
+            self._reply(400, {"error": f"bad request: {e}"})
+            return
+        except WriteFailed as e:
+            # 422: this scan's row was rejected; 503: try again / write directly
+            self._reply(422 if e.rejected else 503, {"error": str(e)})
+            return
+        except Exception as e:
+            self.service.logger.error(f"Scan handling failed: {e}")
+            self._reply(500, {"error": str(e)})
+            return
+        self._reply(200, result._asdict())
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8765, service=None):
+    service = service or IngestService()
+    handler = type("IngestHandler", (_IngestHandler,), {
+        "service": service,
+        "token": os.getenv("HAAJAR_INGEST_TOKEN"),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    service.logger.info(f"Ingestion service listening on http://{host}:{server.server_address[1]}")
+    return server, service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Central scan-ingestion service.")
+    parser.add_argument("--host", default=os.getenv("HAAJAR_INGEST_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("HAAJAR_INGEST_PORT", 8765)))
+    args = parser.parse_args(argv)
+
+    metrics.start_from_env()
+    server, service = serve(args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+from threading import Thread
+from scanner.ingest_client import client_from_env
+from utils import kiosk_stats, profiling
+from utils.logger import get_logger
+
+class AdminDashboard(tb.Frame):
+    """
+    Live per-kiosk dashboard. Reads in-process counters from utils/kiosk_stats.py
+    once a second; it never queries the database. With HAAJAR_INGEST_URL set it
+    also shows the kiosks of other machines, fetched from the ingestion service
+    in a background thread.
+    """
+    REFRESH_MS = 1000
+    REMOTE_MS = 3000
+    LAGGING_LATENCY = 1.0   # seconds, average scan -> commit
+    LAGGING_PENDING = 5     # queued DB writes
+
+    def __init__(self, master, **kw):
+        super().__init__(master, **kw)
+        self.logger = get_logger(self.__class__.__name__)
+        self.ingest = client_from_env()
+        self._fetching = False
+
+        self.active_var = tb.StringVar(value="0")
+        self.present_var = tb.StringVar(value="0")
+        self.rate_var = tb.StringVar(value="0")
+        self.pending_var = tb.StringVar(value="0")
+        self.profiling_var = tb.BooleanVar(value=profiling.is_enabled())
+
+        self.create_widgets()
+        self._refresh()
+        if self.ingest:
+            self._fetch_remote()
+
+    def create_widgets(self):
+        summary = tb.Labelframe(self, text="Live Overview", padding=15, bootstyle="info")
+        summary.pack(fill=X, padx=10, pady=5)
+
+        for col, (title, var) in enumerate((
+            ("Active Sessions", self.active_var),
+            ("Present", self.present_var),
+            ("Scans / min", self.rate_var),
+            ("Pending DB Writes", self.pending_var),
+        )):
+            summary.columnconfigure(col, weight=1)
+            card = tb.Frame(summary, padding=10)
+            card.grid(row=0, column=col, sticky=EW)
+            tb.Label(card, textvariable=var, font=("Segoe UI", 24, "bold"), bootstyle="primary").pack(anchor=W)
+            tb.Label(card, text=title, font=("Segoe UI", 11), bootstyle="secondary").pack(anchor=W)
+
+        # Field diagnostics (see utils/profiling.py)
+        tools = tb.Frame(self, padding=(10, 0))
+        tools.pack(fill=X)
+        tb.Checkbutton(tools, text="Profiling", variable=self.profiling_var, bootstyle="round-toggle", command=self._toggle_profiling).pack(side=LEFT)
+        tb.Button(tools, text="Dump Profile", bootstyle="secondary-outline", command=self._dump_profile).pack(side=LEFT, padx=10)
+        self.profile_status = tb.Label(tools, text="", bootstyle="secondary")
+        self.profile_status.pack(side=LEFT)
+
+        table_frame = tb.Frame(self, padding=10)
+        table_frame.pack(fill=BOTH, expand=YES)
+
+        columns = (
+            ("kiosk", "Kiosk", 140),
+            ("session", "Session", 70),
+            ("subject", "Subject", 150),
+            ("status", "Status", 80),
+            ("present", "Present", 70),
+            ("checked_out", "Checked Out", 90),
+            ("scans", "Scans/min", 80),
+            ("latency", "Latency (ms)", 100),
+            ("fps", "Decode FPS", 80),
+            ("pending", "Pending", 70),
+            ("errors", "Errors", 60),
+        )
+        self.tree = tb.Treeview(table_frame, columns=[c[0] for c in columns], show="headings", bootstyle="info")
+        for col, heading, width in columns:
+            self.tree.heading(col, text=heading)
+            self.tree.column(col, width=width)
+        self.tree.tag_configure("lagging", background="#8a3b12")
+
+        scrollbar = tb.Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        self.tree.pack(side=LEFT, fill=BOTH, expand=YES)
+        scrollbar.pack(side=RIGHT, fill=Y)
+
+    def _refresh(self):
+        snaps = kiosk_stats.all_snapshots()
+
+        self.active_var.set(str(sum(1 for s in snaps if s["active"] and s.get("age", 0) <= kiosk_stats.STALE_SECONDS)))
+        self.present_var.set(str(sum(s["present"] for s in snaps)))
+        self.rate_var.set(str(sum(s["scans_per_min"] for s in snaps)))
+        self.pending_var.set(str(sum(s["pending_writes"] for s in snaps)))
+
+        seen = set()
+        for s in snaps:
+            iid = s["name"]
+            seen.add(iid)
+            values = (
+                s["name"],
+                s["session_id"] or "-",
+                s["subject"],
+                self._fmt_status(s),
+                s["present"],
+                s["checked_out"],
+                s["scans_per_min"],
+                self._fmt_latency(s),
+                f"{s['decode_fps']:.1f}",
+                s["pending_writes"],
+                s["errors"],
+            )
+            tags = ("lagging",) if self._is_lagging(s) else ()
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values, tags=tags)
+            else:
+                self.tree.insert("", END, iid=iid, values=values, tags=tags)
+
+        for iid in self.tree.get_children():
+            if iid not in seen:
+                self.tree.delete(iid)
+
+        self.after(self.REFRESH_MS, self._refresh)
+
+    def _fetch_remote(self):
+        if not self._fetching:
+            self._fetching = True
+            Thread(target=self._fetch_remote_worker, daemon=True).start()
+        self.after(self.REMOTE_MS, self._fetch_remote)
+
+    def _fetch_remote_worker(self):
+        try:
+            kiosk_stats.set_remote(self.ingest.fetch_stats())
+        except Exception as e:
+            self.logger.debug(f"Could not fetch kiosk stats: {e}")
+        finally:
+            self._fetching = False
+
+    def _toggle_profiling(self):
+        if self.profiling_var.get():
+            profiling.enable()
+            self.profile_status.config(text="Profiling on")
+        else:
+            profiling.disable()
+            self.profile_status.config(text="Profiling off")
+
+    def _dump_profile(self):
+        path = profiling.dump_now()
+        self.profile_status.config(text=f"Dumped to {path}" if path else "Profiling is off")
+
+    def _fmt_latency(self, s):
+        if s["latency_last"] is None:
+            return "-"
+        return f"{s['latency_last'] * 1000:.0f} / {s['latency_avg'] * 1000:.0f} avg"
+
+    def _fmt_status(self, s):
+        if s.get("age", 0) > kiosk_stats.STALE_SECONDS:
+            return "Offline"
+        if not s["active"]:
+            return "Stopped"
+        if s["camera"] not in (None, "ok"):
+            return f"Camera {s['camera']}"
+        return "Scanning"
+
+    def _is_lagging(self, s):
+        if s.get("age", 0) > kiosk_stats.STALE_SECONDS:
+            return True
+        if s["pending_writes"] >= self.LAGGING_PENDING:
+            return True
+        if s["latency_avg"] is not None and s["latency_avg"] >= self.LAGGING_LATENCY:
+            return True
+        # camera running but no frames decoded recently, or the watchdog reports trouble
+        return s["active"] and (s["decode_fps"] == 0 or s["camera"] not in (None, "ok"))
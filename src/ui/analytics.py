@@ -0,0 +1,236 @@
+import ttkbootstrap as tb
+from ttkbootstrap.constants import *
+from ttkbootstrap.dialogs import Messagebox
+from ttkbootstrap.widgets import DateEntry
+from threading import Thread
+from db import ReadSessionLocal
+from utils import analytics, sql_telemetry
+from utils.ref_cache import ref_cache
+from datetime import date
+
+class AnalyticsTab(tb.Frame):
+    """
+    Attendance analytics. All aggregation runs in SQL (see utils/analytics.py);
+    this tab only renders the summarised rows.
+    """
+    def __init__(self, master, current_user=None, **kw):
+        super().__init__(master, **kw)
+        self.current_user = current_user
+
+        # Variables
+        self.faculty_var = tb.StringVar()
+        self.subject_var = tb.StringVar()
+
+        self.faculty_map = {} # Name -> ID
+        self.subject_map = {} # Title -> ID
+
+        self.current_filters = {}
+
+        self.create_widgets()
+        self.load_filter_data()
+
+    def create_widgets(self):
+        # Filter Frame
+        filter_frame = tb.Labelframe(self, text="Filters", padding=10)
+        filter_frame.pack(fill=X, padx=10, pady=5)
+
+        # Row 0: Date Range
+        tb.Label(filter_frame, text="Start Date:").grid(row=0, column=0, padx=5, pady=5, sticky=W)
+        self.start_date_entry = DateEntry(filter_frame, bootstyle="primary", firstweekday=0, startdate=date.today().replace(day=1), dateformat='%Y-%m-%d')
+        self.start_date_entry.grid(row=0, column=1, padx=5, pady=5, sticky=W)
+
+        tb.Label(filter_frame, text="End Date:").grid(row=0, column=2, padx=5, pady=5, sticky=W)
+        self.end_date_entry = DateEntry(filter_frame, bootstyle="primary", firstweekday=0, startdate=date.today(), dateformat='%Y-%m-%d')
+        self.end_date_entry.grid(row=0, column=3, padx=5, pady=5, sticky=W)
+
+        # Row 1: Faculty & Subject
+        tb.Label(filter_frame, text="Faculty:").grid(row=1, column=0, padx=5, pady=5, sticky=W)
+        self.faculty_cb = tb.Combobox(filter_frame, textvariable=self.faculty_var, state="readonly")
+        self.faculty_cb.grid(row=1, column=1, padx=5, pady=5, sticky=W)
+
+        tb.Label(filter_frame, text="Subject:").grid(row=1, column=2, padx=5, pady=5, sticky=W)
+        self.subject_cb = tb.Combobox(filter_frame, textvariable=self.subject_var, state="readonly")
+        self.subject_cb.grid(row=1, column=3, padx=5, pady=5, sticky=W)
+
+        # Buttons
+        btn_frame = tb.Frame(filter_frame)
+        btn_frame.grid(row=2, column=0, columnspan=4, pady=10)
+
+        tb.Button(btn_frame, text="Run", bootstyle="primary", command=self.run_reports).pack(side=LEFT, padx=5)
+        tb.Button(btn_frame, text="Refresh", bootstyle="secondary", command=lambda: self.run_reports(use_cache=False)).pack(side=LEFT, padx=5)
+
+        # Report notebook
+        notebook = tb.Notebook(self)
+        notebook.pack(fill=BOTH, expand=YES, padx=10, pady=5)
+
+        self.student_tree = self._make_tree(notebook, "Student Attendance", (
+            ("roll_no", "Roll No", 100),
+            ("student_name", "Student Name", 200),
+            ("subject", "Subject", 150),
+            ("held", "Held", 70),
+            ("attended", "Attended", 80),
+            ("late", "Late", 70),
+            ("percentage", "Attendance %", 100),
+        ))
+        self.session_tree = self._make_tree(notebook, "Session Summary", (
+            ("id", "ID", 50),
+            ("date", "Date", 100),
+            ("time", "Time", 100),
+            ("subject", "Subject", 150),
+            ("faculty", "Faculty", 150),
+            ("present", "Present", 80),
+            ("late", "Late", 70),
+            ("absent", "Absent", 80),
+            ("avg_late", "Avg Late (min)", 100),
+            ("avg_stay", "Avg Stay (min)", 100),
+        ))
+        self.absentee_tree = self._make_tree(notebook, "Absentees", (
+            ("session_id", "Session", 70),
+            ("date", "Date", 100),
+            ("subject", "Subject", 150),
+            ("roll_no", "Roll No", 100),
+            ("student_name", "Student Name", 200),
+        ))
+        self.scan_tree = self._make_tree(notebook, "Scans", (
+            ("roll_no", "Roll No", 100),
+            ("student_name", "Student Name", 200),
+            ("checked_in", "Checked In", 150),
+            ("checked_out", "Checked Out", 150),
+            ("stay", "Stay (min)", 80),
+        ))
+
+        # Absentees and scans are listed per session: double-click one in the summary
+        self.session_tree.bind("<Double-1>", self.on_session_double_click)
+        self.notebook = notebook
+
+        self.status = tb.Label(self, text="Double-click a session to list its absentees and scans.", bootstyle="secondary")
+        self.status.pack(anchor=W, padx=10, pady=(0, 5))
+
+    def _make_tree(self, notebook, title, columns):
+        frame = tb.Frame(notebook, padding=5)
+        notebook.add(frame, text=title)
+
+        tree = tb.Treeview(frame, columns=[c[0] for c in columns], show="headings", bootstyle="info")
+        for col, heading, width in columns:
+            tree.heading(col, text=heading)
+            tree.column(col, width=width)
+
+        scrollbar = tb.Scrollbar(frame, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+
+        tree.pack(side=LEFT, fill=BOTH, expand=YES)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        return tree
+
+    def load_filter_data(self):
+        faculties = ref_cache.faculties(self.current_user.id)
+        subjects = ref_cache.subjects(self.current_user.id)
+
+        self.faculty_map = {f.name: f.id for f in faculties.values()}
+        self.subject_map = {s.title: s.id for s in subjects.values()}
+
+        self.faculty_cb['values'] = list(self.faculty_map.keys())
+        self.subject_cb['values'] = list(self.subject_map.keys())
+
+    def get_filters(self):
+        filters = {}
+
+        s_date = self.start_date_entry.entry.get()
+        e_date = self.end_date_entry.entry.get()
+
+        if s_date:
+            filters['start_date'] = s_date
+        if e_date:
+            filters['end_date'] = e_date
+
+        f_name = self.faculty_var.get()
+        if f_name in self.faculty_map:
+            filters['faculty_id'] = self.faculty_map[f_name]
+
+        s_title = self.subject_var.get()
+        if s_title in self.subject_map:
+            filters['subject_id'] = self.subject_map[s_title]
+
+        return filters
+
+    def run_reports(self, use_cache=True):
+        self.current_filters = self.get_filters()
+        self.status.config(text="Running reports...")
+        self._in_background(self._query_reports, self._show_reports, "Error running reports",
+                            self.current_filters, use_cache)
+
+    @sql_telemetry.tracked("analytics.run")
+    def _query_reports(self, filters, use_cache):
+        session = ReadSessionLocal()
+        try:
+            students = analytics.student_attendance(session, self.current_user.id, filters, use_cache=use_cache)
+            sessions = analytics.session_summary(session, self.current_user.id, filters, use_cache=use_cache)
+        finally:
+            session.close()
+        return students, sessions
+
+    def _show_reports(self, result):
+        students, sessions = result
+        self._fill(self.student_tree, (
+            (roll, name, subject, held, attended, late, f"{pct:.1f}")
+            for _id, name, roll, subject, held, attended, late, pct in students
+        ))
+        self._fill(self.session_tree, (
+            row[:8] + tuple("" if m is None else m for m in row[8:])
+            for row in sessions
+        ))
+        self._fill(self.absentee_tree, ())
+        self._fill(self.scan_tree, ())
+        self.status.config(text="Double-click a session to list its absentees and scans.")
+
+    def on_session_double_click(self, event):
+        item = self.session_tree.identify_row(event.y)
+        if not item:
+            return
+        session_id = self.session_tree.item(item)['values'][0]
+        self.status.config(text=f"Loading absentees of session {session_id}...")
+        self._in_background(self._query_session_detail, self._show_session_detail, "Error fetching absentees",
+                            session_id, self.current_filters)
+
+    def _query_session_detail(self, session_id, filters):
+        session = ReadSessionLocal()
+        try:
+            absent = analytics.absentees(session, self.current_user.id, session_id, filters)
+            scans = analytics.session_scans(session, self.current_user.id, session_id, filters)
+        finally:
+            session.close()
+        return absent, scans
+
+    def _show_session_detail(self, result):
+        absent, scans = result
+        self._fill(self.absentee_tree, (
+            (sid, sdate, subject, roll, name)
+            for sid, sdate, subject, _id, roll, name in absent
+        ))
+        self._fill(self.scan_tree, (
+            (roll, name, in_at or "", out_at or "", "" if stay is None else stay)
+            for roll, name, in_at, out_at, stay in scans
+        ))
+        self.status.config(text=f"{len(absent)} absentees, {len(scans)} scans.")
+        self.notebook.select(2)
+
+    def _in_background(self, query, show, error_title, *args):
+        """Run `query(*args)` in a worker thread and hand the result to `show` on the Tk thread."""
+        def work():
+            try:
+                result = query(*args)
+            except Exception as e:
+                self.after(0, lambda err=e: self._on_error(error_title, err))
+                return
+            self.after(0, lambda: show(result))
+
+        Thread(target=work, daemon=True).start()
+
+    def _on_error(self, title, error):
+        self.status.config(text="")
+        Messagebox.show_error(f"{title}: {error}", "Database Error")
+
+    def _fill(self, tree, rows):
+        tree.delete(*tree.get_children())
+        for row in rows:
+            tree.insert("", END, values=tuple(row))
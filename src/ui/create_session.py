@@ -5,7 +5,10 @@ from datetime import datetime, date, time, timedelta
 
 try:
     from db import SessionLocal
-    from models import Session as SessionModel, Subject as SubjectModel, Faculty as FacultyModel
+    from models import Session as SessionModel
+    from utils.ref_cache import ref_cache
+    from utils.lifecycle import scheduler
+    from utils import timetable
 except Exception as e:
     print("!!Exception in importing SessionLocal from db.py", e)
 
@@ -21,16 +24,13 @@ class CreateSessionTab(tb.Frame):
         self.current_user = current_user
 
         try:
-            db = SessionLocal()
-            # Filter by current user
-            self.subjects = db.query(SubjectModel).filter(SubjectModel.user_id == self.current_user.id).all() or []
-            self.faculties = db.query(FacultyModel).filter(FacultyModel.user_id == self.current_user.id).all() or []
+            # Shared per-department reference data (see utils/ref_cache.py)
+            self.subjects = list(ref_cache.subjects(self.current_user.id).values())
+            self.faculties = list(ref_cache.faculties(self.current_user.id).values())
         except Exception as e:
             print("Exception in fetching sub and fac: ",e)
             self.subjects = []
             self.faculties = []
-        finally:
-            db.close()
 
         tb.Label(self, text="Create New Session", font=("Segoe UI", 16, "bold"), bootstyle="primary").pack(pady=(12, 8))
 
@@ -85,11 +85,21 @@ class CreateSessionTab(tb.Frame):
         create_btn = tb.Button(buttons, text="Create Session", bootstyle="success", command=self._on_create_clicked)
         create_btn.pack(side="right", padx=(8, 0))
         tb.Button(buttons, text="Clear", bootstyle="secondary", command=self.clear_form).pack(side="right")
+        tb.Button(buttons, text="Timetable...", bootstyle="info-outline", command=self._open_timetable).pack(side="left")
 
         # grid weights for responsive layout
         form.columnconfigure(1, weight=1)
 
+    def _open_timetable(self):
+        TimetableDialog(self, self.subjects, self.faculties, self.current_user)
+
     def clear_form(self):
+        # also picks up subjects and faculty added since the tab was built
+        ref_cache.invalidate(self.current_user.id)
+        self.subjects = list(ref_cache.subjects(self.current_user.id).values())
+        self.faculties = list(ref_cache.faculties(self.current_user.id).values())
+        self.subject_cb['values'] = [subject.title for subject in self.subjects]
+        self.faculty_cb['values'] = [fac.name for fac in self.faculties]
         if self.subjects:
             self.subject_cb.set(self.subjects[0].title)
         if self.faculties:
@@ -150,20 +160,20 @@ class CreateSessionTab(tb.Frame):
         start_dt = datetime.combine(d, time(hour=start_h, minute=start_m))
         end_dt = datetime.combine(d, time(hour=end_h, minute=end_m))
 
+        # resolve ids from the cached reference data
+        subj = ref_cache.subject_by_title(self.current_user.id, subject_title)
+        if subj is None:
+            messagebox.showerror("DB", f"Subject '{subject_title}' not found in DB.")
+            return
+
+        fac = ref_cache.faculty_by_name(self.current_user.id, faculty_name)
+        if fac is None:
+            messagebox.showerror("DB", f"Faculty '{faculty_name}' not found in DB.")
+            return
+
         # persist to DB
         db = SessionLocal()
         try:
-            # find subject by title
-            subj = db.query(SubjectModel).filter(SubjectModel.title == subject_title).first()
-            if subj is None:
-                messagebox.showerror("DB", f"Subject '{subject_title}' not found in DB.")
-                return
-
-            fac = db.query(FacultyModel).filter(FacultyModel.name == faculty_name).first()
-            if fac is None:
-                messagebox.showerror("DB", f"Faculty '{faculty_name}' not found in DB.")
-                return
-
             new_session = SessionModel(
                 subject_id=subj.id,
                 faculty_id=fac.id,
@@ -177,6 +187,7 @@ class CreateSessionTab(tb.Frame):
             db.add(new_session)
             db.commit()
             db.refresh(new_session)
+            scheduler.wake()    # plan the auto close at this session's end time
 
             # success: inform user and call callback to switch to kiosk scanner
             messagebox.showinfo("Success", f"Session created (id={new_session.id}). Switching to kiosk scanner.")
@@ -191,3 +202,154 @@ class CreateSessionTab(tb.Frame):
             messagebox.showerror("DB error", str(e))
         finally:
             db.close()
+
+
+# Timetable mode: create a whole term of sessions from a weekly pattern
+class TimetableDialog(tb.Toplevel):
+    def __init__(self, parent, subjects, faculties, current_user):
+        super().__init__(parent)
+        self.title("Create Sessions from Timetable")
+        self.transient(parent)
+        self.grab_set()
+        self.subjects = subjects
+        self.faculties = faculties
+        self.current_user = current_user
+        self.slots = []
+
+        frm = tb.Frame(self, padding=12)
+        frm.pack(fill="both", expand=True)
+
+        # Term
+        tb.Label(frm, text="First Day").grid(row=0, column=0, sticky="w", pady=4)
+        self.from_entry = self._date_entry(frm)
+        self.from_entry.grid(row=0, column=1, sticky="ew", padx=8, pady=4)
+        tb.Label(frm, text="Last Day").grid(row=1, column=0, sticky="w", pady=4)
+        self.to_entry = self._date_entry(frm)
+        self.to_entry.grid(row=1, column=1, sticky="ew", padx=8, pady=4)
+        tb.Label(frm, text="Holidays").grid(row=2, column=0, sticky="w", pady=4)
+        self.holidays_entry = tb.Entry(frm)
+        self.holidays_entry.grid(row=2, column=1, sticky="ew", padx=8, pady=4)
+        tb.Label(frm, text="e.g. 2026-01-26, 2026-03-02..2026-03-06", bootstyle="secondary")\
+            .grid(row=3, column=1, sticky="w", padx=8)
+
+        # Weekly slot editor
+        slot_frame = tb.Labelframe(frm, text="Weekly Slots", padding=8)
+        slot_frame.grid(row=4, column=0, columnspan=2, sticky="nsew", pady=(10, 4))
+        self.weekday_cb = tb.Combobox(slot_frame, values=list(timetable.WEEKDAYS), width=5, state="readonly")
+        self.weekday_cb.set(timetable.WEEKDAYS[0])
+        self.weekday_cb.grid(row=0, column=0, padx=2)
+        self.start_entry = tb.Entry(slot_frame, width=6)
+        self.start_entry.insert(0, "09:00")
+        self.start_entry.grid(row=0, column=1, padx=2)
+        self.end_entry = tb.Entry(slot_frame, width=6)
+        self.end_entry.insert(0, "11:00")
+        self.end_entry.grid(row=0, column=2, padx=2)
+        self.subject_cb = tb.Combobox(slot_frame, values=[s.title for s in subjects], state="readonly")
+        self.subject_cb.grid(row=0, column=3, padx=2)
+        self.faculty_cb = tb.Combobox(slot_frame, values=[f.name for f in faculties], state="readonly")
+        self.faculty_cb.grid(row=0, column=4, padx=2)
+        if subjects:
+            self.subject_cb.set(subjects[0].title)
+        if faculties:
+            self.faculty_cb.set(faculties[0].name)
+        tb.Button(slot_frame, text="Add", bootstyle="success-outline", command=self._add_slot).grid(row=0, column=5, padx=2)
+
+        columns = ("day", "time", "subject", "faculty")
+        self.slot_tree = tb.Treeview(slot_frame, columns=columns, show="headings", height=6)
+        for col, heading in zip(columns, ("Day", "Time", "Subject", "Faculty")):
+            self.slot_tree.heading(col, text=heading)
+        self.slot_tree.column("day", width=50)
+        self.slot_tree.column("time", width=100)
+        self.slot_tree.grid(row=1, column=0, columnspan=6, sticky="nsew", pady=(6, 0))
+        tb.Button(slot_frame, text="Remove Selected", bootstyle="danger-link", command=self._remove_slot)\
+            .grid(row=2, column=0, columnspan=6, sticky="e")
+
+        # Buttons
+        btns = tb.Frame(frm)
+        btns.grid(row=5, column=0, columnspan=2, pady=(8, 0), sticky="e")
+        tb.Button(btns, text="Cancel", command=self._on_cancel, bootstyle="secondary-outline").pack(side="right", padx=(6, 0))
+        tb.Button(btns, text="Create Sessions", command=lambda: self._run(dry_run=False), bootstyle="success").pack(side="right")
+        tb.Button(btns, text="Preview", command=lambda: self._run(dry_run=True), bootstyle="info").pack(side="right", padx=(0, 6))
+
+        frm.columnconfigure(1, weight=1)
+
+    def _date_entry(self, parent):
+        try:
+            return tb.DateEntry(parent, bootstyle="secondary")
+        except Exception:
+            entry = tb.Entry(parent)
+            entry.insert(0, date.today().isoformat())
+            return entry
+
+    def _get_date(self, entry):
+        try:
+            return entry.get_date()
+        except Exception:
+            try:
+                return datetime.strptime(entry.get().strip(), "%Y-%m-%d").date()
+            except Exception:
+                return None
+
+    def _add_slot(self):
+        subj = next((s for s in self.subjects if s.title == self.subject_cb.get()), None)
+        fac = next((f for f in self.faculties if f.name == self.faculty_cb.get()), None)
+        if subj is None or fac is None:
+            messagebox.showwarning("Validation", "Choose a subject and a faculty.", parent=self)
+            return
+        try:
+            start, end = timetable.parse_time(self.start_entry.get()), timetable.parse_time(self.end_entry.get())
+        except ValueError:
+            messagebox.showwarning("Validation", "Enter times as HH:MM.", parent=self)
+            return
+        if end <= start:
+            messagebox.showwarning("Validation", "End time must be after start time.", parent=self)
+            return
+        slot = timetable.Slot(timetable.parse_weekday(self.weekday_cb.get()), start, end, subj.id, fac.id)
+        self.slots.append(slot)
+        self.slot_tree.insert("", END, iid=str(len(self.slots) - 1), values=(
+            timetable.WEEKDAYS[slot.weekday], f"{start:%H:%M} - {end:%H:%M}", subj.title, fac.name))
+
+    def _remove_slot(self):
+        for iid in self.slot_tree.selection():
+            self.slots[int(iid)] = None
+            self.slot_tree.delete(iid)
+
+    def _run(self, dry_run):
+        slots = [s for s in self.slots if s is not None]
+        first, last = self._get_date(self.from_entry), self._get_date(self.to_entry)
+        if not slots:
+            messagebox.showwarning("Validation", "Add at least one weekly slot.", parent=self)
+            return
+        if first is None or last is None:
+            messagebox.showwarning("Validation", "Enter valid first and last days (YYYY-MM-DD).", parent=self)
+            return
+        try:
+            holidays = timetable.parse_holidays(self.holidays_entry.get())
+        except ValueError as e:
+            messagebox.showwarning("Validation", f"Invalid holidays: {e}", parent=self)
+            return
+
+        db = SessionLocal()
+        try:
+            plan = timetable.create_term(db, self.current_user.id, slots, first, last, holidays, dry_run=dry_run)
+        except Exception as e:
+            messagebox.showerror("DB error", str(e), parent=self)
+            return
+        finally:
+            db.close()
+
+        details = ""
+        if plan.conflicts:
+            lines = [f"{c.date} {c.start_time:%H:%M}-{c.end_time:%H:%M}" for c in plan.conflicts[:10]]
+            more = f"\n... {len(plan.conflicts) - 10} more" if len(plan.conflicts) > 10 else ""
+            details = "\n\nSkipped (time clash on the same faculty or subject):\n" + "\n".join(lines) + more
+        if dry_run:
+            messagebox.showinfo("Preview", plan.summary() + details, parent=self)
+            return
+        scheduler.wake()
+        messagebox.showinfo("Success", plan.summary() + details, parent=self)
+        self._on_cancel()
+
+    def _on_cancel(self):
+        self.grab_release()
+        self.destroy()
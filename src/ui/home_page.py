@@ -1,9 +1,11 @@
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
-from sqlalchemy.orm import Session as SQLSession
-from sqlalchemy import func, desc
-from db import engine
-from models import Student, Faculty, Session
+from ttkbootstrap.dialogs import Messagebox
+from tkinter import filedialog
+from threading import Thread
+import os
+from db import ReadSessionLocal, SessionLocal
+from utils import read_model, sql_telemetry, roster_import
 from constants import TAB_CREATE_SESSION
 
 class HomePage(tb.Frame):
@@ -57,13 +59,13 @@ class HomePage(tb.Frame):
         student_count = 0
         faculty_count = 0
         session_count = 0
+        checkins_today = 0
         
         try:
-            with SQLSession(engine) as db:
+            with ReadSessionLocal() as db, sql_telemetry.action("home.stats"):
                 # Filter by current user
-                student_count = db.query(func.count(Student.id)).filter(Student.user_id == self.current_user.id).scalar()
-                faculty_count = db.query(func.count(Faculty.id)).filter(Faculty.user_id == self.current_user.id).scalar()
-                session_count = db.query(func.count(Session.id)).filter(Session.user_id == self.current_user.id).scalar()
+                student_count, faculty_count, session_count, checkins_today = \
+                    read_model.home_stats(db, self.current_user.id)
         except Exception as e:
             print(f"Error fetching stats: {e}")
 
@@ -71,10 +73,12 @@ class HomePage(tb.Frame):
         stats_frame.columnconfigure(0, weight=1)
         stats_frame.columnconfigure(1, weight=1)
         stats_frame.columnconfigure(2, weight=1)
+        stats_frame.columnconfigure(3, weight=1)
 
         self.create_stat_card(stats_frame, "Total Students", str(student_count), "users", 0)
         self.create_stat_card(stats_frame, "Faculty Members", str(faculty_count), "person-badge", 1)
         self.create_stat_card(stats_frame, "Total Sessions", str(session_count), "calendar-check", 2)
+        self.create_stat_card(stats_frame, "Check-ins Today", str(checkins_today), "person-check", 3)
 
     def create_stat_card(self, parent, title, value, icon, col):
         card = tb.Frame(parent, padding=15)
@@ -117,6 +121,43 @@ class HomePage(tb.Frame):
         )
         help_text.pack(side=LEFT, padx=20)
 
+        tb.Button(
+            cta_frame,
+            text="Import Roster",
+            bootstyle="info-outline",
+            width=18,
+            command=self.import_roster
+        ).pack(side=RIGHT, ipady=10)
+
+    def import_roster(self):
+        path = filedialog.askopenfilename(
+            title="Import students",
+            filetypes=[("Roster files", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")]
+        )
+        if not path:
+            return
+
+        def work():
+            db = SessionLocal()
+            try:
+                report = roster_import.import_roster(db, self.current_user.id, path)
+                self.after(0, lambda: self._on_roster_imported(report, path))
+            except Exception as e:
+                self.after(0, lambda err=e: Messagebox.show_error(f"Import failed: {err}", "Roster Import"))
+            finally:
+                db.close()
+
+        # large rosters take a few seconds; keep the UI responsive
+        Thread(target=work, daemon=True).start()
+
+    def _on_roster_imported(self, report, path):
+        msg = report.summary()
+        if report.errors:
+            errors_path = os.path.splitext(path)[0] + "_errors.csv"
+            report.write_errors(errors_path)
+            msg += f"\n\nRejected rows written to {errors_path}"
+        Messagebox.show_info(msg, "Roster Import")
+
     def create_recent_activity_section(self):
         activity_frame = tb.Labelframe(self.main_container, text="Recent Sessions", padding=15, bootstyle="default")
         activity_frame.pack(fill=BOTH, expand=YES)
@@ -144,13 +185,14 @@ class HomePage(tb.Frame):
 
         # Fetch recent sessions
         try:
-            with SQLSession(engine) as db:
-                recent_sessions = db.query(Session).filter(Session.user_id == self.current_user.id).order_by(desc(Session.date), desc(Session.start_time)).limit(5).all()
+            with ReadSessionLocal() as db, sql_telemetry.action("home.recent_sessions"):
+                # One joined query; touching s.subject / s.faculty here used to lazy-load per row (N+1)
+                recent_sessions = read_model.session_rows(db, self.current_user.id, limit=5)
                 
                 for s in recent_sessions:
                     status = "Active" if s.is_active else "Completed"
-                    subject_name = s.subject.title if s.subject else "Unknown"
-                    faculty_name = s.faculty.name if s.faculty else "Unknown"
+                    subject_name = s.subject or "Unknown"
+                    faculty_name = s.faculty or "Unknown"
                     tree.insert("", END, values=(s.date, subject_name, faculty_name, status))
         except Exception as e:
             print(f"Error fetching recent sessions: {e}")
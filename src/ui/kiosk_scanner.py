@@ -16,17 +16,21 @@ except Exception:
 
 # cv / barcode libs
 import cv2
-from pyzbar import pyzbar
 from PIL import Image, ImageTk
 
 try:
-    from db import SessionLocal
+    from db import KioskSessionLocal
     from models import Registry as RegistryModel, Student as StudentModel, Session as SessionModel
 except Exception:
-    from ..db import SessionLocal
+    from ..db import KioskSessionLocal
     from ..models import Registry as RegistryModel, Student as StudentModel, Session as SessionModel
 
 from utils.logger import get_logger
+from scanner import attendance, capture
+from scanner.decoder import FrameDecoder, Debouncer
+from scanner.ingest_client import client_from_env, IngestUnavailable
+from utils import kiosk_stats, profiling, sql_telemetry
+from utils.events import bus, SESSION_CLOSED, CAMERA_STATE
 
 class KioskScanner(tb.Frame):
     """
@@ -40,24 +44,28 @@ class KioskScanner(tb.Frame):
         self.logger = get_logger(self.__class__.__name__)
         self.session_row = session_row
         self._stop_event = Event()
-        self.cap = None
+        self.camera = capture.manager   # opened at app start and kept warm
         self.reader_thread = None
-        self.cv2_detector = cv2.QRCodeDetector() # Initialize cv2 detector
-        self.recent_scans = {}         # payload -> last_seen_ts (float)
+        self.decoder = FrameDecoder()
+        self.debouncer = Debouncer()
         self.last_overlay = None       # dict with keys: rect, msg, color, ts, ttl
         self.overlay_ttl = 1.5         # seconds to display overlay after a scan
         self.cam_running = True
         self.checkout_delay = timedelta(minutes=15)
+        self.session_closed = False    # set from the scheduler thread, shown by _update_mode
+        bus.subscribe(SESSION_CLOSED, self._on_session_closed)
+        self.camera_event = None       # latest camera watchdog event, shown by _update_mode
+        bus.subscribe(CAMERA_STATE, self._on_camera_state)
+        self.stats = kiosk_stats.get()
+        self.stats.set_camera(self.camera.state)
+        self.ingest = client_from_env()   # None -> direct DB writes only
+        self.stats.set_session(getattr(session_row, 'id', None), getattr(getattr(session_row, 'subject', None), 'title', ''))
         self.session_start_time = getattr(self.session_row, 'start_time', None)
         self.session_end_time = getattr(self.session_row, 'end_time', None)
         self.session_date = getattr(self.session_row, 'date', None)
         if self.session_start_time:
             self.session_start_datetime = datetime.combine(self.session_date,self.session_start_time)
             self.session_end_datetime = datetime.combine(self.session_date,self.session_end_time)
-        if datetime.now() > self.session_start_datetime + self.checkout_delay:
-            self.is_checkin_time = False
-        else:
-            self.is_checkin_time = True
 
         # Mode label: shows "Check IN" or "Check OUT"
         self.mode_var = tb.StringVar(value="Check IN")
@@ -105,6 +113,8 @@ class KioskScanner(tb.Frame):
     def set_session(self, session_row):
         """Update the scanner to work with a new session."""
         self.session_row = session_row
+        self.session_closed = False
+        self.stats.set_session(getattr(session_row, 'id', None), getattr(getattr(session_row, 'subject', None), 'title', ''))
         self.session_start_time = getattr(self.session_row, 'start_time', None)
         self.session_end_time = getattr(self.session_row, 'end_time', None)
         self.session_date = getattr(self.session_row, 'date', None)
@@ -112,12 +122,6 @@ class KioskScanner(tb.Frame):
         if self.session_start_time:
             self.session_start_datetime = datetime.combine(self.session_date, self.session_start_time)
             self.session_end_datetime = datetime.combine(self.session_date, self.session_end_time)
-        
-        # Re-evaluate checkin time
-        if datetime.now() > self.session_start_datetime + self.checkout_delay:
-            self.is_checkin_time = False
-        else:
-            self.is_checkin_time = True
             
         # Update UI info
         if hasattr(self, 'info_label'):
@@ -158,8 +162,11 @@ class KioskScanner(tb.Frame):
     def _update_mode(self):
         """Check current time vs cutoff and update the label and optional countdown."""
         now = datetime.now()
+        if self.session_closed:
+            self.mode_var.set("Session Closed")
+            self.countdown_var.set("Students still checked in were checked out at the end time.")
         # if now is before cutoff -> still check IN
-        if now < self.cutoff_dt:
+        elif now < self.cutoff_dt:
             self.mode_var.set("Check IN")
             # update countdown: time remaining until checkout window begins
             remaining = self.cutoff_dt - now
@@ -172,6 +179,8 @@ class KioskScanner(tb.Frame):
             self.mode_var.set("Check OUT")
             self.countdown_var.set("")  # hide countdown or show a different message
 
+        self._show_camera_state()
+
         # re-schedule next check (1s)
         self._schedule_mode_update(interval_ms=1000)
 
@@ -179,6 +188,42 @@ class KioskScanner(tb.Frame):
         """Call this when closing or switching tabs so after-calls stop."""
         self._mode_updater_running = False
 
+    def _on_session_closed(self, event):
+        # runs in the scheduler thread: only set the flag
+        if event.session_id == getattr(self.session_row, 'id', None):
+            self.session_closed = True
+            self.logger.info(f"Session {event.session_id} closed by the scheduler ({event.checked_out} auto check-outs)")
+
+    def _on_camera_state(self, event):
+        # runs in the camera thread: only record it
+        if event.device == self.camera.device:
+            self.camera_event = event
+            self.stats.set_camera(event.state)
+
+    def _show_camera_state(self):
+        event, self.camera_event = self.camera_event, None
+        if event is None or not self.cam_running:
+            return
+        shown = {
+            capture.OPENING: ("Opening camera...", "warning"),
+            capture.OK: ("Camera ready. Scanning...", "success"),
+            capture.STALLED: ("Camera stalled, waiting for frames...", "warning"),
+            capture.RECONNECTING: ("Camera lost, reconnecting...", "warning"),
+            capture.FAILED: ("Camera unavailable, retrying...", "danger"),
+        }.get(event.state)
+        if shown:
+            self.status.config(text=shown[0], bootstyle=shown[1])
+
+    def destroy(self):
+        bus.unsubscribe(SESSION_CLOSED, self._on_session_closed)
+        bus.unsubscribe(CAMERA_STATE, self._on_camera_state)
+        self._mode_updater_running = False
+        if self.cam_running and not self._stop_event.is_set():
+            self._stop_event.set()
+            self.stats.set_active(False)
+            self.camera.release()
+        super().destroy()
+
     def _late_checkin(self):
         now = datetime.now()
         if now > self.session_end_datetime:
@@ -187,24 +232,26 @@ class KioskScanner(tb.Frame):
         elif now > self.session_start_datetime + self.checkout_delay:
             # create and show modal popup. Provide a callback to save to DB.
             def on_submit(roll, reason):
-                # example: lookup student by roll, create Registry with a "late" flag or reason
-                db = SessionLocal()
+                db = KioskSessionLocal()
                 try:
-                    student = db.query(StudentModel).filter(StudentModel.roll_no == roll).first()
-                    if not student:
-                        messagebox.showerror("Not Found", f"No student with roll '{roll}'")
-                        return
-                    # create registry entry for late checkin (adjust model names/fields)
-                    from datetime import datetime
-                    reg = RegistryModel(student_id=student.id, session_id=self.session_row.id,
-                                        check_in_time=datetime.now(), late_check_in_reason=reason)
-                    db.add(reg); db.commit()
-                    messagebox.showinfo("Success", f"Late check-in recorded for {student.name}")
+                    now = datetime.now()
+                    result = attendance.record_scan(db, self.session_row, roll, False, now=now, late_reason=reason)
                 except Exception as e:
                     db.rollback()
                     messagebox.showerror("DB error", str(e))
+                    return
                 finally:
                     db.close()
+                if result.outcome == attendance.UNKNOWN:
+                    messagebox.showerror("Not Found", f"No student with roll '{roll}'")
+                    return
+                if result.outcome == attendance.ALREADY_IN:
+                    messagebox.showinfo("Already Checked IN", f"{result.student_name} is already checked in")
+                    return
+                if self.ingest:
+                    self.ingest.note_direct_write(self.session_row.id)
+                attendance.publish(self.session_row, result, at=now, late_reason=reason)
+                messagebox.showinfo("Success", f"Late check-in recorded for {result.student_name}")
 
             LateCheckinDialog(self, on_submit=on_submit)
         else:
@@ -232,16 +279,14 @@ class KioskScanner(tb.Frame):
         if self.cam_running:
             self._stop_event.clear()
             try:
-                self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)  # remove backend flag on linux if needed
-                if not self.cap or not self.cap.isOpened():
-                    # try without flag
-                    self.cap = cv2.VideoCapture(0)
-                if not self.cap.isOpened():
-                    self.status.config(text="Failed to open camera.", bootstyle="danger")
-                    self.logger.error("Failed to open camera.")
-                    return
-                self.status.config(text="Camera opened. Scanning...", bootstyle="success")
-                self.logger.info("Camera opened successfully. Scanning started.")
+                # the device is normally already open (see scanner/capture.py)
+                self.camera.acquire()
+                if self.camera.is_open:
+                    self.status.config(text="Camera ready. Scanning...", bootstyle="success")
+                else:
+                    self.status.config(text="Opening camera...", bootstyle="warning")
+                self.stats.set_active(True)
+                self.logger.info("Scanning started.")
                 self.reader_thread = Thread(target=self._camera_loop, daemon=True)
                 self.reader_thread.start()
             except Exception as e:
@@ -249,100 +294,73 @@ class KioskScanner(tb.Frame):
                 self.logger.error(f"Camera error: {e}")
 
     def _camera_loop(self):
+        if not self.camera.is_open:
+            if self.camera.wait_ready():
+                self.after(0, lambda: self.status.config(text="Camera opened. Scanning...", bootstyle="success"))
+            else:
+                # keep looping: the watchdog retries and frames resume once it opens
+                self.after(0, lambda: self.status.config(text="Failed to open camera, retrying...", bootstyle="danger"))
+                self.logger.error("Failed to open camera.")
         while not self._stop_event.is_set():
-            ret, frame = self.cap.read()
-            if not ret:
-                time.sleep(0.05)
-                continue
-
-            # Optionally scale frame for display
-            h, w = frame.shape[:2]
-            scale = 640 / max(w, h)
-            frame_disp = cv2.resize(frame, (int(w*scale), int(h*scale)))
-
-            # If there's an overlay to render (set by _handle_scan),
-            # draw rectangle and message directly on the frame_disp
-            if self.last_overlay:
-                now = time.time()
-                if now - self.last_overlay["ts"] <= self.last_overlay["ttl"]:
-                    r = self.last_overlay.get("rect")
-                    msg = self.last_overlay.get("msg", "")
-                    color = self.last_overlay.get("color", (0,255,0))  # BGR
-                    if r:
-                        # scale rect coordinates if needed (assume frame_disp scaled)
-                        x, y, w_rect, h_rect = r
-                        cv2.rectangle(frame_disp, (x, y), (x + w_rect, y + h_rect), color, 3)
-                    # draw message background
-                    cv2.rectangle(frame_disp, (8,8), (8+len(msg)*9 + 12, 36), (0,0,0), -1)
-                    cv2.putText(frame_disp, msg, (12,28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2)
-                else:
-                    self.last_overlay = None
-
-            # convert to PIL and update Tk label as before
-            cv2image = cv2.cvtColor(frame_disp, cv2.COLOR_BGR2RGB)
-            pil = Image.fromarray(cv2image)
-            imgtk = ImageTk.PhotoImage(image=pil)
-            # keep a reference to avoid garbage collection
-            self.video_label.imgtk = imgtk
-            self.video_label.configure(image=imgtk)
-
-            # Invert frame for better detection
-            inverted_frame = cv2.bitwise_not(frame)
-            
-            # Method 1: pyzbar
-            codes = pyzbar.decode(inverted_frame)
-            print("QR-Codes: ",codes)
-            
-            # Method 2: cv2 detector (fallback/parallel)
-            if not codes:
-                try:
-                    data, bbox, _ = self.cv2_detector.detectAndDecode(frame)
-                    if data:
-                        # Create a dummy object to match pyzbar structure if needed, or just process directly
-                        # For simplicity, let's just process it if found
-                        self.logger.debug(f"cv2 detected: {data}")
-                        self._handle_scan(data, None)
-                except Exception as e:
-                    self.logger.error(f"cv2 detection error: {e}")
-
-            if codes:
-                self.logger.debug(f"Detected {len(codes)} codes")
+            with profiling.loop_window("camera_loop"):
+                ret, frame = self.camera.read(timeout=0.5)
+                if not ret:
+                    continue
+
+                # Optionally scale frame for display
+                h, w = frame.shape[:2]
+                scale = 640 / max(w, h)
+                frame_disp = cv2.resize(frame, (int(w*scale), int(h*scale)))
+
+                # If there's an overlay to render (set by _handle_scan),
+                # draw rectangle and message directly on the frame_disp
+                if self.last_overlay:
+                    now = time.time()
+                    if now - self.last_overlay["ts"] <= self.last_overlay["ttl"]:
+                        r = self.last_overlay.get("rect")
+                        msg = self.last_overlay.get("msg", "")
+                        color = self.last_overlay.get("color", (0,255,0))  # BGR
+                        if r:
+                            # scale rect coordinates if needed (assume frame_disp scaled)
+                            x, y, w_rect, h_rect = r
+                            cv2.rectangle(frame_disp, (x, y), (x + w_rect, y + h_rect), color, 3)
+                        # draw message background
+                        cv2.rectangle(frame_disp, (8,8), (8+len(msg)*9 + 12, 36), (0,0,0), -1)
+                        cv2.putText(frame_disp, msg, (12,28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2)
+                    else:
+                        self.last_overlay = None
+
+                # convert to PIL and update Tk label as before
+                with profiling.stage("camera.render"):
+                    cv2image = cv2.cvtColor(frame_disp, cv2.COLOR_BGR2RGB)
+                    pil = Image.fromarray(cv2image)
+                    imgtk = ImageTk.PhotoImage(image=pil)
+                # keep a reference to avoid garbage collection
+                self.video_label.imgtk = imgtk
+                self.video_label.configure(image=imgtk)
+
+                codes = self.decoder.decode(frame)
+                self.stats.frame_decoded()
                 for code in codes:
-                    payload = None
-                    try:
-                        payload = code.data.decode("utf-8")
-                    except Exception as e:
-                        self.logger.error(f"Error decoding payload: {e}")
-                        continue
-                    
-                    rect = code.rect
-                    scale_w = frame_disp.shape[1] / frame.shape[1]
-                    scale_h = frame_disp.shape[0] / frame.shape[0]
-                    rx = int(rect.left * scale_w)
-                    ry = int(rect.top * scale_h)
-                    rw = int(rect.width * scale_w)
-                    rh = int(rect.height * scale_h)
-                    
-                    self._handle_scan(payload, (rx, ry, rw, rh))
-
-            time.sleep(0.02)
-
-        # cleanup camera on exit
-        try:
-            self.cap.release()
-        except Exception:
-            pass
+                    rect = None
+                    if code.rect:
+                        x, y, w_rect, h_rect = code.rect
+                        scale_w = frame_disp.shape[1] / frame.shape[1]
+                        scale_h = frame_disp.shape[0] / frame.shape[0]
+                        rect = (int(x * scale_w), int(y * scale_h), int(w_rect * scale_w), int(h_rect * scale_h))
+                    self._handle_scan(code.payload, rect)
+
+                time.sleep(0.02)
 
     def _handle_scan(self, payload, rect):
         # debounce: ignore very recent same payload
         now = time.time()
-        last = self.recent_scans.get(payload, 0)
-        if now - last < 1.5:
+        if not self.debouncer.accept(payload, now):
             return
-        self.recent_scans[payload] = now
+        self.stats.scan_accepted()
 
         # spawn DB handling on a worker thread so UI stays smooth
-        t = Thread(target=self._process_payload, args=(payload, rect), daemon=True)
+        t = Thread(target=self._process_payload, args=(payload, rect, now), daemon=True)
         t.start()
 
     def _play_beep(self, success=True):
@@ -391,65 +409,61 @@ class KioskScanner(tb.Frame):
                 "ttl": ttl or self.overlay_ttl
             }
 
-    def _process_payload(self, payload:str, rect):
+    @profiling.profiled("process_payload")
+    @sql_telemetry.tracked("kiosk.scan")
+    def _process_payload(self, payload:str, rect, scanned_at=None):
         """
-        Parse payload, write to DB, then update UI overlay + status. Runs in worker thread.
+        Record the scan (via the ingestion service when configured, else directly
+        in the DB), then update UI overlay + status. Runs in worker thread.
+        scanned_at is the time.time() of the accepted scan, for latency stats.
         """
-        db = SessionLocal()
+        result = None
+        ok = True
+        # decided per scan: a kiosk left open past the cutoff must switch to check-outs
+        is_checkin = attendance.in_checkin_window(self.session_row)
         try:
-            student = None
-            if payload:
-                payload = payload.split(',')[0]
-                student = db.query(StudentModel).filter(StudentModel.roll_no == payload).first()
-            if student is None:
-                student = db.query(StudentModel).filter(
-                    (StudentModel.roll_no == payload) |
-                    (StudentModel.admission_no == payload) |
-                    (StudentModel.name == payload)
-                ).first()
-            if student is None:
+            if self.ingest and self.ingest.available():
+                try:
+                    result = self.ingest.submit(self.session_row.id, payload, is_checkin, kiosk=self.stats.name)
+                except IngestUnavailable:
+                    result = None   # fall back to direct mode
+            if result is None:
+                db = KioskSessionLocal()
+                try:
+                    result = attendance.record_scan(db, self.session_row, payload, is_checkin)
+                except Exception:
+                    db.rollback()
+                    raise
+                finally:
+                    db.close()
+                if self.ingest and result.written:
+                    self.ingest.note_direct_write(self.session_row.id)
+            attendance.publish(self.session_row, result)
+
+            if result.outcome == attendance.UNKNOWN:
                 # unknown card
-                self._set_overlay(rect=rect, msg=f"Unknown QR: {payload}", color=(0,0,255))
+                self._set_overlay(rect=rect, msg=result.message, color=(0,0,255))
                 self.logger.warning(f"Unknown QR code scanned: {payload}")
                 self._play_beep(success=False)
                 return
 
-            # existing registry handling
-            reg:RegistryModel = db.query(RegistryModel).filter(
-                RegistryModel.session_id == self.session_row.id,
-                RegistryModel.student_id == student.id
-            ).order_by(RegistryModel.id.desc()).first()
-
-            now_dt = datetime.now()
-            if reg is None:
-                if self.is_checkin_time:
-                    # check-in
-                    new_reg = RegistryModel(student_id=student.id, session_id=self.session_row.id, check_in_time=now_dt, check_out_time=None)
-                    db.add(new_reg)
-                    db.commit()
-                    db.refresh(new_reg)
-                    db.refresh(new_reg)
-                    msg = f"Checked IN: {student.name}"
-                    self.logger.info(f"Student Checked IN: {student.name} (ID: {student.id})")
-                    color = (0,255,0)
-                else:
-                    self._start_or_stop()
-                    messagebox.showwarning("You are Late!!","You haven't Checked IN till now. Please use the Late Check IN option.")
+            if result.outcome == attendance.LATE:
+                self._set_overlay(rect=rect, msg=result.message, color=(0,0,255))
+                self.video_label.after(0, self._start_or_stop)
+                self.video_label.after(0, lambda: messagebox.showwarning("You are Late!!","You haven't Checked IN till now. Please use the Late Check IN option."))
+                return
+
+            if result.outcome == attendance.CHECKED_IN:
+                self.logger.info(f"Student Checked IN: {result.student_name} (ID: {result.student_id})")
+                color = (0,255,0)
+            elif result.outcome == attendance.CHECKED_OUT:
+                self.logger.info(f"Student Checked OUT: {result.student_name} (ID: {result.student_id})")
+                color = (255,200,0)  # amber-ish for checkout
             else:
-                if not self.is_checkin_time:
-                # check-out
-                    reg.check_out_time = now_dt
-                    db.add(reg)
-                    db.commit()
-                    db.add(reg)
-                    db.commit()
-                    msg = f"Checked OUT: {student.name}"
-                    self.logger.info(f"Student Checked OUT: {student.name} (ID: {student.id})")
-                    color = (255,200,0)  # amber-ish for checkout
-                else:
-                    self.logger.warning(f"Student already Checked IN Just Now: {student.name} (ID: {student.id})")
-                    msg = f"Already Checked IN: {student.name}"
-                    color = (0,0,255)
+                self.logger.warning(f"Student already Checked IN Just Now: {result.student_name} (ID: {result.student_id})")
+                color = (0,0,255)
+            msg = result.message
+
             # success: update overlay and status label (UI thread)
             self._set_overlay(rect=rect, msg=msg, color=color)
             self.video_label.after(0, lambda: self.status.config(text=msg, bootstyle="success"))
@@ -458,25 +472,19 @@ class KioskScanner(tb.Frame):
             self._play_beep(success=True)
 
         except Exception as e:
-            try:
-                db.rollback()
-            except Exception:
-                pass
+            ok = False
             self._set_overlay(rect=rect, msg="DB error", color=(0,0,255))
             self.video_label.after(0, lambda: self.status.config(text=f"DB error: {e}", bootstyle="danger"))
             self.logger.error(f"Database error during processing payload: {e}")
             self._play_beep(success=False)
         finally:
-            db.close()
+            self.stats.write_finished(scanned_at, kind=result.written if result else None, ok=ok)
 
     def _stop_camera(self):
         """Stop camera & thread"""
         self._stop_event.set()
-        if self.cap and self.cap.isOpened():
-            try:
-                self.cap.release()
-            except Exception:
-                pass
+        self.stats.set_active(False)
+        self.camera.release()    # device stays open and warm for the next start
         self.status.config(text="Scanner stopped.", bootstyle="secondary")
         self.video_label.config(image="")
         self.logger.info("Scanner stopped.")
@@ -5,12 +5,16 @@ from ui.view_sessions import ViewSessionsTab
 from ui.view_registry import ViewRegistryTab
 from ui.create_session import CreateSessionTab
 from ui.kiosk_scanner import KioskScanner
+from ui.analytics import AnalyticsTab
+from ui.admin_dashboard import AdminDashboard
+from utils.ref_cache import ref_cache
 from constants import *
 
 class MainAppFrame(tb.Frame):
     def __init__(self, master, current_user, **kw):
         super().__init__(master, **kw)
         self.current_user = current_user
+        ref_cache.start_background_refresh()
 
         self.sidebar = Sidebar(self, self.switch_tab)
         self.content_area = tb.Frame(self)
@@ -21,6 +25,8 @@ class MainAppFrame(tb.Frame):
             TAB_CREATE_SESSION: CreateSessionTab(self.content_area, on_create=self._on_session_created, current_user=self.current_user),
             TAB_VIEW_SESSIONS: ViewSessionsTab(self.content_area, on_navigate=self.switch_tab, current_user=self.current_user),
             TAB_VIEW_REGISTRY: ViewRegistryTab(self.content_area, current_user=self.current_user),
+            TAB_ANALYTICS: AnalyticsTab(self.content_area, current_user=self.current_user),
+            TAB_ADMIN_DASHBOARD: AdminDashboard(self.content_area),
             # kiosk_scanner tab created lazily when session is created
         }
 
@@ -32,7 +38,12 @@ class MainAppFrame(tb.Frame):
         Called by CreateSessionTab after the session is saved in DB.
         Create kiosk scanner tab (or replace it) and switch to it.
         """
-        # create or replace kiosk tab
+        # create or replace kiosk tab; the old one hands the (still open) camera over
+        old = self.tabs.get(TAB_KIOSK_SCANNER)
+        if old is not None:
+            if self.active_tab is old:
+                self.active_tab = None
+            old.destroy()
         kiosk = KioskScanner(self.content_area, session_row=session_row)
         self.tabs[TAB_KIOSK_SCANNER] = kiosk
         # switch
@@ -0,0 +1,53 @@
+import os
+from ttkbootstrap.constants import END
+
+# Auto-refresh period for the list views (HAAJAR_AUTO_REFRESH_SECONDS, default 5)
+AUTO_REFRESH_MS = int(float(os.getenv("HAAJAR_AUTO_REFRESH_SECONDS", 5)) * 1000)
+
+
+class TreeSync:
+    """
+    Keeps a Treeview in step with a list of rows keyed by DB id.
+
+    Items use the id as their iid, and the last values written are remembered,
+    so a refresh only deletes, inserts, updates or moves the items that actually
+    changed instead of clearing and rebuilding the whole table (no flicker).
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.values = {}    # iid -> values tuple currently shown
+
+    def _put(self, iid, values, index=END):
+        if iid not in self.values:
+            self.tree.insert("", index, iid=iid, values=values)
+        elif self.values[iid] != values:
+            self.tree.item(iid, values=values)
+        self.values[iid] = values
+
+    def replace(self, items):
+        """Show exactly `items` ([(id, values), ...]) in this order."""
+        items = [(str(key), tuple(values)) for key, values in items]
+        wanted = dict(items)
+        stale = [iid for iid in self.values if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.values[iid]
+
+        for index, (iid, values) in enumerate(items):
+            self._put(iid, values, index)
+
+        order = [iid for iid, _ in items]
+        if list(self.tree.get_children()) != order:
+            for index, iid in enumerate(order):
+                self.tree.move(iid, "", index)
+
+    def append(self, items):
+        """Add or update `items` without touching anything else; new ones go to the end."""
+        for key, values in items:
+            self._put(str(key), tuple(values))
+
+    def clear(self):
+        if self.values:
+            self.tree.delete(*self.values)
+        self.values = {}
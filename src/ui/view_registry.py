@@ -3,19 +3,24 @@ from ttkbootstrap.constants import *
 from ttkbootstrap.dialogs import Messagebox
 from ttkbootstrap.widgets import DateEntry
 from tkinter import filedialog
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-from sqlalchemy import desc
-from db import SessionLocal
-from models import Registry, Session, Student, Subject, Faculty
+from sqlalchemy import select
+from db import ReadSessionLocal
+from models import Session
+from utils import read_model, export, sql_telemetry
+from utils.ref_cache import ref_cache
+from ui.tree_sync import TreeSync, AUTO_REFRESH_MS
+from utils.logger import get_logger
+from utils.events import bus, SCAN_CHECKED_IN, SCAN_CHECKED_OUT, SESSION_CLOSED
+from collections import deque
 from datetime import date
 
+LIVE_FRAME_MS = 33      # live mode applies queued scans at most once per frame
+
 class ViewRegistryTab(tb.Frame):
     def __init__(self, master, current_user=None, **kw):
         super().__init__(master, **kw)
         self.current_user = current_user
+        self.logger = get_logger(self.__class__.__name__)
         
         # Variables
         self.faculty_var = tb.StringVar()
@@ -25,6 +30,16 @@ class ViewRegistryTab(tb.Frame):
         self.subject_map = {} # Title -> ID
         
         self.current_records = []
+        self._rows = {}              # iid -> (RegistryRow, index into current_records)
+        self.filters = None          # filters of the rows on screen
+        self.watermark = 0           # highest registry id on screen
+        self.changed_at = None       # latest Registry.updated_at seen (check-outs since then are re-read)
+        self.shown_session_id = None # session shown by the default (unfiltered) view
+        self.auto_refresh_var = tb.BooleanVar(value=False)
+        self._auto_refresh_job = None
+        self.live_var = tb.BooleanVar(value=False)
+        self._live_pending = deque()  # (topic, event) from kiosk/scheduler threads, drained on the Tk thread
+        self._live_job = None
 
         self.create_widgets()
         self.load_filter_data()
@@ -62,16 +77,21 @@ class ViewRegistryTab(tb.Frame):
         tb.Button(btn_frame, text="Reset", bootstyle="secondary", command=self.reset_filters).pack(side=LEFT, padx=5)
         tb.Button(btn_frame, text="Export Excel", bootstyle="success", command=self.export_excel).pack(side=LEFT, padx=5)
         tb.Button(btn_frame, text="Export PDF", bootstyle="danger", command=self.export_pdf).pack(side=LEFT, padx=5)
+        tb.Checkbutton(btn_frame, text="Auto-refresh", variable=self.auto_refresh_var, bootstyle="round-toggle",
+                       command=self.toggle_auto_refresh).pack(side=LEFT, padx=15)
+        tb.Checkbutton(btn_frame, text="Live", variable=self.live_var, bootstyle="success-round-toggle",
+                       command=self.toggle_live).pack(side=LEFT, padx=5)
 
         # Table Frame
         table_frame = tb.Frame(self, padding=10)
         table_frame.pack(fill=BOTH, expand=YES)
         
-        columns = ("date", "time", "student_name", "roll_no", "subject", "faculty", "status")
+        columns = ("date", "time", "check_out", "student_name", "roll_no", "subject", "faculty", "status")
         self.tree = tb.Treeview(table_frame, columns=columns, show="headings", bootstyle="info")
         
         self.tree.heading("date", text="Date")
         self.tree.heading("time", text="Time")
+        self.tree.heading("check_out", text="Check Out")
         self.tree.heading("student_name", text="Student Name")
         self.tree.heading("roll_no", text="Roll No")
         self.tree.heading("subject", text="Subject")
@@ -80,6 +100,7 @@ class ViewRegistryTab(tb.Frame):
         
         self.tree.column("date", width=100)
         self.tree.column("time", width=100)
+        self.tree.column("check_out", width=100)
         self.tree.column("student_name", width=200)
         self.tree.column("roll_no", width=100)
         self.tree.column("subject", width=150)
@@ -91,62 +112,76 @@ class ViewRegistryTab(tb.Frame):
         
         self.tree.pack(side=LEFT, fill=BOTH, expand=YES)
         scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree_sync = TreeSync(self.tree)
 
     def load_filter_data(self):
-        session = SessionLocal()
-        try:
-            faculties = session.query(Faculty).filter(Faculty.user_id == self.current_user.id).all()
-            subjects = session.query(Subject).filter(Subject.user_id == self.current_user.id).all()
-            
-            self.faculty_map = {f.name: f.id for f in faculties}
-            self.subject_map = {s.title: s.id for s in subjects}
-            
-            self.faculty_cb['values'] = list(self.faculty_map.keys())
-            self.subject_cb['values'] = list(self.subject_map.keys())
-        finally:
-            session.close()
+        faculties = ref_cache.faculties(self.current_user.id)
+        subjects = ref_cache.subjects(self.current_user.id)
 
+        self.faculty_map = {f.name: f.id for f in faculties.values()}
+        self.subject_map = {s.title: s.id for s in subjects.values()}
+
+        self.faculty_cb['values'] = list(self.faculty_map.keys())
+        self.subject_cb['values'] = list(self.subject_map.keys())
+
+    @sql_telemetry.tracked("registry.fetch")
     def fetch_records(self, filters=None):
-        session = SessionLocal()
+        session = ReadSessionLocal()
         try:
-            query = session.query(Registry, Session, Student, Subject, Faculty)\
-                .join(Session, Registry.session_id == Session.id)\
-                .filter(Session.user_id == self.current_user.id)\
-                .join(Student, Registry.student_id == Student.id)\
-                .join(Subject, Session.subject_id == Subject.id)\
-                .join(Faculty, Session.faculty_id == Faculty.id)
-            
-            if filters:
-                if 'start_date' in filters and filters['start_date']:
-                    query = query.filter(Session.date >= filters['start_date'])
-                if 'end_date' in filters and filters['end_date']:
-                    query = query.filter(Session.date <= filters['end_date'])
-                if 'faculty_id' in filters and filters['faculty_id']:
-                    query = query.filter(Session.faculty_id == filters['faculty_id'])
-                if 'subject_id' in filters and filters['subject_id']:
-                    query = query.filter(Session.subject_id == filters['subject_id'])
-            else:
-                # Default: Most recent session
-                # Find the most recent session ID
-                subq = session.query(Session.id).order_by(desc(Session.date), desc(Session.start_time)).limit(1).scalar_subquery()
-                # If no sessions exist, subq might be None, handle gracefully
-                # But scalar_subquery returns a query object, not result.
-                
-                # Let's try a different approach for default: get the latest session object first
-                latest_session = session.query(Session).filter(Session.user_id == self.current_user.id).order_by(desc(Session.date), desc(Session.start_time)).first()
-                if latest_session:
-                    query = query.filter(Session.id == latest_session.id)
-                else:
-                    # No sessions, return empty
-                    query = query.filter(Session.id == -1)
-
-            records = query.all()
+            # Column projection only; without filters this is the latest session
+            changed_at = read_model.registry_change_mark(session)
+            records = read_model.registry_rows(session, self.current_user.id, filters)
+            self.filters = filters
+            self.watermark = max((r.id for r in records), default=0)
+            self.changed_at = changed_at
+            self.shown_session_id = records[0].session_id if records and not filters else None
             self.populate_table(records)
         except Exception as e:
             Messagebox.show_error(f"Error fetching records: {e}", "Database Error")
         finally:
             session.close()
 
+    @sql_telemetry.tracked("registry.refresh")
+    def refresh_records(self):
+        """Fetch only entries added or changed since the watermarks and patch them in place."""
+        session = ReadSessionLocal()
+        try:
+            if self.changed_at is None:
+                self.changed_at = read_model.registry_change_mark(session)
+            records = read_model.registry_rows(session, self.current_user.id, self.filters,
+                                               since_id=self.watermark, changed_since=self.changed_at)
+        except Exception as e:
+            self.logger.error(f"Error refreshing records: {e}")
+            return
+        finally:
+            session.close()
+        if not records:
+            return
+        if not self.filters and records[0].session_id != self.shown_session_id:
+            # a newer session started; the default view follows it
+            self.fetch_records()
+            return
+        self.watermark = max(self.watermark, max(r.id for r in records))
+        changed = [r.updated_at for r in records if r.updated_at is not None]
+        if changed:
+            self.changed_at = max(changed + [self.changed_at] if self.changed_at else changed)
+        self.patch_records(records)
+
+    def toggle_auto_refresh(self):
+        if self._auto_refresh_job:
+            self.after_cancel(self._auto_refresh_job)
+            self._auto_refresh_job = None
+        if self.auto_refresh_var.get():
+            self._auto_refresh_job = self.after(AUTO_REFRESH_MS, self._auto_refresh)
+
+    def _auto_refresh(self):
+        self._auto_refresh_job = None
+        if not self.auto_refresh_var.get():
+            return
+        if self.winfo_ismapped():    # skip while another tab is shown
+            self.refresh_records()
+        self._auto_refresh_job = self.after(AUTO_REFRESH_MS, self._auto_refresh)
+
     def fetch_records_filtered(self):
         filters = {}
         
@@ -176,35 +211,156 @@ class ViewRegistryTab(tb.Frame):
         # Let's just reset to default view (latest session)
         self.fetch_records()
 
+    def toggle_live(self):
+        """Live mode: apply check-ins, check-outs and auto-closes published on the bus, with no polling queries."""
+        if self.live_var.get():
+            for topic, callback in self._live_callbacks():
+                bus.subscribe(topic, callback)
+            self._live_job = self.after(LIVE_FRAME_MS, self._drain_live)
+            return
+        self._unsubscribe_live()
+        if self._live_job:
+            self.after_cancel(self._live_job)
+            self._live_job = None
+        self._live_pending.clear()
+        # reconcile rows that arrived without a registry id (ingestion service)
+        self.fetch_records(self.filters)
+
+    def _live_callbacks(self):
+        return ((SCAN_CHECKED_IN, self._on_check_in),
+                (SCAN_CHECKED_OUT, self._on_check_out),
+                (SESSION_CLOSED, self._on_session_closed))
+
+    def _unsubscribe_live(self):
+        for topic, callback in self._live_callbacks():
+            bus.unsubscribe(topic, callback)
+
+    def destroy(self):
+        self._unsubscribe_live()
+        super().destroy()
+
+    # kiosk/scheduler threads: only enqueue, never touch Tk here
+    def _on_check_in(self, event):
+        self._live_pending.append((SCAN_CHECKED_IN, event))
+
+    def _on_check_out(self, event):
+        self._live_pending.append((SCAN_CHECKED_OUT, event))
+
+    def _on_session_closed(self, event):
+        self._live_pending.append((SESSION_CLOSED, event))
+
+    def _drain_live(self):
+        records, check_outs, closed = [], [], set()
+        while self._live_pending:
+            topic, event = self._live_pending.popleft()
+            if topic == SESSION_CLOSED:
+                closed.add(event.session_id)
+            elif topic == SCAN_CHECKED_OUT:
+                check_outs.append(event)
+            elif self._live_matches(event):
+                records.append(self._live_record(event))
+        if records:
+            self.watermark = max([self.watermark] + [r.id for r in records if isinstance(r.id, int)])
+            self.append_records(records)
+        for event in check_outs:
+            self._live_check_out(event)
+        if closed:
+            self._live_session_closed(closed)
+        self._live_job = self.after(LIVE_FRAME_MS, self._drain_live)
+
+    def _live_matches(self, event):
+        if event.user_id != self.current_user.id:
+            return False
+        filters = self.filters
+        if not filters:
+            if self.shown_session_id is None:
+                self.shown_session_id = event.session_id
+            return event.session_id == self.shown_session_id
+        if filters.get('start_date') and str(event.date) < str(filters['start_date']):
+            return False
+        if filters.get('end_date') and str(event.date) > str(filters['end_date']):
+            return False
+        if filters.get('faculty_id') and event.faculty_id != filters['faculty_id']:
+            return False
+        if filters.get('subject_id') and event.subject_id != filters['subject_id']:
+            return False
+        return True
+
+    def _live_record(self, event):
+        subject = ref_cache.subject(event.user_id, event.subject_id)
+        faculty = ref_cache.faculty(event.user_id, event.faculty_id)
+        return read_model.RegistryRow(
+            event.registry_id or f"live-{event.session_id}-{event.student_id}",
+            event.session_id,
+            event.date,
+            event.at.time().replace(microsecond=0),
+            None,
+            event.student_name,
+            event.roll_no,
+            subject.title if subject else "",
+            faculty.name if faculty else "",
+            event.late_reason,
+        )
+
     def populate_table(self, records):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
+        # Items are keyed by registry id; only changed rows are touched
         self.current_records = []
-        
-        for reg, sess, stu, sub, fac in records:
-            status = "Late" if reg.late_check_in_reason else "On Time"
-            
-            values = (
-                sess.date,
-                reg.check_in_time,
-                stu.name,
-                stu.roll_no,
-                sub.title,
-                fac.name,
-                status
-            )
-            self.tree.insert("", END, values=values)
-            
-            self.current_records.append({
-                "Date": sess.date,
-                "Time": reg.check_in_time,
-                "Student Name": stu.name,
-                "Roll No": stu.roll_no,
-                "Subject": sub.title,
-                "Faculty": fac.name,
-                "Status": status
-            })
+        self._rows = {}
+        items = []
+        for rec in records:
+            items.append(self._remember(rec))
+        self.tree_sync.replace(items)
+
+    def append_records(self, records):
+        self.tree_sync.append([self._remember(rec) for rec in records])
+
+    def patch_records(self, records):
+        """Apply new and changed rows; only the items whose values differ are touched."""
+        for rec in records:
+            self._remember(rec)
+        self.tree_sync.replace(
+            (rec.id, tuple(self.current_records[index][c] for c in export.COLUMNS))
+            for rec, index in sorted(self._rows.values(), key=lambda item: item[1])
+        )
+
+    def _remember(self, rec):
+        """Record rec in current_records (replacing an earlier version) and return its tree item."""
+        iid = str(rec.id)
+        record = export.as_record(rec)
+        if iid in self._rows:
+            index = self._rows[iid][1]
+            self.current_records[index] = record
+        else:
+            index = len(self.current_records)
+            self.current_records.append(record)
+        self._rows[iid] = (rec, index)
+        return rec.id, tuple(record[c] for c in export.COLUMNS)
+
+    def _live_check_out(self, event):
+        # rows written through the ingestion service are shown under their live key
+        for iid in (str(event.registry_id), f"live-{event.session_id}-{event.student_id}"):
+            if iid in self._rows:
+                rec = self._rows[iid][0]
+                self.tree_sync.append([self._remember(rec._replace(check_out_time=event.at.time().replace(microsecond=0)))])
+                return
+
+    def _live_session_closed(self, session_ids):
+        """Auto check-out: visible rows of the closed sessions still open get the session end time."""
+        open_rows = [rec for rec, _ in self._rows.values()
+                     if rec.session_id in session_ids and rec.check_out_time is None]
+        if not open_rows:
+            return
+        session = ReadSessionLocal()
+        try:
+            end_times = dict(session.execute(
+                select(Session.id, Session.end_time).where(Session.id.in_(session_ids))).all())
+        except Exception as e:
+            self.logger.error(f"Error reading closed sessions: {e}")
+            return
+        finally:
+            session.close()
+        self.tree_sync.append([self._remember(rec._replace(check_out_time=end_times.get(rec.session_id)))
+                               for rec in open_rows])
 
     def export_excel(self):
         if not self.current_records:
@@ -214,8 +370,7 @@ class ViewRegistryTab(tb.Frame):
         file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
         if file_path:
             try:
-                df = pd.DataFrame(self.current_records)
-                df.to_excel(file_path, index=False)
+                export.write_excel(self.current_records, file_path)
                 Messagebox.show_info("Export Successful", "Export")
             except Exception as e:
                 Messagebox.show_error(f"Export failed: {e}", "Export Error")
@@ -228,34 +383,7 @@ class ViewRegistryTab(tb.Frame):
         file_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
         if file_path:
             try:
-                doc = SimpleDocTemplate(file_path, pagesize=letter)
-                elements = []
-                
-                data = [["Date", "Time", "Student Name", "Roll No", "Subject", "Faculty", "Status"]]
-                for rec in self.current_records:
-                    data.append([
-                        str(rec["Date"]),
-                        str(rec["Time"]),
-                        rec["Student Name"],
-                        rec["Roll No"],
-                        rec["Subject"],
-                        rec["Faculty"],
-                        rec["Status"]
-                    ])
-                    
-                table = Table(data)
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                
-                elements.append(table)
-                doc.build(elements)
+                export.write_pdf(self.current_records, file_path)
                 Messagebox.show_info("Export Successful", "Export")
             except Exception as e:
-                Messagebox.show_error(f"Export failed: {e}", "Export Error")
\ No newline at end of file
+                Messagebox.show_error(f"Export failed: {e}", "Export Error")
@@ -2,10 +2,14 @@ import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 from ttkbootstrap.dialogs import Messagebox
 from ttkbootstrap.widgets import DateEntry
-from sqlalchemy import desc
-from db import SessionLocal
-from models import Session, Subject, Faculty
-from datetime import date
+from sqlalchemy.orm import joinedload
+from db import ReadSessionLocal, SessionLocal
+from models import Session
+from utils import read_model, sql_telemetry
+from utils.ref_cache import ref_cache
+from utils.logger import get_logger
+from ui.tree_sync import TreeSync, AUTO_REFRESH_MS
+from datetime import date, time
 from constants import TAB_KIOSK_SCANNER
 
 class ViewSessionsTab(tb.Frame):
@@ -13,6 +17,7 @@ class ViewSessionsTab(tb.Frame):
         super().__init__(master, **kw)
         self.on_navigate = on_navigate
         self.current_user = current_user
+        self.logger = get_logger(self.__class__.__name__)
         
         # Variables
         self.faculty_var = tb.StringVar()
@@ -23,6 +28,11 @@ class ViewSessionsTab(tb.Frame):
         self.subject_map = {} # Title -> ID
         
         self.current_sessions = []
+        self.filters = None          # filters of the rows on screen
+        self.watermark = 0           # highest session id on screen
+        self.changed_at = None       # latest Session.updated_at seen (sessions changed since then are re-read)
+        self.auto_refresh_var = tb.BooleanVar(value=False)
+        self._auto_refresh_job = None
 
         self.create_widgets()
         self.load_filter_data()
@@ -61,6 +71,8 @@ class ViewSessionsTab(tb.Frame):
         
         tb.Button(btn_frame, text="Filter", bootstyle="primary", command=self.fetch_sessions_filtered).pack(side=LEFT, padx=5)
         tb.Button(btn_frame, text="Reset", bootstyle="secondary", command=self.reset_filters).pack(side=LEFT, padx=5)
+        tb.Checkbutton(btn_frame, text="Auto-refresh", variable=self.auto_refresh_var, bootstyle="round-toggle",
+                       command=self.toggle_auto_refresh).pack(side=LEFT, padx=15)
 
         # Table Frame
         table_frame = tb.Frame(self, padding=10)
@@ -90,6 +102,7 @@ class ViewSessionsTab(tb.Frame):
         
         self.tree.pack(side=LEFT, fill=BOTH, expand=YES)
         scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree_sync = TreeSync(self.tree)
 
         # Bindings
         self.tree.bind("<Button-3>", self.show_context_menu)
@@ -101,44 +114,83 @@ class ViewSessionsTab(tb.Frame):
         self.context_menu.add_command(label="Mark Inactive", command=self.mark_inactive_context)
 
     def load_filter_data(self):
-        session = SessionLocal()
-        try:
-            faculties = session.query(Faculty).filter(Faculty.user_id == self.current_user.id).all()
-            subjects = session.query(Subject).filter(Subject.user_id == self.current_user.id).all()
-            
-            self.faculty_map = {f.name: f.id for f in faculties}
-            self.subject_map = {s.title: s.id for s in subjects}
-            
-            self.faculty_cb['values'] = list(self.faculty_map.keys())
-            self.subject_cb['values'] = list(self.subject_map.keys())
-        finally:
-            session.close()
+        faculties = ref_cache.faculties(self.current_user.id)
+        subjects = ref_cache.subjects(self.current_user.id)
+
+        self.faculty_map = {f.name: f.id for f in faculties.values()}
+        self.subject_map = {s.title: s.id for s in subjects.values()}
 
+        self.faculty_cb['values'] = list(self.faculty_map.keys())
+        self.subject_cb['values'] = list(self.subject_map.keys())
+
+    @sql_telemetry.tracked("sessions.fetch")
     def fetch_sessions(self, filters=None):
-        session = SessionLocal()
+        session = ReadSessionLocal()
         try:
-            query = session.query(Session).filter(Session.user_id == self.current_user.id).join(Subject).join(Faculty).order_by(desc(Session.date), desc(Session.start_time))
-            
-            if filters:
-                if 'start_date' in filters and filters['start_date']:
-                    query = query.filter(Session.date >= filters['start_date'])
-                if 'end_date' in filters and filters['end_date']:
-                    query = query.filter(Session.date <= filters['end_date'])
-                if 'status' in filters and filters['status'] != "All":
-                    is_active = True if filters['status'] == "Active" else False
-                    query = query.filter(Session.is_active == is_active)
-                if 'faculty_id' in filters and filters['faculty_id']:
-                    query = query.filter(Session.faculty_id == filters['faculty_id'])
-                if 'subject_id' in filters and filters['subject_id']:
-                    query = query.filter(Session.subject_id == filters['subject_id'])
-            
-            self.current_sessions = query.all()
+            # Flat rows with subject/faculty already joined in
+            changed_at = read_model.session_change_mark(session)
+            self.current_sessions = read_model.session_rows(session, self.current_user.id, filters)
+            self.filters = filters
+            self.watermark = max((s.id for s in self.current_sessions), default=0)
+            self.changed_at = changed_at
             self.populate_table()
         except Exception as e:
             Messagebox.show_error(f"Error fetching sessions: {e}", "Database Error")
         finally:
             session.close()
 
+    @sql_telemetry.tracked("sessions.refresh")
+    def refresh_sessions(self):
+        """
+        Pick up sessions created after the id watermark and re-read only the
+        sessions on screen updated since the change watermark (auto-closed,
+        marked inactive), then patch the table in place.
+        """
+        on_screen = {s.id: s for s in self.current_sessions}
+        session = ReadSessionLocal()
+        try:
+            if self.changed_at is None:
+                self.changed_at = read_model.session_change_mark(session)
+            new_rows = read_model.session_rows(session, self.current_user.id, self.filters, since_id=self.watermark)
+            changed = {}
+            if self.changed_at is not None:
+                changed = read_model.changed_sessions(session, self.current_user.id, self.changed_at)
+            stale = [session_id for session_id in changed if session_id in on_screen]
+            current = read_model.session_rows_by_id(session, self.current_user.id, stale, self.filters) if stale else {}
+        except Exception as e:
+            self.logger.error(f"Error refreshing sessions: {e}")
+            return
+        finally:
+            session.close()
+
+        if changed:
+            self.changed_at = max([self.changed_at] + list(changed.values()))
+        # stale rows missing from `current` no longer match the filters
+        if not new_rows and all(current.get(session_id) == on_screen[session_id] for session_id in stale):
+            return
+        for session_id in stale:
+            on_screen.pop(session_id)
+        rows = list(on_screen.values()) + list(current.values()) + new_rows
+        rows.sort(key=lambda s: (s.date, s.start_time or time.min), reverse=True)
+        self.current_sessions = rows
+        self.watermark = max([self.watermark] + [s.id for s in new_rows])
+        self.populate_table()
+
+    def toggle_auto_refresh(self):
+        if self._auto_refresh_job:
+            self.after_cancel(self._auto_refresh_job)
+            self._auto_refresh_job = None
+        if self.auto_refresh_var.get():
+            self._auto_refresh_job = self.after(AUTO_REFRESH_MS, self._auto_refresh)
+
+    def _auto_refresh(self):
+        self._auto_refresh_job = None
+        if not self.auto_refresh_var.get():
+            return
+        if self.winfo_ismapped():    # skip while another tab is shown
+            self.refresh_sessions()
+        self._auto_refresh_job = self.after(AUTO_REFRESH_MS, self._auto_refresh)
+
     def fetch_sessions_filtered(self):
         filters = {}
         
@@ -171,9 +223,8 @@ class ViewSessionsTab(tb.Frame):
         self.fetch_sessions()
 
     def populate_table(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
+        # Items are keyed by session id; only changed rows are touched
+        items = []
         for sess in self.current_sessions:
             status = "Active" if sess.is_active else "Inactive"
             actions = "Right-click for options"
@@ -182,12 +233,13 @@ class ViewSessionsTab(tb.Frame):
                 sess.id,
                 sess.date,
                 sess.start_time,
-                sess.subject.title if sess.subject else "Unknown",
-                sess.faculty.name if sess.faculty else "Unknown",
+                sess.subject or "Unknown",
+                sess.faculty or "Unknown",
                 status,
                 actions
             )
-            self.tree.insert("", END, values=values)
+            items.append((sess.id, values))
+        self.tree_sync.replace(items)
 
     def show_context_menu(self, event):
         item = self.tree.identify_row(event.y)
@@ -223,7 +275,20 @@ class ViewSessionsTab(tb.Frame):
             # For now, let's assume on_navigate can take extra args or we call a specific method.
             # But MainAppFrame.switch_tab only takes tab_name.
             # I will modify MainAppFrame to handle this.
-            self.on_navigate(TAB_KIOSK_SCANNER, session_row=sess)
+            session_row = self.load_session_row(sess.id)
+            if session_row:
+                self.on_navigate(TAB_KIOSK_SCANNER, session_row=session_row)
+
+    def load_session_row(self, session_id):
+        """Full Session model (subject eagerly loaded) for the kiosk scanner, from the primary: the kiosk writes against it."""
+        session = SessionLocal()
+        try:
+            return session.get(Session, session_id, options=[joinedload(Session.subject)])
+        except Exception as e:
+            Messagebox.show_error(f"Error loading session: {e}", "Database Error")
+            return None
+        finally:
+            session.close()
 
     def mark_inactive_context(self):
         sess = self.get_selected_session()
@@ -238,7 +303,7 @@ class ViewSessionsTab(tb.Frame):
     def update_session_status(self, session_id, is_active):
         session = SessionLocal()
         try:
-            sess = session.query(Session).get(session_id)
+            sess = session.get(Session, session_id)
             if sess:
                 sess.is_active = is_active
                 session.commit()
@@ -0,0 +1,287 @@
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from sqlalchemy import func, case, and_, exists, true
+from models import Registry, Session, Student, Subject, Faculty
+from utils import archive, timestamps
+from utils.events import bus, SCAN_CHECKED_IN, SCAN_CHECKED_OUT, SESSION_CLOSED
+
+# Attendance aggregations are pushed into SQL (GROUP BY / anti-joins) so only
+# the summarised rows travel to the client. Results are cached per filter.
+# When the filters reach back before the archive boundary, counts from the
+# archived Parquet rows (utils/archive.py) are merged into the SQL results.
+# Recorded scans and closed sessions invalidate the cache through the event bus.
+
+CACHE_TTL = 60  # seconds
+CACHE_MAX = 64  # entries, least recently used evicted first
+
+_cache = OrderedDict()   # (report, user_id, filter_key) -> (ts, rows)
+_cache_lock = Lock()
+
+
+def _filter_key(filters):
+    if not filters:
+        return ()
+    return tuple(sorted((k, str(v)) for k, v in filters.items() if v))
+
+
+def _cached(report, user_id, filters, compute, use_cache=True):
+    key = (report, user_id, _filter_key(filters))
+    now = time.time()
+    if use_cache:
+        with _cache_lock:
+            hit = _cache.get(key)
+            if hit and now - hit[0] < CACHE_TTL:
+                _cache.move_to_end(key)
+                return hit[1]
+    rows = compute()
+    with _cache_lock:
+        _cache[key] = (now, rows)
+        _cache.move_to_end(key)
+        for k in [k for k, (ts, _) in _cache.items() if now - ts >= CACHE_TTL]:
+            del _cache[k]
+        while len(_cache) > CACHE_MAX:
+            _cache.popitem(last=False)
+    return rows
+
+
+def clear_cache(user_id=None):
+    """Drop cached reports (all of them, or only those of one user)."""
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            for key in [k for k in _cache if k[1] == user_id]:
+                del _cache[key]
+
+
+def _on_scan(event):
+    # kiosk worker thread; clearing is a dict operation under the lock
+    clear_cache(event.user_id)
+
+
+def _on_session_closed(event):
+    clear_cache()
+
+
+bus.subscribe(SCAN_CHECKED_IN, _on_scan)
+bus.subscribe(SCAN_CHECKED_OUT, _on_scan)
+bus.subscribe(SESSION_CLOSED, _on_session_closed)
+
+
+def _apply_session_filters(query, user_id, filters):
+    """Same filter dict as ViewRegistryTab: start_date, end_date, faculty_id, subject_id."""
+    query = query.filter(Session.user_id == user_id)
+    if filters:
+        if filters.get('start_date'):
+            query = query.filter(Session.date >= filters['start_date'])
+        if filters.get('end_date'):
+            query = query.filter(Session.date <= filters['end_date'])
+        if filters.get('faculty_id'):
+            query = query.filter(Session.faculty_id == filters['faculty_id'])
+        if filters.get('subject_id'):
+            query = query.filter(Session.subject_id == filters['subject_id'])
+    return query
+
+
+def _archived(user_id, filters):
+    """Archived registry rows for these filters, or None when the archive is not involved."""
+    if not archive.reaches_archive(user_id, filters):
+        return None
+    df = archive.read_registry(user_id, filters)
+    return None if df.empty else df
+
+
+def _minutes(seconds):
+    return None if seconds is None else round(float(seconds) / 60, 1)
+
+
+def _none(value):
+    return None if value is None or value != value else value   # NaN / NaT -> None
+
+
+def student_attendance(db, user_id, filters=None, use_cache=True):
+    """
+    Per-student / per-subject attendance.
+    Rows: (student_id, name, roll_no, subject, held, attended, late, percentage)
+    """
+    def compute():
+        held = _apply_session_filters(
+            db.query(
+                Session.subject_id.label("subject_id"),
+                func.count(Session.id).label("held"),
+            ),
+            user_id, filters,
+        ).group_by(Session.subject_id).subquery()
+
+        attended = _apply_session_filters(
+            db.query(
+                Registry.student_id.label("student_id"),
+                Session.subject_id.label("subject_id"),
+                func.count(func.distinct(Registry.session_id)).label("attended"),
+                func.sum(timestamps.late_flag()).label("late"),
+            ).join(Session, Registry.session_id == Session.id),
+            user_id, filters,
+        ).group_by(Registry.student_id, Session.subject_id).subquery()
+
+        attended_count = func.coalesce(attended.c.attended, 0)
+        query = db.query(
+            Student.id,
+            Student.name,
+            Student.roll_no,
+            Subject.title,
+            held.c.held,
+            attended_count.label("attended"),
+            func.coalesce(attended.c.late, 0).label("late"),
+            func.round(attended_count * 100.0 / held.c.held, 1).label("percentage"),
+        ).select_from(Student)\
+            .join(held, true())\
+            .join(Subject, Subject.id == held.c.subject_id)\
+            .outerjoin(attended, and_(
+                attended.c.student_id == Student.id,
+                attended.c.subject_id == held.c.subject_id,
+            ))\
+            .filter(Student.user_id == user_id)\
+            .order_by(Student.roll_no, Subject.title)
+        rows = query.all()
+
+        old = _archived(user_id, filters)
+        if old is None:
+            return rows
+        titles = dict(db.query(Subject.id, Subject.title).filter(Subject.user_id == user_id).all())
+        old = old.assign(title=old["subject_id"].map(titles), is_late=old["late_reason"].notna().astype(int))
+        counts = old.groupby(["student_id", "title"]).agg(attended=("session_id", "nunique"), late=("is_late", "sum"))
+        counts = {key: (int(a), int(l)) for key, a, l in counts.itertuples()}
+        merged = []
+        for sid, name, roll, subject, held, attended, late, pct in rows:
+            extra_attended, extra_late = counts.get((sid, subject), (0, 0))
+            if extra_attended:
+                attended, late = attended + extra_attended, late + extra_late
+                pct = math.floor(attended * 1000.0 / held + 0.5) / 10     # half up, like SQL ROUND
+            merged.append((sid, name, roll, subject, held, attended, late, pct))
+        return merged
+
+    return _cached("student_attendance", user_id, filters, compute, use_cache)
+
+
+def session_summary(db, user_id, filters=None, use_cache=True):
+    """
+    Per-session present / late / absent counts against the department roster,
+    with the average lateness and stay in minutes from
+    timestamps.lateness_by_session (None for archived sessions).
+    Rows: (session_id, date, start_time, subject, faculty, present, late, absent,
+           avg_late_minutes, avg_stay_minutes)
+    """
+    def compute():
+        roster = db.query(func.count(Student.id))\
+            .filter(Student.user_id == user_id).scalar_subquery()
+        present = func.count(func.distinct(Registry.student_id))
+        late = func.count(func.distinct(case((timestamps.is_late(), Registry.student_id))))
+
+        query = _apply_session_filters(
+            db.query(
+                Session.id,
+                Session.date,
+                Session.start_time,
+                Subject.title,
+                Faculty.name,
+                present.label("present"),
+                late.label("late"),
+                (roster - present).label("absent"),
+            ).join(Subject, Session.subject_id == Subject.id)
+             .join(Faculty, Session.faculty_id == Faculty.id)
+             .outerjoin(Registry, Registry.session_id == Session.id),
+            user_id, filters,
+        ).group_by(
+            Session.id, Session.date, Session.start_time, Subject.title, Faculty.name
+        ).order_by(Session.date.desc(), Session.start_time.desc())
+        rows = query.all()
+        stats = {
+            s.session_id: (_minutes(s.avg_lateness_seconds), _minutes(s.avg_duration_seconds))
+            for s in timestamps.lateness_by_session(db, *timestamps.checkin_range(filters), user_id=user_id)
+        }
+        rows = [tuple(row) + stats.get(row[0], (None, None)) for row in rows]
+
+        old = _archived(user_id, filters)
+        if old is None:
+            return rows
+        present_old = old.groupby("session_id")["student_id"].nunique()
+        late_old = old[old["late_reason"].notna()].groupby("session_id")["student_id"].nunique()
+        merged = []
+        for sid, sdate, start, subject, faculty, present, late, absent, avg_late, avg_stay in rows:
+            extra = int(present_old.get(sid, 0))
+            merged.append((sid, sdate, start, subject, faculty, present + extra,
+                           late + int(late_old.get(sid, 0)), absent - extra, avg_late, avg_stay))
+        return merged
+
+    return _cached("session_summary", user_id, filters, compute, use_cache)
+
+
+def absentees(db, user_id, session_id, filters=None, use_cache=True):
+    """
+    Students with no registry row for one session (anti-join on the
+    registry (session_id, student_id) index). Across a whole date range this
+    is sessions x roster, so it is only computed per session.
+    Rows: (session_id, date, subject, student_id, roll_no, name)
+    """
+    cache_filters = dict(filters or {}, session_id=session_id)
+
+    def compute():
+        scanned = exists().where(
+            Registry.session_id == Session.id,
+            Registry.student_id == Student.id,
+        )
+        query = _apply_session_filters(
+            db.query(
+                Session.id,
+                Session.date,
+                Subject.title,
+                Student.id,
+                Student.roll_no,
+                Student.name,
+            ).select_from(Session)
+             .join(Subject, Session.subject_id == Subject.id)
+             .join(Student, Student.user_id == Session.user_id),
+            user_id, filters,
+        ).filter(Session.id == session_id, ~scanned)
+        rows = query.order_by(Student.roll_no).all()
+
+        old = _archived(user_id, filters)
+        if old is None:
+            return rows
+        scanned_old = set(old.loc[old["session_id"] == session_id, "student_id"])
+        return [row for row in rows if row[3] not in scanned_old]
+
+    return _cached("absentees", user_id, cache_filters, compute, use_cache)
+
+
+def session_scans(db, user_id, session_id, filters=None, use_cache=True):
+    """
+    Check-ins of one session with their stay, from timestamps.scans_between
+    (archived rows included).
+    Rows: (roll_no, name, checked_in_at, checked_out_at, stay_minutes)
+    """
+    cache_filters = dict(filters or {}, session_id=session_id)
+
+    def compute():
+        spans = timestamps.scans_between(db, user_id=user_id, session_id=session_id)
+        students = dict(
+            (sid, (roll, name)) for sid, roll, name in db.query(Student.id, Student.roll_no, Student.name)
+            .filter(Student.id.in_({s.student_id for s in spans}))
+        ) if spans else {}
+        rows = [
+            students.get(s.student_id, ("", "")) + (s.checked_in_at, s.checked_out_at, _minutes(s.duration_seconds))
+            for s in spans
+        ]
+
+        old = _archived(user_id, filters)
+        if old is None:
+            return rows
+        for r in old[old["session_id"] == session_id].itertuples(index=False):
+            in_at, out_at = _none(r.checked_in_at), _none(r.checked_out_at)
+            stay = _minutes((out_at - in_at).total_seconds()) if in_at is not None and out_at is not None else None
+            rows.append((r.roll_no, r.student_name, in_at, out_at, stay))
+        return sorted(rows, key=lambda r: (r[2] is None, r[2] or 0))
+
+    return _cached("session_scans", user_id, cache_filters, compute, use_cache)
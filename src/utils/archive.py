@@ -0,0 +1,243 @@
+"""
+Archive old registry rows to date-partitioned Parquet files.
+
+Closed sessions before a cutoff (normally the first day of the current term)
+have their registry rows copied to Parquet and then deleted from the hot table,
+so kiosk writes and day-to-day queries only touch recent data. Sessions,
+students and the attendance rollup stay in the database.
+
+    python -m utils.archive --before 2026-01-01 [--user ID] [--dry-run]
+
+Layout (HAAJAR_ARCHIVE_DIR, default ./archive):
+
+    registry/user_id=<id>/month=<YYYY-MM>/part-<first id>-<last id>.parquet
+    registry/_manifest.json      {user_id: first date NOT archived}
+
+Rows are stored denormalised (student, subject and faculty names as they were),
+so reading them back needs no joins. A month is written to a temporary file,
+moved into place, checked by row count, and only then deleted from the
+registry, one transaction per month. read_model.registry_rows() and the
+analytics reports merge archived rows whenever a filter reaches back before the
+archive boundary. Requires pyarrow.
+
+The rollup keeps the counts of archived days; utils.rollup --rebuild skips
+dates before the boundary, since the registry no longer holds their rows. The
+manifest is updated after every month, so an interrupted run still records
+what it removed.
+"""
+import argparse
+import json
+import os
+from datetime import date, datetime
+from sqlalchemy import delete, func, select
+from models import Faculty, Registry, Session, Student, Subject
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ARCHIVE_DIR = os.getenv("HAAJAR_ARCHIVE_DIR", "archive")
+DELETE_CHUNK = 5000
+
+COLUMNS = [
+    "id", "session_id", "student_id", "subject_id", "faculty_id", "date",
+    "check_in_time", "check_out_time", "checked_in_at", "checked_out_at", "late_reason",
+    "student_name", "roll_no", "subject", "faculty",
+]
+
+
+def _root(archive_dir):
+    return os.path.join(archive_dir, "registry")
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+
+# --- manifest ----------------------------------------------------------------
+
+def load_manifest(archive_dir=ARCHIVE_DIR):
+    path = os.path.join(_root(archive_dir), "_manifest.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {int(k): _as_date(v) for k, v in json.load(f).items()}
+
+
+def _save_manifest(manifest, archive_dir):
+    path = os.path.join(_root(archive_dir), "_manifest.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({str(k): v.isoformat() for k, v in manifest.items()}, f, indent=2)
+    os.replace(tmp, path)
+
+
+def boundary(user_id, archive_dir=ARCHIVE_DIR):
+    """First date whose registry rows are still in the database; None if nothing was archived."""
+    return load_manifest(archive_dir).get(user_id)
+
+
+def reaches_archive(user_id, filters, archive_dir=ARCHIVE_DIR):
+    """True when a report with these filters has to read archived rows too."""
+    first_live = boundary(user_id, archive_dir)
+    if first_live is None:
+        return False
+    start = _as_date((filters or {}).get("start_date"))
+    return start is None or start < first_live
+
+
+# --- writing -----------------------------------------------------------------
+
+def _month_rows(db, user_id, month_start, month_end, before):
+    stmt = select(
+        Registry.id, Registry.session_id, Registry.student_id, Session.subject_id, Session.faculty_id, Session.date,
+        Registry.check_in_time, Registry.check_out_time, Registry.checked_in_at, Registry.checked_out_at,
+        Registry.late_check_in_reason, Student.name, Student.roll_no, Subject.title, Faculty.name,
+    ).join(Session, Registry.session_id == Session.id)\
+        .outerjoin(Student, Registry.student_id == Student.id)\
+        .outerjoin(Subject, Session.subject_id == Subject.id)\
+        .outerjoin(Faculty, Session.faculty_id == Faculty.id)\
+        .where(
+            Session.user_id == user_id,
+            Session.date >= month_start, Session.date < min(month_end, before),
+            Session.is_active.isnot(True),
+        ).order_by(Registry.id)
+    return db.execute(stmt).all()
+
+
+def _write_part(rows, directory):
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"part-{rows[0].id}-{rows[-1].id}.parquet")
+    tmp = f"{path}.tmp"
+    df = pd.DataFrame.from_records([tuple(r) for r in rows], columns=COLUMNS)
+    df.to_parquet(tmp, engine="pyarrow", index=False)
+    os.replace(tmp, path)
+    written = pq.read_metadata(path).num_rows
+    if written != len(rows):
+        raise RuntimeError(f"{path} holds {written} rows, expected {len(rows)}")
+    return path
+
+
+def _months(first, before):
+    """(month start, next month start) pairs covering [first, before)."""
+    current = first.replace(day=1)
+    while current < before:
+        following = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        yield current, following
+        current = following
+
+
+def archive_registry(db, before, user_id=None, archive_dir=ARCHIVE_DIR, dry_run=False):
+    """
+    Move registry rows of closed sessions dated before `before` to Parquet.
+    Returns {user_id: rows archived}.
+    """
+    before = _as_date(before)
+    users = select(Session.user_id, func.min(Session.date))\
+        .join(Registry, Registry.session_id == Session.id)\
+        .where(Session.date < before, Session.is_active.isnot(True))\
+        .group_by(Session.user_id)
+    if user_id is not None:
+        users = users.where(Session.user_id == user_id)
+
+    manifest = load_manifest(archive_dir)
+    archived = {}
+    for uid, first in db.execute(users).all():
+        archived[uid] = 0
+        for month_start, month_end in _months(_as_date(first), before):
+            rows = _month_rows(db, uid, month_start, month_end, before)
+            if not rows:
+                continue
+            archived[uid] += len(rows)
+            if dry_run:
+                continue
+            path = _write_part(rows, os.path.join(_root(archive_dir), f"user_id={uid}", f"month={month_start:%Y-%m}"))
+            ids = [r.id for r in rows]
+            try:
+                for i in range(0, len(ids), DELETE_CHUNK):
+                    db.execute(delete(Registry).where(Registry.id.in_(ids[i:i + DELETE_CHUNK])))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            logger.info(f"Archived {len(rows)} registry rows of user {uid} to {path}")
+            # the month is gone from the registry: readers must find it in the archive now
+            manifest[uid] = max(manifest.get(uid, month_start), min(month_end, before))
+            _save_manifest(manifest, archive_dir)
+        if not dry_run and archived[uid]:
+            manifest[uid] = max(manifest.get(uid, before), before)
+            _save_manifest(manifest, archive_dir)
+    return archived
+
+
+# --- reading -----------------------------------------------------------------
+
+def read_registry(user_id, filters=None, archive_dir=ARCHIVE_DIR):
+    """
+    Archived rows of `user_id` matching the registry filters (start_date,
+    end_date, faculty_id, subject_id) as a DataFrame ordered by date and id.
+    Only the month partitions inside the date range are opened.
+    """
+    import pandas as pd
+
+    filters = filters or {}
+    start, end = _as_date(filters.get("start_date")), _as_date(filters.get("end_date"))
+    user_dir = os.path.join(_root(archive_dir), f"user_id={user_id}")
+    if not os.path.isdir(user_dir):
+        return pd.DataFrame(columns=COLUMNS)
+
+    parquet_filters = []
+    if start:
+        parquet_filters.append(("date", ">=", start))
+    if end:
+        parquet_filters.append(("date", "<=", end))
+    if filters.get("faculty_id"):
+        parquet_filters.append(("faculty_id", "==", int(filters["faculty_id"])))
+    if filters.get("subject_id"):
+        parquet_filters.append(("subject_id", "==", int(filters["subject_id"])))
+
+    frames = []
+    for month_dir in sorted(os.listdir(user_dir)):
+        month = month_dir.partition("=")[2]
+        if start and month < f"{start:%Y-%m}" or end and month > f"{end:%Y-%m}":
+            continue
+        directory = os.path.join(user_dir, month_dir)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".parquet"):
+                frames.append(pd.read_parquet(os.path.join(directory, name), engine="pyarrow",
+                                              filters=parquet_filters or None))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(["date", "id"], kind="stable").reset_index(drop=True)
+
+
+def main(argv=None):
+    from db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Archive old registry rows to Parquet.")
+    parser.add_argument("--before", required=True, help="archive closed sessions dated before this day (YYYY-MM-DD)")
+    parser.add_argument("--user", type=int, help="limit to one department (user) id")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="count rows only")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        archived = archive_registry(db, args.before, args.user, args.archive_dir, args.dry_run)
+    finally:
+        db.close()
+    verb = "Would archive" if args.dry_run else "Archived"
+    for uid, rows in sorted(archived.items()):
+        print(f"{verb} {rows} registry rows of user {uid}")
+    if not archived:
+        print("Nothing to archive.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+In-process publish/subscribe bus.
+
+The kiosk publishes check-in / check-out events here after each recorded scan,
+and the session scheduler (utils/lifecycle.py) publishes session closures, so
+other parts of the app (e.g. the registry tab's live mode) learn about them
+without polling the database. The camera watchdog (scanner/capture.py)
+publishes camera state changes.
+
+Callbacks run synchronously in the publishing thread -- usually a kiosk worker
+thread. Tk subscribers must only enqueue and drain from the UI thread.
+"""
+from collections import namedtuple
+from threading import Lock
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Topics
+SCAN_CHECKED_IN = "scan.checked_in"
+SCAN_CHECKED_OUT = "scan.checked_out"
+SESSION_CLOSED = "session.closed"
+CAMERA_STATE = "camera.state"
+
+ScanEvent = namedtuple(
+    "ScanEvent",
+    "session_id user_id subject_id faculty_id date student_id student_name roll_no registry_id at late_reason",
+)
+# registry_id is None when the write went through the ingestion service
+
+SessionClosedEvent = namedtuple("SessionClosedEvent", "session_id checked_out at")
+# checked_out: registry rows auto checked-out at the session's end time
+
+CameraStateEvent = namedtuple("CameraStateEvent", "device state detail at")
+# state: one of the scanner.capture state names; detail: reason or None
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = {}      # topic -> tuple of callbacks
+        self._lock = Lock()
+
+    def subscribe(self, topic, callback):
+        """Call `callback(event)` for every event published on `topic`."""
+        with self._lock:
+            self._subscribers[topic] = self._subscribers.get(topic, ()) + (callback,)
+
+    def unsubscribe(self, topic, callback):
+        with self._lock:
+            self._subscribers[topic] = tuple(cb for cb in self._subscribers.get(topic, ()) if cb != callback)
+
+    def publish(self, topic, event):
+        # the tuple is replaced, never mutated, so no lock is needed to iterate it
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Subscriber {callback!r} failed on {topic}: {e}")
+
+
+# Shared instance
+bus = EventBus()
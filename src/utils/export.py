@@ -0,0 +1,62 @@
+import pandas as pd
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+from utils import profiling
+
+# Registry export writers. `records` is the list of dicts built by
+# ViewRegistryTab.populate_table via as_record() (keys below, in column order).
+COLUMNS = ["Date", "Time", "Check Out", "Student Name", "Roll No", "Subject", "Faculty", "Status"]
+
+
+def as_record(row):
+    """Export dict for one read_model.RegistryRow."""
+    return {
+        "Date": row.date,
+        "Time": row.check_in_time,
+        "Check Out": row.check_out_time or "",
+        "Student Name": row.student_name,
+        "Roll No": row.roll_no,
+        "Subject": row.subject,
+        "Faculty": row.faculty,
+        "Status": "Late" if row.late_reason else "On Time",
+    }
+
+
+@profiling.profiled("export_excel")
+def write_excel(records, file_path):
+    df = pd.DataFrame(records, columns=COLUMNS)
+    df.to_excel(file_path, index=False)
+
+
+@profiling.profiled("export_pdf")
+def write_pdf(records, file_path):
+    doc = SimpleDocTemplate(file_path, pagesize=letter)
+    elements = []
+
+    data = [list(COLUMNS)]
+    for rec in records:
+        data.append([
+            str(rec["Date"]),
+            str(rec["Time"]),
+            str(rec["Check Out"]),
+            rec["Student Name"],
+            rec["Roll No"],
+            rec["Subject"],
+            rec["Faculty"],
+            rec["Status"]
+        ])
+
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    elements.append(table)
+    doc.build(elements)
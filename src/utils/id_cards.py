@@ -0,0 +1,198 @@
+"""
+Printable student ID cards with the QR code the kiosk scans.
+
+QR images are rendered in a process pool and cached on disk by a hash of the
+payload and render settings, so reprinting a batch only renders new or changed
+cards. Each worker decodes the image it rendered (pyzbar, else OpenCV) and the
+results form a verification report. Cards are laid out 2 x 5 per A4 page in
+credit-card size (85.6 x 54 mm) with ReportLab.
+
+    python -m utils.id_cards --user 3 [--like "25MCA%"] [--rolls R1,R2] --out cards.pdf
+                             [--report cards.csv] [--cache-dir .card_cache] [--workers N]
+
+The payload is "ROLL_NO,NAME"; the kiosk identifies the student by the part
+before the first comma (scanner.attendance.normalize_payload).
+"""
+import argparse
+import csv
+import hashlib
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select
+from models import Student, User
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_DIR = os.getenv("HAAJAR_CARD_CACHE", ".card_cache")
+RENDER_VERSION = 1          # bump when render settings change to invalidate the cache
+BOX_SIZE = 10
+BORDER = 2
+
+CardStudent = namedtuple("CardStudent", "id roll_no name admission_no")
+CardResult = namedtuple("CardResult", "roll_no payload image cached decoded ok")
+
+
+def card_payload(student):
+    return f"{student.roll_no},{student.name}"
+
+
+def _cache_path(cache_dir, payload):
+    key = hashlib.sha256(f"{RENDER_VERSION}|{BOX_SIZE}|{BORDER}|{payload}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key[:2], f"{key}.png")
+
+
+def _decode(path):
+    """Decode a rendered QR image; None when no decoder library is installed."""
+    try:
+        from PIL import Image
+        from pyzbar import pyzbar
+        codes = pyzbar.decode(Image.open(path))
+        return codes[0].data.decode("utf-8") if codes else ""
+    except ImportError:
+        pass
+    try:
+        import cv2
+        data, _, _ = cv2.QRCodeDetector().detectAndDecode(cv2.imread(path))
+        return data or ""
+    except ImportError:
+        return None
+
+
+def render_card(job):
+    """Process-pool worker: (roll_no, payload, cache_dir) -> CardResult."""
+    roll_no, payload, cache_dir = job
+    path = _cache_path(cache_dir, payload)
+    cached = os.path.exists(path)
+    if not cached:
+        import qrcode
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=BOX_SIZE, border=BORDER)
+        qr.add_data(payload)
+        qr.make(fit=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        qr.make_image(fill_color="black", back_color="white").save(tmp, format="PNG")
+        os.replace(tmp, path)   # atomic, so a concurrent reprint never sees half a file
+    decoded = _decode(path)
+    return CardResult(roll_no, payload, path, cached, decoded, None if decoded is None else decoded == payload)
+
+
+def load_students(db, user_id, rolls=None, like=None):
+    stmt = select(Student.id, Student.roll_no, Student.name, Student.admission_no)\
+        .where(Student.user_id == user_id, Student.roll_no.isnot(None))
+    if rolls:
+        stmt = stmt.where(Student.roll_no.in_(rolls))
+    if like:
+        stmt = stmt.where(Student.roll_no.like(like))
+    return [CardStudent._make(row) for row in db.execute(stmt.order_by(Student.roll_no))]
+
+
+def render_all(students, cache_dir=CACHE_DIR, workers=None):
+    """Render (or reuse) every card's QR image in parallel. Returns CardResults in roster order."""
+    jobs = [(s.roll_no, card_payload(s), cache_dir) for s in students]
+    if not jobs:
+        return []
+    if workers == 1 or len(jobs) < 20:
+        return [render_card(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_card, jobs, chunksize=max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))))
+
+
+def write_sheets(students, results, out_path, title=""):
+    """Lay the cards out on A4 pages, 2 columns x 5 rows, with crop outlines."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    card_w, card_h = 85.6 * mm, 54 * mm
+    cols, rows = 2, 5
+    page_w, page_h = A4
+    margin_x = (page_w - cols * card_w) / 2
+    margin_y = (page_h - rows * card_h) / 2
+
+    c = canvas.Canvas(out_path, pagesize=A4)
+    for i, (student, result) in enumerate(zip(students, results)):
+        slot = i % (cols * rows)
+        if i and slot == 0:
+            c.showPage()
+        x = margin_x + (slot % cols) * card_w
+        y = page_h - margin_y - (slot // cols + 1) * card_h
+
+        c.setLineWidth(0.3)
+        c.setStrokeGray(0.6)
+        c.rect(x, y, card_w, card_h)
+
+        qr_size = card_h - 10 * mm
+        c.drawImage(result.image, x + card_w - qr_size - 5 * mm, y + 5 * mm, qr_size, qr_size)
+
+        text_x = x + 5 * mm
+        c.setFont("Helvetica-Bold", 8)
+        c.drawString(text_x, y + card_h - 9 * mm, title[:32])
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(text_x, y + card_h - 20 * mm, (student.name or "")[:24])
+        c.setFont("Helvetica", 9)
+        c.drawString(text_x, y + card_h - 27 * mm, f"Roll No: {student.roll_no}")
+        if student.admission_no:
+            c.drawString(text_x, y + card_h - 32 * mm, f"Adm No: {student.admission_no}")
+    c.save()
+
+
+def write_report(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["roll_no", "payload", "image", "cached", "decoded", "ok"])
+        for r in results:
+            writer.writerow([r.roll_no, r.payload, r.image, r.cached, r.decoded, r.ok])
+
+
+def generate(db, user_id, out_path, rolls=None, like=None, cache_dir=CACHE_DIR, workers=None, report_path=None):
+    """Render, verify and lay out ID cards. Returns the CardResults."""
+    students = load_students(db, user_id, rolls, like)
+    department = db.execute(select(User.department_name).where(User.id == user_id)).scalar() or ""
+    results = render_all(students, cache_dir, workers)
+    if students:
+        write_sheets(students, results, out_path, department)
+    if report_path:
+        write_report(results, report_path)
+
+    failed = [r for r in results if r.ok is False]
+    unverified = sum(1 for r in results if r.ok is None)
+    logger.info(
+        f"ID cards for user {user_id}: {len(results)} cards ({sum(r.cached for r in results)} from cache), "
+        f"{len(failed)} failed verification, {unverified} unverified -> {out_path}"
+    )
+    for r in failed:
+        logger.warning(f"Card for {r.roll_no} decoded as {r.decoded!r}, expected {r.payload!r}")
+    return results
+
+
+def main(argv=None):
+    from db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Generate printable QR ID cards.")
+    parser.add_argument("--user", type=int, required=True, help="department (user) id")
+    parser.add_argument("--rolls", help="comma-separated roll numbers")
+    parser.add_argument("--like", help="SQL LIKE pattern on roll_no, e.g. 25MCA%%")
+    parser.add_argument("--out", default="id_cards.pdf")
+    parser.add_argument("--report", help="write the scan-verification report to this CSV")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int, help="render processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    rolls = [r.strip() for r in args.rolls.split(",") if r.strip()] if args.rolls else None
+    db = SessionLocal()
+    try:
+        results = generate(db, args.user, args.out, rolls, args.like, args.cache_dir, args.workers, args.report)
+    finally:
+        db.close()
+    failed = sum(1 for r in results if r.ok is False)
+    unverified = sum(1 for r in results if r.ok is None)
+    print(f"{len(results)} cards written to {args.out}; {failed} failed verification")
+    if unverified:
+        print(f"{unverified} cards not verified: install pyzbar or opencv-python to decode them")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
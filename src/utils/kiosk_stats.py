@@ -0,0 +1,167 @@
+"""
+In-process live counters for kiosks, read by the admin dashboard.
+
+The scan path only does O(1) updates here (bucket increments, EWMA), and the
+dashboard reads snapshots, so no query ever hits the registry for live figures.
+
+Counters live in the process that updates them. To see every lab, kiosks
+report their snapshots to the ingestion service (scanner/ingest_client.py
+start_stats_reporter) and the dashboard pulls them back with set_remote();
+all_snapshots() merges them with the local kiosks.
+"""
+import os
+import platform
+import time
+from threading import Lock
+
+KIOSK_NAME = os.getenv("KIOSK_NAME") or platform.node() or "kiosk"
+STALE_SECONDS = 15      # a remote kiosk not heard from for this long shows as offline
+
+
+class RateWindow:
+    """Event counts over the last `seconds`, bucketed per second."""
+    def __init__(self, seconds=60):
+        self.seconds = seconds
+        self._counts = [0] * seconds
+        self._stamps = [0] * seconds
+
+    def add(self, n=1, now=None):
+        sec = int(now if now is not None else time.time())
+        i = sec % self.seconds
+        if self._stamps[i] != sec:
+            self._stamps[i] = sec
+            self._counts[i] = 0
+        self._counts[i] += n
+
+    def total(self, now=None):
+        sec = int(now if now is not None else time.time())
+        return sum(c for c, s in zip(self._counts, self._stamps) if sec - s < self.seconds)
+
+    def rate(self, now=None):
+        """Average events per second over the window."""
+        return self.total(now) / self.seconds
+
+
+class KioskStats:
+    """Live counters for one kiosk. All updates are O(1) and thread-safe."""
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = Lock()
+        self.session_id = None
+        self.subject = ""
+        self.active = False
+        self.camera = None           # camera state name (scanner/capture.py)
+        self.present = 0
+        self.checked_out = 0
+        self.errors = 0
+        self.pending_writes = 0
+        self.latency_last = None     # seconds, scan -> commit
+        self.latency_avg = None
+        self.last_scan_ts = None
+        self.scans = RateWindow(60)
+        self.frames = RateWindow(5)
+
+    def set_session(self, session_id, subject=""):
+        with self._lock:
+            if session_id != self.session_id:
+                self.present = 0
+                self.checked_out = 0
+                self.errors = 0
+            self.session_id = session_id
+            self.subject = subject or ""
+
+    def set_active(self, active):
+        self.active = active
+
+    def set_camera(self, state):
+        self.camera = state
+
+    def frame_decoded(self):
+        self.frames.add()
+
+    def scan_accepted(self):
+        with self._lock:
+            self.last_scan_ts = time.time()
+            self.scans.add(now=self.last_scan_ts)
+            self.pending_writes += 1
+
+    def write_finished(self, scanned_at=None, kind=None, ok=True):
+        """
+        Call once per scan_accepted(), after the DB work ends.
+        kind: "in", "out" or None (nothing written).
+        """
+        with self._lock:
+            self.pending_writes = max(0, self.pending_writes - 1)
+            if not ok:
+                self.errors += 1
+                return
+            if kind == "in":
+                self.present += 1
+            elif kind == "out":
+                self.checked_out += 1
+            if scanned_at is not None:
+                latency = time.time() - scanned_at
+                self.latency_last = latency
+                if self.latency_avg is None:
+                    self.latency_avg = latency
+                else:
+                    self.latency_avg += self.EWMA_ALPHA * (latency - self.latency_avg)
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {
+                "name": self.name,
+                "session_id": self.session_id,
+                "subject": self.subject,
+                "active": self.active,
+                "camera": self.camera,
+                "present": self.present,
+                "checked_out": self.checked_out,
+                "errors": self.errors,
+                "pending_writes": self.pending_writes,
+                "scans_per_min": self.scans.total(now),
+                "decode_fps": self.frames.rate(now),
+                "latency_last": self.latency_last,
+                "latency_avg": self.latency_avg,
+                "last_scan_ts": self.last_scan_ts,
+                "age": 0.0,     # seconds since the figures were taken (remote kiosks)
+            }
+
+
+_kiosks = {}
+_kiosks_lock = Lock()
+
+
+def get(name=None):
+    """Return (creating if needed) the stats object for a kiosk."""
+    name = name or KIOSK_NAME
+    with _kiosks_lock:
+        stats = _kiosks.get(name)
+        if stats is None:
+            stats = _kiosks[name] = KioskStats(name)
+        return stats
+
+
+def snapshots():
+    """Kiosks running in this process."""
+    with _kiosks_lock:
+        kiosks = list(_kiosks.values())
+    return [k.snapshot() for k in kiosks]
+
+
+_remote = []            # snapshots of other machines' kiosks, from the ingestion service
+
+
+def set_remote(snaps):
+    global _remote
+    _remote = list(snaps)
+
+
+def all_snapshots():
+    """Local kiosks plus the remote ones last fetched; local figures win on a name clash."""
+    local = snapshots()
+    names = {s["name"] for s in local}
+    return local + [s for s in _remote if s["name"] not in names]
@@ -0,0 +1,222 @@
+"""
+Session lifecycle: close sessions once their end time has passed.
+
+Closing a session is set-based -- one UPDATE claims the batch by marking its
+still-active sessions inactive, one UPDATE stamps the check-out at end_time on
+every open registry row of the claimed sessions, and the rollup's checked_out
+counters are bumped per day by the rows that UPDATE changed -- so the cost does
+not depend on how many students forgot to scan out, and two app instances
+closing the same sessions never count them twice.
+
+SessionScheduler runs in a daemon thread. On start it closes everything that is
+already overdue (e.g. after the app was shut down overnight) in batches, then
+sleeps until the next active session ends, re-checking at least every
+HAAJAR_SESSION_CHECK_SECONDS (default 60). Call wake() after creating sessions.
+
+    python -m utils.lifecycle [--batch-size 200]     # one-off catch-up run
+"""
+import argparse
+import os
+from collections import Counter, namedtuple
+from datetime import datetime
+from threading import Thread, Event
+from sqlalchemy import and_, or_, select, update
+from db import SessionLocal
+from models import Registry, Session
+from utils import rollup, timestamps
+from utils.events import bus, SESSION_CLOSED, SessionClosedEvent
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = 200
+CHECK_SECONDS = float(os.getenv("HAAJAR_SESSION_CHECK_SECONDS", 60))
+
+_RollupKey = namedtuple("_RollupKey", "user_id subject_id faculty_id date")
+
+
+def _overdue(now):
+    """Active sessions whose end time is at or before `now`."""
+    return and_(
+        Session.is_active.is_(True),
+        Session.end_time.isnot(None),
+        or_(Session.date < now.date(), and_(Session.date == now.date(), Session.end_time <= now.time())),
+    )
+
+
+def overdue_session_ids(db, now=None, limit=None):
+    stmt = select(Session.id).where(_overdue(now or datetime.now())).order_by(Session.date, Session.end_time)
+    if limit:
+        stmt = stmt.limit(limit)
+    return list(db.execute(stmt).scalars())
+
+
+def _claim(db, session_ids):
+    """
+    Mark the still-active sessions of `session_ids` inactive and return their ids.
+    Every app instance runs the scheduler, so only the instance whose UPDATE
+    flips is_active owns a session's auto check-out.
+    """
+    active = and_(Session.id.in_(session_ids), Session.is_active.is_(True))
+    if db.get_bind().dialect.update_returning:
+        return list(db.execute(
+            update(Session).where(active).values(is_active=False)
+            .returning(Session.id).execution_options(synchronize_session=False)
+        ).scalars())
+    # MySQL has no UPDATE ... RETURNING: lock the rows, then flip them
+    claimed = list(db.execute(select(Session.id).where(active).with_for_update()).scalars())
+    if claimed:
+        db.execute(
+            update(Session).where(Session.id.in_(claimed)).values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+    return claimed
+
+
+def _check_out_open_rows(db, session_ids):
+    """Stamp end_time on the open registry rows of `session_ids`. Returns {session_id: rows updated}."""
+    dialect = db.get_bind().dialect
+    is_open = and_(Registry.session_id.in_(session_ids), Registry.check_out_time.is_(None))
+    end_time = select(Session.end_time).where(Session.id == Registry.session_id).scalar_subquery()
+    end_at = select(timestamps.session_end(dialect.name)).where(Session.id == Registry.session_id).scalar_subquery()
+    stmt = update(Registry).where(is_open).values(check_out_time=end_time, checked_out_at=end_at)\
+        .execution_options(synchronize_session=False)
+    if dialect.update_returning:
+        # count what this UPDATE changed, not what was open a moment earlier:
+        # a kiosk check-out in between is counted by the kiosk
+        updated = db.execute(stmt.returning(Registry.session_id)).scalars()
+    else:
+        updated = db.execute(select(Registry.session_id).where(is_open).with_for_update()).scalars().all()
+        db.execute(stmt)
+    return Counter(updated)
+
+
+def close_sessions(db, session_ids):
+    """
+    Claim the sessions of `session_ids` that are still active, auto check-out
+    their open registry rows at the session's end time and bump the rollup.
+    Commits. Returns {session_id: rows checked out} for the sessions this call
+    closed; sessions another instance closed first are left out.
+    """
+    if not session_ids:
+        return {}
+    try:
+        claimed = _claim(db, session_ids)
+        if not claimed:
+            db.commit()
+            return {}
+        counts = _check_out_open_rows(db, claimed)
+        per_day = {}
+        for row in db.execute(
+            select(Session.id, Session.user_id, Session.subject_id, Session.faculty_id, Session.date)
+            .where(Session.id.in_(claimed))
+        ):
+            if counts.get(row[0]):
+                key = _RollupKey(*row[1:5])
+                per_day[key] = per_day.get(key, 0) + counts[row[0]]
+        for key, count in per_day.items():
+            rollup.bump(db, key, checked_out=count)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    checked_out = {session_id: counts.get(session_id, 0) for session_id in claimed}
+    logger.info(f"Closed {len(claimed)} sessions, auto checked-out {sum(checked_out.values())} students")
+    return checked_out
+
+
+def close_overdue(db, now=None, batch_size=BATCH_SIZE):
+    """Close every overdue session, `batch_size` sessions per transaction. Returns the number closed."""
+    now = now or datetime.now()
+    total = 0
+    while True:
+        ids = overdue_session_ids(db, now, batch_size)
+        if not ids:
+            return total
+        closed = close_sessions(db, ids)
+        for session_id, count in closed.items():
+            bus.publish(SESSION_CLOSED, SessionClosedEvent(session_id, count, now))
+        total += len(closed)
+
+
+def next_end(db, now=None):
+    """End datetime of the next active session to finish after `now`, or None."""
+    now = now or datetime.now()
+    row = db.execute(
+        select(Session.date, Session.end_time)
+        .where(Session.is_active.is_(True), Session.end_time.isnot(None), Session.date >= now.date())
+        .order_by(Session.date, Session.end_time)
+        .limit(1)
+    ).first()
+    return datetime.combine(row.date, row.end_time) if row else None
+
+
+class SessionScheduler:
+    def __init__(self, check_seconds=CHECK_SECONDS, batch_size=BATCH_SIZE):
+        self.check_seconds = check_seconds
+        self.batch_size = batch_size
+        self._wake = Event()
+        self._stop_event = Event()
+        self._thread = None
+
+    def start(self):
+        """Catch up on overdue sessions, then keep closing sessions as they end. Idempotent."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="session-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def wake(self):
+        """Re-plan now, e.g. after sessions were created or edited."""
+        self._wake.set()
+
+    def _tick(self):
+        db = SessionLocal()
+        try:
+            closed = close_overdue(db, batch_size=self.batch_size)
+            upcoming = next_end(db)
+        finally:
+            db.close()
+        if closed:
+            logger.info(f"Session scheduler closed {closed} overdue sessions")
+        timeout = self.check_seconds
+        if upcoming is not None:
+            timeout = min(timeout, max((upcoming - datetime.now()).total_seconds(), 0) + 1)
+        return timeout
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                timeout = self._tick()
+            except Exception as e:
+                logger.error(f"Session scheduler run failed: {e}")
+                timeout = self.check_seconds
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+
+# Shared instance
+scheduler = SessionScheduler()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Close sessions whose end time has passed.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        closed = close_overdue(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Closed {closed} overdue sessions.")
+
+
+if __name__ == "__main__":
+    main()
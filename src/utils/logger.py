@@ -1,30 +1,162 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
+import time
+from threading import Lock
+
+# Loggers only enqueue records; a single background listener does the file and
+# console I/O, so slow disks or terminals never stall the camera loop.
+#
+# Environment:
+#   HAAJAR_LOG_FILE        log file path (default haajar_app.log)
+#   HAAJAR_LOG_MAX_BYTES   rotate after this many bytes (default 5 MB)
+#   HAAJAR_LOG_BACKUPS     rotated files to keep (default 5)
+#   HAAJAR_LOG_JSON        "1" to write the file as JSON lines
+#   HAAJAR_LOG_LEVEL       INFO, DEBUG, ... (default INFO)
+
+_queue = queue.SimpleQueue()
+_queue_handler = logging.handlers.QueueHandler(_queue)
+_listener = None
+_setup_lock = Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _start_listener():
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+        # Rotating file handler
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.getenv("HAAJAR_LOG_FILE", "haajar_app.log"),
+            maxBytes=int(os.getenv("HAAJAR_LOG_MAX_BYTES", 5 * 1024 * 1024)),
+            backupCount=int(os.getenv("HAAJAR_LOG_BACKUPS", 5)),
+            encoding="utf-8",
+        )
+        if os.getenv("HAAJAR_LOG_JSON") == "1":
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(formatter)
+
+        # Stream Handler (Console)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+
+        _listener = logging.handlers.QueueListener(
+            _queue, file_handler, stream_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def queue_depth():
+    """Records waiting for the background listener."""
+    return _queue.qsize()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
 
 def get_logger(name: str) -> logging.Logger:
     """
     Returns a configured logger instance.
-    Logs are written to 'haajar_app.log' and printed to stdout.
+    Records go through a queue to a background listener that writes
+    the rotating 'haajar_app.log' and stdout.
     """
     logger = logging.getLogger(name)
-    
+
     # If logger already has handlers, assume it's configured and return it
     if logger.hasHandlers():
         return logger
-        
-    logger.setLevel(logging.INFO)
 
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    _start_listener()
+    logger.setLevel(os.getenv("HAAJAR_LOG_LEVEL", "INFO").upper())
+    logger.addHandler(_queue_handler)
+    logger.propagate = False
 
-    # File Handler
-    file_handler = logging.FileHandler('haajar_app.log')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    return logger
+
+
+def get_file_logger(name: str, filename: str) -> logging.Logger:
+    """
+    Logger that writes only to its own rotating file (e.g. the slow-query log),
+    through the same background queue pipeline.
+    """
+    logger = logging.getLogger(name)
+    if logger.hasHandlers():
+        return logger
 
-    # Stream Handler (Console)
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    file_handler = logging.handlers.RotatingFileHandler(
+        filename,
+        maxBytes=int(os.getenv("HAAJAR_LOG_MAX_BYTES", 5 * 1024 * 1024)),
+        backupCount=int(os.getenv("HAAJAR_LOG_BACKUPS", 5)),
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), file_handler)
+    listener.start()
+    atexit.register(listener.stop)
 
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.handlers.QueueHandler(listener.queue))
+    logger.propagate = False
     return logger
+
+
+class SampledLogger:
+    """
+    Rate-limited wrapper for per-frame events: logs a given key at most once
+    per `interval` seconds and reports how many messages were dropped.
+    Disabled levels cost one isEnabledFor() check.
+    """
+    def __init__(self, logger, interval=1.0):
+        self.logger = logger
+        self.interval = interval
+        self._last = {}        # key -> last emit ts
+        self._dropped = {}     # key -> count since last emit
+
+    def log(self, level, key, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        if now - self._last.get(key, 0) < self.interval:
+            self._dropped[key] = self._dropped.get(key, 0) + 1
+            return
+        self._last[key] = now
+        dropped = self._dropped.pop(key, 0)
+        if dropped:
+            msg = f"{msg} (+{dropped} suppressed)"
+        self.logger.log(level, msg, *args)
+
+    def debug(self, key, msg, *args):
+        self.log(logging.DEBUG, key, msg, *args)
+
+    def info(self, key, msg, *args):
+        self.log(logging.INFO, key, msg, *args)
@@ -0,0 +1,342 @@
+"""
+Lightweight in-process metrics: counters, gauges and histograms.
+
+Metrics can be exposed over a local HTTP endpoint in Prometheus text format and/or
+written periodically to a JSON snapshot file. Both are off unless configured:
+
+    HAAJAR_METRICS_PORT       serve /metrics on 127.0.0.1:<port>
+    HAAJAR_METRICS_HOST       bind address (default 127.0.0.1)
+    HAAJAR_METRICS_SNAPSHOT   path of the JSON snapshot file
+    HAAJAR_METRICS_INTERVAL   snapshot interval in seconds (default 60)
+"""
+import bisect
+import json
+import os
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread, Event
+from utils.logger import get_logger, queue_depth
+from utils import kiosk_stats
+
+logger = get_logger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self.labels()
+
+    def samples(self):
+        """Yield (suffix, label dict, value)."""
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                yield suffix, dict(labels, **extra), value
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        """Compute the value at collection time (e.g. a queue's qsize)."""
+        self.fn = fn
+
+    def samples(self):
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                value = float("nan")
+        yield "", {}, value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, fn):
+        self._default().set_function(fn)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, c in zip(self.buckets, counts):
+            cumulative += c
+            yield "_bucket", {"le": repr(bound)}, cumulative
+        yield "_bucket", {"le": "+Inf"}, count
+        yield "_sum", {}, total
+        yield "_count", {}, count
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _get_or_create(self, cls, name, help, labelnames, **kw):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kw)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for suffix, labels, value in m.samples():
+                if labels:
+                    rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                    lines.append(f"{m.name}{suffix}{{{rendered}}} {_fmt(value)}")
+                else:
+                    lines.append(f"{m.name}{suffix} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Plain dict: name -> list of {labels, suffix, value}."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            m.name: [
+                {"suffix": suffix, "labels": labels, "value": value}
+                for suffix, labels, value in m.samples()
+            ]
+            for m in metrics
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value):
+    if value != value:
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+# --- Application metrics ---------------------------------------------------
+
+FRAMES_CAPTURED = counter("haajar_frames_captured_total", "Camera frames read successfully")
+FRAMES_DECODED = counter("haajar_frames_decoded_total", "Frames run through the barcode decoders")
+FRAME_READ_FAILURES = counter("haajar_frame_read_failures_total", "Failed camera reads")
+CAMERA_UP = gauge("haajar_camera_up", "1 while the camera delivers frames, else 0", ("device",))
+CAMERA_FRAME_AGE = gauge("haajar_camera_frame_age_seconds", "Seconds since the last camera frame", ("device",))
+CAMERA_STALLS = counter("haajar_camera_stalls_total", "Camera stalls detected by the watchdog", ("device",))
+CAMERA_RECONNECTS = counter("haajar_camera_reconnects_total", "Times a working camera was dropped and reopened", ("device",))
+DECODE_SECONDS = histogram("haajar_decode_seconds", "Time per decode stage", ("stage",))
+SCANS = counter("haajar_scans_total", "Decoded payloads by outcome", ("outcome",))
+DB_QUERY_SECONDS = histogram("haajar_db_query_seconds", "Database statement latency by type", ("kind",))
+INGEST_SCANS = counter("haajar_ingest_scans_total", "Scans handled by the ingestion service", ("kiosk", "outcome"))
+INGEST_DEAD_LETTERS = counter("haajar_ingest_dead_letters_total", "Scan writes the database rejected, set aside by the ingestion service")
+PENDING_DB_WRITES = gauge("haajar_pending_db_writes", "Scans waiting for their DB write")
+LOG_QUEUE_DEPTH = gauge("haajar_log_queue_depth", "Records waiting for the log listener")
+DB_POOL_CHECKED_OUT = gauge("haajar_db_pool_checked_out", "Connections in use per engine pool", ("pool",))
+TK_LOOP_LAG = histogram(
+    "haajar_tk_event_loop_lag_seconds", "Delay of Tk timer callbacks beyond schedule",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+LOG_QUEUE_DEPTH.set_function(queue_depth)
+PENDING_DB_WRITES.set_function(lambda: sum(s["pending_writes"] for s in kiosk_stats.snapshots()))
+
+
+def watch_pool(name, pool):
+    """Report a connection pool's checked-out count as DB_POOL_CHECKED_OUT{pool=name}."""
+    checkedout = getattr(pool, "checkedout", None)
+    if checkedout is not None:
+        DB_POOL_CHECKED_OUT.labels(pool=name).set_function(checkedout)
+
+
+def watch_event_loop(widget, interval_ms=250):
+    """Measure how late Tk runs `after` callbacks; records into TK_LOOP_LAG."""
+    expected = [time.perf_counter() + interval_ms / 1000]
+
+    def _tick():
+        now = time.perf_counter()
+        TK_LOOP_LAG.observe(max(0.0, now - expected[0]))
+        expected[0] = now + interval_ms / 1000
+        widget.after(interval_ms, _tick)
+
+    widget.after(interval_ms, _tick)
+
+
+# --- Exposition ------------------------------------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    logger.info(f"Metrics endpoint on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def write_snapshot(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"ts": time.time(), "metrics": REGISTRY.snapshot()}, f, default=str)
+    os.replace(tmp, path)
+
+
+def start_snapshot_writer(path, interval=60):
+    stop = Event()
+
+    def _loop():
+        while not stop.wait(interval):
+            try:
+                write_snapshot(path)
+            except Exception as e:
+                logger.error(f"Metrics snapshot failed: {e}")
+
+    Thread(target=_loop, daemon=True, name="metrics-snapshot").start()
+    return stop
+
+
+def start_from_env():
+    """Start whichever exporters are configured through HAAJAR_METRICS_*."""
+    port = os.getenv("HAAJAR_METRICS_PORT")
+    if port:
+        try:
+            start_http_server(int(port), os.getenv("HAAJAR_METRICS_HOST", "127.0.0.1"))
+        except Exception as e:
+            logger.error(f"Could not start metrics endpoint: {e}")
+    path = os.getenv("HAAJAR_METRICS_SNAPSHOT")
+    if path:
+        start_snapshot_writer(path, float(os.getenv("HAAJAR_METRICS_INTERVAL", 60)))
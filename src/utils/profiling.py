@@ -0,0 +1,253 @@
+"""
+Opt-in profiling hooks for field diagnostics.
+
+Off by default; every hook is a flag check when disabled. Turn on with
+HAAJAR_PROFILE=1 or from the Admin Dashboard. Dumps go to HAAJAR_PROFILE_DIR
+(default ./profiles):
+
+- stage(name)        per-stage wall-clock timers (count / total / max)
+- profiled(name)     cProfile one call in every HAAJAR_PROFILE_SAMPLE calls
+- loop_window(name)  cProfile a long-running loop in windows of
+                     HAAJAR_PROFILE_WINDOW seconds every HAAJAR_PROFILE_INTERVAL seconds
+- memory_snapshot()  tracemalloc top allocations
+
+Only one cProfile profiler runs at a time (Python 3.12+ refuses a second one
+in the process): a sampled call or loop window that finds another one active
+is timed but not profiled. A loop window's profiler is only ever enabled,
+disabled and dumped by the loop's own thread; disable() and dump_now() ask it
+to close at its next iteration.
+"""
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from threading import Lock, current_thread
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_NULL = nullcontext()
+
+
+class _State:
+    enabled = False
+    out_dir = os.getenv("HAAJAR_PROFILE_DIR", "profiles")
+    sample_every = int(os.getenv("HAAJAR_PROFILE_SAMPLE", 10))
+    window = float(os.getenv("HAAJAR_PROFILE_WINDOW", 10))
+    interval = float(os.getenv("HAAJAR_PROFILE_INTERVAL", 120))
+
+
+_state = _State()
+_lock = Lock()
+_stages = {}        # name -> [count, total, max]
+_calls = {}         # name -> call counter for sampling
+_windows = {}       # name -> _LoopWindow
+_profiler_slot = Lock()     # held while any cProfile profiler is open
+
+
+def is_enabled():
+    return _state.enabled
+
+
+def enable():
+    os.makedirs(_state.out_dir, exist_ok=True)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+    _state.enabled = True
+    logger.info(f"Profiling enabled, dumps in {os.path.abspath(_state.out_dir)}")
+
+
+def disable():
+    _state.enabled = False
+    _close_windows()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    logger.info("Profiling disabled")
+
+
+def _path(name, ext):
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(_state.out_dir, f"{name}-{stamp}.{ext}")
+
+
+# --- stage timers ------------------------------------------------------------
+
+@contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            entry = _stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+
+def stage(name):
+    """Context manager timing one stage; a shared no-op when disabled."""
+    if not _state.enabled:
+        return _NULL
+    return _timed(name)
+
+
+def stage_report():
+    with _lock:
+        return {
+            name: {"count": c, "total_s": total, "avg_ms": total / c * 1000 if c else 0, "max_ms": mx * 1000}
+            for name, (c, total, mx) in _stages.items()
+        }
+
+
+# --- cProfile ----------------------------------------------------------------
+
+def profiled(name):
+    """Decorator: when enabled, cProfile one call out of every `sample_every`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with _lock:
+                n = _calls[name] = _calls.get(name, 0) + 1
+            with _timed(name):
+                if (n - 1) % _state.sample_every or not _acquire_slot():
+                    return fn(*args, **kwargs)
+                profiler = cProfile.Profile()
+                try:
+                    return profiler.runcall(fn, *args, **kwargs)
+                finally:
+                    _profiler_slot.release()
+                    _dump_profile(profiler, name)
+        return wrapper
+    return decorator
+
+
+def _dump_profile(profiler, name):
+    try:
+        path = _path(name, "prof")
+        profiler.dump_stats(path)
+        logger.info(f"Profile written: {path}")
+    except Exception as e:
+        logger.error(f"Could not write profile for {name}: {e}")
+
+
+class _LoopWindow:
+    """Profiles consecutive iterations of one loop for `window` seconds, then rests."""
+    def __init__(self, name):
+        self.name = name
+        self.profiler = None
+        self.owner = None           # thread running the loop
+        self.opened_at = 0.0
+        self.next_open = 0.0
+        self.close_requested = False
+
+    def close(self):
+        """Dump and free the profiler. Owning thread only (or once it has exited)."""
+        self.close_requested = False
+        if self.profiler is not None:
+            profiler, self.profiler = self.profiler, None
+            _profiler_slot.release()
+            _dump_profile(profiler, self.name)
+            memory_snapshot(self.name)
+
+    def request_close(self):
+        if self.owner is not None and not self.owner.is_alive():
+            self.close()
+        else:
+            self.close_requested = True
+
+    @contextmanager
+    def iteration(self):
+        self.owner = current_thread()
+        if self.close_requested or not _state.enabled:
+            self.close()
+        now = time.monotonic()
+        if (_state.enabled and self.profiler is None and now >= self.next_open
+                and _acquire_slot()):
+            self.profiler = cProfile.Profile()
+            self.opened_at = now
+        profiler = self.profiler
+        if profiler is None:
+            yield
+            return
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if time.monotonic() - self.opened_at >= _state.window:
+                self.close()
+                self.next_open = time.monotonic() + _state.interval
+
+
+def _acquire_slot():
+    """Take the single profiler slot without waiting; frees one left by a loop thread that exited."""
+    if _profiler_slot.acquire(blocking=False):
+        return True
+    with _lock:
+        for window in list(_windows.values()):
+            if window.profiler is not None and window.owner is not None and not window.owner.is_alive():
+                window.close()
+    return _profiler_slot.acquire(blocking=False)
+
+
+def _close_windows():
+    for window in list(_windows.values()):
+        window.request_close()
+
+
+def loop_window(name):
+    """
+    Wrap each iteration of a hot loop: `with profiling.loop_window("camera_loop"): ...`.
+    Must be used from the loop's own thread (cProfile is per-thread).
+    """
+    window = _windows.get(name)
+    if not _state.enabled and (window is None or window.profiler is None):
+        return _NULL
+    if window is None:
+        window = _windows[name] = _LoopWindow(name)
+    return window.iteration()
+
+
+# --- memory / dumps ----------------------------------------------------------
+
+def memory_snapshot(label="snapshot", limit=25):
+    """Write the top tracemalloc allocations by line. No-op unless tracing."""
+    if not tracemalloc.is_tracing():
+        return None
+    try:
+        stats = tracemalloc.take_snapshot().statistics("lineno")
+        path = _path(f"{label}-mem", "txt")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"current={current} peak={peak}\n")
+            for stat in stats[:limit]:
+                f.write(f"{stat}\n")
+        return path
+    except Exception as e:
+        logger.error(f"Could not write memory snapshot: {e}")
+        return None
+
+
+def dump_now():
+    """Stage timers and a memory snapshot to disk; open loop windows dump at their next iteration."""
+    if not _state.enabled:
+        return None
+    _close_windows()
+    path = _path("stages", "json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stage_report(), f, indent=2)
+    memory_snapshot("manual")
+    logger.info(f"Profiling dump written to {os.path.abspath(_state.out_dir)}")
+    return path
+
+
+if os.getenv("HAAJAR_PROFILE") == "1":
+    enable()
@@ -0,0 +1,179 @@
+"""
+Lean read model for the list views.
+
+Each query selects only the columns a view shows, joins everything it needs in a
+single statement and returns compact namedtuple rows. Nothing goes through the
+ORM identity map, so there are no lazy loads after the session is closed.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from sqlalchemy import select, desc, func, or_
+from models import Registry, Session, Student, Subject, Faculty
+from utils import archive, rollup
+
+RegistryRow = namedtuple(
+    "RegistryRow",
+    "id session_id date check_in_time check_out_time student_name roll_no subject faculty late_reason updated_at",
+    defaults=(None,),
+)
+SessionRow = namedtuple(
+    "SessionRow",
+    "id date start_time end_time subject faculty is_active",
+)
+HomeStats = namedtuple("HomeStats", "students faculty sessions checkins_today")
+
+# Changes are re-read this far behind the watermark: a write stamped before it
+# may commit after it was taken
+CHANGE_OVERLAP = timedelta(seconds=10)
+
+
+def _apply_filters(stmt, filters):
+    if filters.get('start_date'):
+        stmt = stmt.where(Session.date >= filters['start_date'])
+    if filters.get('end_date'):
+        stmt = stmt.where(Session.date <= filters['end_date'])
+    if filters.get('faculty_id'):
+        stmt = stmt.where(Session.faculty_id == filters['faculty_id'])
+    if filters.get('subject_id'):
+        stmt = stmt.where(Session.subject_id == filters['subject_id'])
+    return stmt
+
+
+def latest_session_id(user_id):
+    """Scalar subquery: id of the user's most recent session."""
+    return select(Session.id)\
+        .where(Session.user_id == user_id)\
+        .order_by(desc(Session.date), desc(Session.start_time))\
+        .limit(1)\
+        .scalar_subquery()
+
+
+def registry_change_mark(db):
+    """Latest Registry.updated_at (an index lookup): the starting change watermark for registry_rows."""
+    return db.execute(select(func.max(Registry.updated_at))).scalar()
+
+
+def registry_rows(db, user_id, filters=None, since_id=None, changed_since=None):
+    """
+    Registry entries for the registry view. Without filters, only the most
+    recent session is returned (resolved in the same statement).
+    With since_id, only entries added after that registry id (the view's
+    watermark), plus with changed_since those updated since that time (check-
+    outs, auto check-outs); rows carry updated_at to advance it.
+    Filters that reach back before the archive boundary also return the
+    matching archived rows (utils/archive.py).
+    """
+    stmt = select(
+        Registry.id,
+        Registry.session_id,
+        Session.date,
+        Registry.check_in_time,
+        Registry.check_out_time,
+        Student.name,
+        Student.roll_no,
+        Subject.title,
+        Faculty.name,
+        Registry.late_check_in_reason,
+        Registry.updated_at,
+    ).join(Session, Registry.session_id == Session.id)\
+        .join(Student, Registry.student_id == Student.id)\
+        .join(Subject, Session.subject_id == Subject.id)\
+        .join(Faculty, Session.faculty_id == Faculty.id)\
+        .where(Session.user_id == user_id)
+
+    if filters:
+        stmt = _apply_filters(stmt, filters)
+    else:
+        stmt = stmt.where(Session.id == latest_session_id(user_id))
+    if since_id is not None:
+        if changed_since is not None:
+            stmt = stmt.where(or_(Registry.id > since_id, Registry.updated_at >= changed_since - CHANGE_OVERLAP))
+        else:
+            stmt = stmt.where(Registry.id > since_id)
+
+    stmt = stmt.order_by(Session.date, Registry.id)
+    rows = [RegistryRow._make(row) for row in db.execute(stmt)]
+    if filters and since_id is None and archive.reaches_archive(user_id, filters):
+        rows = _with_archived(rows, archive.read_registry(user_id, filters))
+    return rows
+
+
+def _none(value):
+    return None if value is None or value != value else value   # NaN / NaT -> None
+
+
+def _with_archived(rows, old):
+    if old.empty:
+        return rows
+    live_ids = {r.id for r in rows}
+    archived = [
+        RegistryRow(int(r.id), int(r.session_id), r.date, _none(r.check_in_time), _none(r.check_out_time),
+                    r.student_name, r.roll_no, r.subject, r.faculty, _none(r.late_reason))
+        for r in old.itertuples(index=False) if r.id not in live_ids
+    ]
+    return sorted(archived + rows, key=lambda r: (r.date, r.id))
+
+
+def session_rows(db, user_id, filters=None, limit=None, since_id=None, ids=None):
+    """
+    Sessions for the sessions view (and the home page), newest first.
+    With since_id, only sessions created after that id; with ids, only those
+    sessions (still subject to filters).
+    """
+    stmt = select(
+        Session.id,
+        Session.date,
+        Session.start_time,
+        Session.end_time,
+        Subject.title,
+        Faculty.name,
+        Session.is_active,
+    ).outerjoin(Subject, Session.subject_id == Subject.id)\
+        .outerjoin(Faculty, Session.faculty_id == Faculty.id)\
+        .where(Session.user_id == user_id)
+
+    if filters:
+        stmt = _apply_filters(stmt, filters)
+        if filters.get('status') and filters['status'] != "All":
+            stmt = stmt.where(Session.is_active == (filters['status'] == "Active"))
+    if since_id is not None:
+        stmt = stmt.where(Session.id > since_id)
+    if ids is not None:
+        stmt = stmt.where(Session.id.in_(ids))
+
+    stmt = stmt.order_by(desc(Session.date), desc(Session.start_time))
+    if limit:
+        stmt = stmt.limit(limit)
+    return [SessionRow._make(row) for row in db.execute(stmt)]
+
+
+def session_rows_by_id(db, user_id, session_ids, filters=None, chunk=500):
+    """{session_id: SessionRow} for those of session_ids that still match filters."""
+    session_ids = list(session_ids)
+    found = {}
+    for i in range(0, len(session_ids), chunk):
+        for row in session_rows(db, user_id, filters, ids=session_ids[i:i + chunk]):
+            found[row.id] = row
+    return found
+
+
+def session_change_mark(db):
+    """Latest Session.updated_at (an index lookup): the starting change watermark for changed_sessions."""
+    return db.execute(select(func.max(Session.updated_at))).scalar()
+
+
+def changed_sessions(db, user_id, since):
+    """{session_id: updated_at} of the user's sessions updated since `since` (auto-closed, marked inactive)."""
+    stmt = select(Session.id, Session.updated_at)\
+        .where(Session.user_id == user_id, Session.updated_at >= since - CHANGE_OVERLAP)
+    return dict(db.execute(stmt).all())
+
+
+def home_stats(db, user_id):
+    """Counts for the home page cards. Attendance comes from the daily rollup, not the registry."""
+    return HomeStats(
+        db.execute(select(func.count(Student.id)).where(Student.user_id == user_id)).scalar(),
+        db.execute(select(func.count(Faculty.id)).where(Faculty.user_id == user_id)).scalar(),
+        db.execute(select(func.count(Session.id)).where(Session.user_id == user_id)).scalar(),
+        rollup.today_totals(db, user_id)[0],
+    )
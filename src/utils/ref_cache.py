@@ -0,0 +1,116 @@
+"""
+Process-wide cache of per-department reference data (subjects, faculty).
+
+Every tab reads these tiny tables, so they are fetched once per user and shared.
+Entries expire after TTL seconds; a background thread refreshes known users
+before that happens. Subjects and faculty are added outside the app (another
+machine, the database directly), so a lookup that misses invalidates the
+department and reloads it once.
+Values are plain tuples (never ORM objects), so they are safe across sessions and threads.
+"""
+import time
+from collections import namedtuple
+from threading import Lock, Thread, Event
+from db import SessionLocal
+from models import Subject, Faculty
+from utils.logger import get_logger
+
+SubjectRef = namedtuple("SubjectRef", "id title course_code")
+FacultyRef = namedtuple("FacultyRef", "id name faculty_no department")
+
+_RefData = namedtuple("_RefData", "loaded_at subjects faculties")
+
+
+class ReferenceCache:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.logger = get_logger(self.__class__.__name__)
+        self._entries = {}      # user_id -> _RefData
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._refresher = None
+
+    def _load(self, user_id):
+        db = SessionLocal()
+        try:
+            subjects = db.query(Subject.id, Subject.title, Subject.course_code)\
+                .filter(Subject.user_id == user_id).order_by(Subject.title).all()
+            faculties = db.query(Faculty.id, Faculty.name, Faculty.faculty_no, Faculty.department)\
+                .filter(Faculty.user_id == user_id).order_by(Faculty.name).all()
+        finally:
+            db.close()
+        data = _RefData(
+            time.time(),
+            {row.id: SubjectRef(*row) for row in subjects},
+            {row.id: FacultyRef(*row) for row in faculties},
+        )
+        with self._lock:
+            self._entries[user_id] = data
+        return data
+
+    def _get(self, user_id):
+        with self._lock:
+            data = self._entries.get(user_id)
+        if data is None or time.time() - data.loaded_at >= self.ttl:
+            data = self._load(user_id)
+        return data
+
+    def subjects(self, user_id):
+        """id -> SubjectRef for the department, ordered by title."""
+        return self._get(user_id).subjects
+
+    def faculties(self, user_id):
+        """id -> FacultyRef for the department, ordered by name."""
+        return self._get(user_id).faculties
+
+    def _find(self, user_id, pick):
+        found = pick(self._get(user_id))
+        if found is None:
+            self.invalidate(user_id)
+            found = pick(self._get(user_id))
+        return found
+
+    def subject(self, user_id, subject_id):
+        return self._find(user_id, lambda data: data.subjects.get(subject_id))
+
+    def faculty(self, user_id, faculty_id):
+        return self._find(user_id, lambda data: data.faculties.get(faculty_id))
+
+    def subject_by_title(self, user_id, title):
+        return self._find(user_id, lambda data: next((s for s in data.subjects.values() if s.title == title), None))
+
+    def faculty_by_name(self, user_id, name):
+        return self._find(user_id, lambda data: next((f for f in data.faculties.values() if f.name == name), None))
+
+    def invalidate(self, user_id=None):
+        """Forget cached data for one user, or for everyone."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def start_background_refresh(self, interval=None):
+        """Reload known users every `interval` seconds (default ttl/2). Idempotent."""
+        if self._refresher and self._refresher.is_alive():
+            return
+        interval = interval or self.ttl / 2
+        self._stop_event.clear()
+        self._refresher = Thread(target=self._refresh_loop, args=(interval,), daemon=True)
+        self._refresher.start()
+
+    def stop_background_refresh(self):
+        self._stop_event.set()
+
+    def _refresh_loop(self, interval):
+        while not self._stop_event.wait(interval):
+            with self._lock:
+                user_ids = list(self._entries)
+            for user_id in user_ids:
+                try:
+                    self._load(user_id)
+                except Exception as e:
+                    self.logger.error(f"Reference data refresh failed for user {user_id}: {e}")
+
+
+ref_cache = ReferenceCache()
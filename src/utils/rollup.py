@@ -0,0 +1,182 @@
+"""
+Daily attendance rollup keyed by (user, subject, faculty, date).
+
+The kiosk calls record_check_in / record_check_out inside the same transaction
+that writes the registry row, so the rollup never drifts from the registry.
+rebuild() recomputes rows from the registry for backfill or repair. Dates
+before a user's archive boundary are left alone, since their registry rows now
+live in Parquet (utils/archive.py):
+
+    python -m utils.rollup --rebuild [--user ID] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+"""
+import argparse
+from datetime import date
+from sqlalchemy import func, insert, or_, select, update, delete
+from models import AttendanceRollup, Registry, Session
+from utils import archive, timestamps
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COUNTERS = ("present", "late", "checked_out")
+
+
+def _key(session_row):
+    return {
+        "user_id": session_row.user_id,
+        "subject_id": session_row.subject_id,
+        "faculty_id": session_row.faculty_id,
+        "date": session_row.date,
+    }
+
+
+def _upsert(db, key, increments):
+    """Add increments to one rollup row, creating it if needed."""
+    values = dict(key, **{c: increments.get(c, 0) for c in COUNTERS})
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(AttendanceRollup).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            {c: getattr(AttendanceRollup, c) + getattr(stmt.inserted, c) for c in COUNTERS}
+        )
+        db.execute(stmt)
+        return
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(AttendanceRollup).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={c: getattr(AttendanceRollup, c) + getattr(stmt.excluded, c) for c in COUNTERS},
+        )
+        db.execute(stmt)
+        return
+
+    # generic fallback: UPDATE, then INSERT if nothing matched
+    result = db.execute(
+        update(AttendanceRollup)
+        .where(*(getattr(AttendanceRollup, k) == v for k, v in key.items()))
+        .values({c: getattr(AttendanceRollup, c) + increments.get(c, 0) for c in COUNTERS})
+    )
+    if result.rowcount == 0:
+        db.execute(insert(AttendanceRollup).values(**values))
+
+
+def bump(db, session_row, present=0, late=0, checked_out=0):
+    """Add arbitrary increments (e.g. a batch's totals) for session_row's day. Does not commit."""
+    _upsert(db, _key(session_row), {"present": present, "late": late, "checked_out": checked_out})
+
+
+def record_check_in(db, session_row, late=False):
+    """Count one check-in for session_row's day. Does not commit."""
+    _upsert(db, _key(session_row), {"present": 1, "late": 1 if late else 0})
+
+
+def record_check_out(db, session_row):
+    """Count one check-out for session_row's day. Does not commit."""
+    _upsert(db, _key(session_row), {"checked_out": 1})
+
+
+def rebuild(db, user_id=None, start_date=None, end_date=None, archive_dir=archive.ARCHIVE_DIR):
+    """
+    Recompute rollup rows from the registry with one INSERT ... SELECT.
+    Existing rows in the same scope are deleted first. Dates before a user's
+    archive boundary are skipped. Commits.
+    """
+    purge = delete(AttendanceRollup)
+    source = select(
+        Session.user_id,
+        Session.subject_id,
+        Session.faculty_id,
+        Session.date,
+        func.count(Registry.id),
+        func.sum(timestamps.late_flag()),
+        func.count(Registry.check_out_time),
+    ).join(Registry, Registry.session_id == Session.id)
+
+    if user_id is not None:
+        purge = purge.where(AttendanceRollup.user_id == user_id)
+        source = source.where(Session.user_id == user_id)
+    if start_date:
+        purge = purge.where(AttendanceRollup.date >= start_date)
+        source = source.where(Session.date >= start_date)
+    if end_date:
+        purge = purge.where(AttendanceRollup.date <= end_date)
+        source = source.where(Session.date <= end_date)
+
+    # archived days have no registry rows left: recomputing would zero them
+    manifest = archive.load_manifest(archive_dir)
+    if user_id is not None:
+        manifest = {user_id: manifest[user_id]} if user_id in manifest else {}
+    for uid, first_live in manifest.items():
+        purge = purge.where(or_(AttendanceRollup.user_id != uid, AttendanceRollup.date >= first_live))
+        source = source.where(or_(Session.user_id != uid, Session.date >= first_live))
+        if not start_date or str(start_date) < first_live.isoformat():
+            logger.warning(f"Rollup rebuild skips user {uid}'s archived dates before {first_live}")
+
+    source = source.group_by(Session.user_id, Session.subject_id, Session.faculty_id, Session.date)
+
+    try:
+        db.execute(purge)
+        result = db.execute(
+            insert(AttendanceRollup).from_select(
+                ["user_id", "subject_id", "faculty_id", "date", "present", "late", "checked_out"],
+                source,
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info(f"Rollup rebuilt (user={user_id}, {start_date}..{end_date}): {result.rowcount} rows")
+    return result.rowcount
+
+
+def totals(db, user_id, start_date=None, end_date=None):
+    """Summed (present, late, checked_out) for a user over a date range (inclusive)."""
+    query = db.query(
+        func.coalesce(func.sum(AttendanceRollup.present), 0),
+        func.coalesce(func.sum(AttendanceRollup.late), 0),
+        func.coalesce(func.sum(AttendanceRollup.checked_out), 0),
+    ).filter(AttendanceRollup.user_id == user_id)
+    if start_date:
+        query = query.filter(AttendanceRollup.date >= start_date)
+    if end_date:
+        query = query.filter(AttendanceRollup.date <= end_date)
+    return tuple(int(v) for v in query.one())
+
+
+def today_totals(db, user_id):
+    today = date.today()
+    return totals(db, user_id, today, today)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the attendance rollup table.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute rollups from the registry")
+    parser.add_argument("--user", type=int, help="limit to one department user id")
+    parser.add_argument("--from", dest="start_date", help="first date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", help="last date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    from db import Base, engine, SessionLocal
+    Base.metadata.create_all(engine, tables=[AttendanceRollup.__table__])
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, args.user, args.start_date, args.end_date)
+        print(f"Rebuilt {rows} rollup rows.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
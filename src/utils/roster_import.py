@@ -0,0 +1,276 @@
+"""
+Bulk roster import from CSV or XLSX.
+
+The file is streamed in batches (pandas chunks for CSV, openpyxl read-only rows
+for XLSX). Each batch is validated with vectorised pandas checks, then the
+valid rows are upserted in one statement keyed on (user_id, roll_no):
+ON DUPLICATE KEY UPDATE on MySQL, ON CONFLICT DO UPDATE on SQLite/PostgreSQL.
+Invalid rows are skipped and reported with their line number in the file.
+
+    python -m utils.roster_import students.xlsx --user 3 [--errors errors.csv] [--dry-run]
+
+Columns (header names are case-insensitive): roll_no and name are required,
+admission_no and dob are optional.
+"""
+import argparse
+import csv
+import os
+from collections import namedtuple
+import pandas as pd
+from sqlalchemy import inspect, select
+from sqlalchemy.exc import IntegrityError
+from models import Student
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = 2000
+COLUMNS = ["roll_no", "name", "admission_no", "dob"]
+REQUIRED = ["roll_no", "name"]
+MAX_LENGTH = {"roll_no": 50, "name": 100, "admission_no": 50}
+HEADER_ALIASES = {
+    "roll no": "roll_no", "roll number": "roll_no", "rollno": "roll_no",
+    "student name": "name", "admission no": "admission_no", "admission number": "admission_no",
+    "date of birth": "dob",
+}
+ROSTER_KEY = "uq_students_user_roll"
+
+RowError = namedtuple("RowError", "row roll_no message")
+
+
+class ImportReport:
+    def __init__(self):
+        self.total = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def imported(self):
+        return self.inserted + self.updated
+
+    def summary(self):
+        return (f"{self.total} rows read: {self.inserted} added, {self.updated} updated, "
+                f"{len(self.errors)} rejected")
+
+    def write_errors(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "roll_no", "error"])
+            writer.writerows(self.errors)
+
+
+def ensure_roster_key(engine):
+    """Create the (user_id, roll_no) unique index on databases created before it existed."""
+    existing = {ix["name"] for ix in inspect(engine).get_indexes(Student.__tablename__)}
+    if ROSTER_KEY in existing:
+        return
+    index = next(ix for ix in Student.__table__.indexes if ix.name == ROSTER_KEY)
+    try:
+        index.create(bind=engine)
+        logger.info(f"Created unique index {ROSTER_KEY} on students(user_id, roll_no)")
+    except IntegrityError as e:
+        raise ValueError(
+            "Existing students have duplicate roll numbers; fix them before importing "
+            f"({e.__class__.__name__}: {e})"
+        ) from e
+
+
+# --- reading -----------------------------------------------------------------
+
+def _normalize_header(name):
+    key = str(name or "").strip().lower().replace("_", " ")
+    key = HEADER_ALIASES.get(key, key)
+    return key.replace(" ", "_")
+
+
+def _iter_xlsx(path, batch_size):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [_normalize_header(h) for h in next(rows, [])]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=header, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, dtype=object)
+    finally:
+        wb.close()
+
+
+def _iter_csv(path, batch_size):
+    for chunk in pd.read_csv(path, dtype=str, chunksize=batch_size, keep_default_na=False,
+                             skipinitialspace=True, encoding="utf-8-sig"):
+        chunk.columns = [_normalize_header(c) for c in chunk.columns]
+        yield chunk
+
+
+def read_batches(path, batch_size=BATCH_SIZE):
+    """Yield DataFrames of at most batch_size rows with normalised column names."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return _iter_xlsx(path, batch_size)
+    if ext in (".csv", ".txt"):
+        return _iter_csv(path, batch_size)
+    raise ValueError(f"Unsupported roster file type: {ext or path}")
+
+
+# --- validation --------------------------------------------------------------
+
+def validate(df, first_row, seen):
+    """
+    Split one batch into (valid DataFrame, [RowError]).
+    first_row is the file line number of df's first row; seen maps roll_no ->
+    line number for every valid row of earlier batches (updated in place).
+    """
+    df = df.reindex(columns=COLUMNS).copy()
+    df["row"] = range(first_row, first_row + len(df))
+    for col in ("roll_no", "name", "admission_no"):
+        df[col] = df[col].astype("string").str.strip().replace("", pd.NA)
+
+    problems = pd.Series("", index=df.index, dtype="object")
+
+    def flag(mask, message):
+        problems[mask] = problems[mask] + message + "; "
+
+    for col in REQUIRED:
+        flag(df[col].isna(), f"missing {col}")
+    for col, limit in MAX_LENGTH.items():
+        flag(df[col].str.len().fillna(0) > limit, f"{col} longer than {limit} characters")
+
+    dob_given = df["dob"].notna() & (df["dob"].astype("string").str.strip() != "")
+    df["dob"] = pd.to_datetime(df["dob"].where(dob_given), errors="coerce").dt.date
+    flag(dob_given & df["dob"].isna(), "invalid dob")
+
+    has_roll = df["roll_no"].notna()
+    flag(has_roll & df.duplicated("roll_no", keep="first"), "duplicate roll_no in file")
+    earlier = has_roll & df["roll_no"].isin(list(seen))
+    flag(earlier, "duplicate roll_no in file")
+
+    bad = problems != ""
+    errors = [
+        RowError(int(r.row), None if pd.isna(r.roll_no) else r.roll_no, msg.rstrip("; "))
+        for r, msg in zip(df[bad].itertuples(), problems[bad])
+    ]
+    valid = df[~bad]
+    seen.update(zip(valid["roll_no"], valid["row"]))
+    return valid, errors
+
+
+# --- writing -----------------------------------------------------------------
+
+def _upsert_statement(dialect, rows):
+    update_cols = ("name", "admission_no", "dob")
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(Student).values(rows)
+        return stmt.on_duplicate_key_update({c: getattr(stmt.inserted, c) for c in update_cols})
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(Student).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "roll_no"],
+            set_={c: getattr(stmt.excluded, c) for c in update_cols},
+        )
+    raise ValueError(f"Roster upsert is not supported on {dialect}")
+
+
+def existing_rolls(db, user_id, valid):
+    """Roll numbers of `valid` that the department already has."""
+    rolls = valid["roll_no"].tolist()
+    return set(db.execute(
+        select(Student.roll_no).where(Student.user_id == user_id, Student.roll_no.in_(rolls))
+    ).scalars())
+
+
+def upsert_batch(db, user_id, valid):
+    """Upsert one validated batch. Returns (inserted, updated)."""
+    if valid.empty:
+        return 0, 0
+    existing = existing_rolls(db, user_id, valid)
+    rows = [
+        {
+            "user_id": user_id,
+            "roll_no": r.roll_no,
+            "name": r.name,
+            "admission_no": None if pd.isna(r.admission_no) else r.admission_no,
+            "dob": None if pd.isna(r.dob) else r.dob,
+        }
+        for r in valid.itertuples()
+    ]
+    db.execute(_upsert_statement(db.get_bind().dialect.name, rows))
+    return len(rows) - len(existing), len(existing)
+
+
+def import_roster(db, user_id, path, batch_size=BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Stream `path` into the students of `user_id`. Each batch is committed on its
+    own, so a failure part-way keeps earlier batches. Returns an ImportReport.
+    progress(report) is called after every batch.
+    """
+    report = ImportReport()
+    if not dry_run:
+        ensure_roster_key(db.get_bind())
+    seen = {}
+    first_row = 2       # line 1 is the header
+    for batch in read_batches(path, batch_size):
+        missing = [c for c in REQUIRED if c not in batch.columns]
+        if missing:
+            raise ValueError(f"Roster file has no {', '.join(missing)} column")
+        valid, errors = validate(batch, first_row, seen)
+        report.total += len(batch)
+        report.errors.extend(errors)
+        first_row += len(batch)
+        if dry_run:
+            updated = len(existing_rolls(db, user_id, valid)) if not valid.empty else 0
+            report.inserted += len(valid) - updated
+            report.updated += updated
+        else:
+            try:
+                inserted, updated = upsert_batch(db, user_id, valid)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            report.inserted += inserted
+            report.updated += updated
+        if progress:
+            progress(report)
+    logger.info(f"Roster import for user {user_id} from {os.path.basename(path)}: {report.summary()}")
+    return report
+
+
+def main(argv=None):
+    from db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import students from a CSV/XLSX roster.")
+    parser.add_argument("path")
+    parser.add_argument("--user", type=int, required=True, help="department (user) id")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--errors", help="write rejected rows to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        report = import_roster(db, args.user, args.path, args.batch_size, args.dry_run)
+    finally:
+        db.close()
+    print(report.summary())
+    for err in report.errors[:20]:
+        print(f"  row {err.row} ({err.roll_no or '-'}): {err.message}")
+    if len(report.errors) > 20:
+        print(f"  ... {len(report.errors) - 20} more")
+    if args.errors and report.errors:
+        report.write_errors(args.errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+SQLAlchemy event-based query telemetry.
+
+Every statement is timed by one pair of listeners per engine, which also feeds
+metrics.DB_QUERY_SECONDS. Statements slower than HAAJAR_SLOW_QUERY_MS (default
+200) go to the slow-query log (HAAJAR_SLOW_QUERY_LOG, default
+~/.haajar/logs/slow_queries.log) with their parameter count only -- the values
+are student names and roll numbers.
+
+Wrap a UI action or scan in `action(name)` (or decorate with `tracked(name)`) to get
+its statement count and total time logged, with a warning when the same statement
+runs HAAJAR_N_PLUS_ONE (default 5) or more times -- the usual N+1 lazy-load pattern.
+
+Tests can assert budgets:
+
+    with query_budget(2):
+        read_model.registry_rows(db, user_id)
+"""
+import functools
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from utils import metrics
+from utils.logger import get_logger, get_file_logger
+
+logger = get_logger(__name__)
+
+SLOW_QUERY_SECONDS = float(os.getenv("HAAJAR_SLOW_QUERY_MS", 200)) / 1000
+SLOW_QUERY_LOG = os.getenv("HAAJAR_SLOW_QUERY_LOG") or os.path.join(
+    os.path.expanduser("~"), ".haajar", "logs", "slow_queries.log")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("HAAJAR_N_PLUS_ONE", 5))
+
+_current = ContextVar("sql_telemetry_recorders", default=())
+_slow_logger = None
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class ActionStats:
+    """Statements recorded while an action (or budget) is open."""
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()    # SQL text -> executions
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """(statement, count) pairs executed at least `threshold` times."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+def _slow_log():
+    global _slow_logger
+    if _slow_logger is None:
+        directory = os.path.dirname(SLOW_QUERY_LOG)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _slow_logger = get_file_logger("sql.slow", SLOW_QUERY_LOG)
+    return _slow_logger
+
+
+def _describe_params(parameters, executemany):
+    """Shape of the bound parameters, never their values."""
+    if executemany:
+        rows = len(parameters)
+        return f"{rows} rows x {len(parameters[0]) if rows else 0} params"
+    return f"{len(parameters or ())} params"
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    # kept on the statement's context: after_cursor_execute does not fire for a
+    # failed statement, so anything stored on the pooled connection would leak
+    context._telemetry_start = time.perf_counter()
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_telemetry_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    kind = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+    metrics.DB_QUERY_SECONDS.labels(kind=kind).observe(elapsed)
+    for stats in _current.get():
+        stats.record(statement, elapsed)
+    if elapsed >= SLOW_QUERY_SECONDS:
+        actions = "/".join(s.name for s in _current.get()) or "-"
+        _slow_log().info(
+            f"{elapsed * 1000:.1f} ms [{actions}] {' '.join(statement.split())} -- "
+            f"{_describe_params(parameters, executemany)}"
+        )
+
+
+def install(engine):
+    """Attach the timing listeners (telemetry and DB_QUERY_SECONDS) to an engine. Idempotent."""
+    if event.contains(engine, "before_cursor_execute", _before):
+        return
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+
+
+@contextmanager
+def capture(name="capture"):
+    """Record statements executed in this thread/context; yields ActionStats."""
+    stats = ActionStats(name)
+    token = _current.set(_current.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def action(name):
+    """Log statement count / time for one UI action or scan and flag N+1 patterns."""
+    with capture(name) as stats:
+        yield stats
+    if stats.count:
+        logger.debug(f"{name}: {stats.count} statements in {stats.duration * 1000:.1f} ms")
+    for sql, n in stats.repeated():
+        logger.warning(f"{name}: possible N+1, statement ran {n}x: {' '.join(sql.split())[:200]}")
+
+
+def tracked(name):
+    """Decorator form of action()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with action(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def query_budget(max_statements, name="budget"):
+    """Test helper: raise QueryBudgetExceeded if the block runs too many statements."""
+    with capture(name) as stats:
+        yield stats
+    if stats.count > max_statements:
+        detail = "\n".join(f"  {n}x {' '.join(sql.split())[:200]}" for sql, n in stats.statements.most_common())
+        raise QueryBudgetExceeded(
+            f"{name}: {stats.count} statements executed, budget was {max_statements}\n{detail}"
+        )
@@ -0,0 +1,270 @@
+"""
+Full check-in / check-out timestamps on the registry.
+
+Registry.check_in_time / check_out_time are time-of-day only, so every
+time-window query has to join sessions for the date. checked_in_at and
+checked_out_at hold the full datetime and are indexed, so "scans between T1 and
+T2" is a range scan on the registry alone. The time-of-day columns are still
+written for existing readers.
+
+migrate() adds the columns (and updated_at on registry and sessions, the list
+views' change watermark) and indexes to databases created before they existed
+and backfills the timestamps from sessions.date + the time columns in id-range batches:
+
+    python -m utils.timestamps --migrate [--batch-size 50000]
+
+The app adds the columns at start-up and runs the backfill in a background
+thread (backfill_in_background), so a large registry does not delay the login.
+
+Query helpers compute durations and lateness in SQL (per dialect) instead of in
+Python over fetched rows. A check-in is late when it went through the late
+check-in flow, i.e. it carries a late_check_in_reason; is_late() is that one
+definition, shared by the analytics reports and the rollup.
+"""
+import argparse
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from threading import Thread
+from sqlalchemy import and_, case, func, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+from models import Registry, Session
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_SIZE = 50000
+COLUMNS = (("checked_in_at", "check_in_time"), ("checked_out_at", "check_out_time"))
+ADDED_COLUMNS = ((Registry, tuple(name for name, _ in COLUMNS) + ("updated_at",)), (Session, ("updated_at",)))
+
+ScanSpan = namedtuple("ScanSpan", "registry_id session_id student_id checked_in_at checked_out_at duration_seconds")
+SessionLateness = namedtuple(
+    "SessionLateness", "session_id present late avg_lateness_seconds max_lateness_seconds avg_duration_seconds",
+)
+
+
+# --- SQL expressions ---------------------------------------------------------
+
+def combine(dialect, date_col, time_col):
+    """SQL datetime from a date column and a time-of-day column."""
+    if dialect == "sqlite":
+        # same text layout SQLAlchemy uses for DateTime on SQLite
+        return date_col.concat(" ").concat(time_col)
+    if dialect == "mysql":
+        return func.timestamp(date_col, time_col)
+    if dialect == "postgresql":
+        return date_col.op("+")(time_col)
+    raise ValueError(f"Timestamp expressions are not supported on {dialect}")
+
+
+def seconds_between(dialect, start, end):
+    """SQL expression: seconds from `start` to `end` (both datetimes)."""
+    if dialect == "sqlite":
+        return func.round((func.julianday(end) - func.julianday(start)) * 86400)
+    if dialect == "mysql":
+        return func.timestampdiff(text("SECOND"), start, end)
+    if dialect == "postgresql":
+        return func.extract("epoch", end - start)
+    raise ValueError(f"Timestamp expressions are not supported on {dialect}")
+
+
+def session_start(dialect):
+    return combine(dialect, Session.date, Session.start_time)
+
+
+def session_end(dialect):
+    return combine(dialect, Session.date, Session.end_time)
+
+
+def is_late():
+    """SQL condition: the registry row is a late check-in."""
+    return Registry.late_check_in_reason.isnot(None)
+
+
+def late_flag():
+    """SQL expression: 1 for a late check-in, else 0 (for SUM)."""
+    return case((is_late(), 1), else_=0)
+
+
+# --- migration ---------------------------------------------------------------
+
+def ensure_columns(engine):
+    """Add checked_in_at / checked_out_at / updated_at and their indexes where missing. Returns the columns added."""
+    insp = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for model, names in ADDED_COLUMNS:
+            table = model.__tablename__
+            existing = {c["name"] for c in insp.get_columns(table)}
+            for name in names:
+                if name in existing:
+                    continue
+                col_type = model.__table__.c[name].type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}"))
+                added.append(f"{table}.{name}")
+    insp = inspect(engine)
+    missing = [index for model, _ in ADDED_COLUMNS for index in model.__table__.indexes
+               if index.name not in {ix["name"] for ix in insp.get_indexes(model.__tablename__)}]
+    for index in missing:
+        try:
+            index.create(bind=engine)
+            logger.info(f"Created index {index.name}")
+        except IntegrityError as e:
+            # only the unique (session_id, student_id) key can fail this way
+            duplicates = _duplicate_scans(engine)
+            logger.error(f"Cannot create {index.name}: {duplicates} (session, student) pairs have more "
+                         f"than one registry row; remove the extra rows and run the migration again ({e.orig})")
+    if added:
+        logger.info(f"Added columns: {', '.join(added)}")
+    return added
+
+
+def _duplicate_scans(engine):
+    pairs = select(Registry.session_id, Registry.student_id)\
+        .group_by(Registry.session_id, Registry.student_id)\
+        .having(func.count() > 1).subquery()
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(pairs)).scalar()
+
+
+def backfill(db, batch_size=BATCH_SIZE):
+    """
+    Fill NULL checked_in_at / checked_out_at from the session date and the
+    time-of-day columns, one id range per transaction. Returns rows updated.
+    """
+    dialect = db.get_bind().dialect.name
+    total = 0
+    for name, time_name in COLUMNS:
+        target, source = Registry.__table__.c[name], Registry.__table__.c[time_name]
+        pending = and_(target.is_(None), source.isnot(None))
+        lo, hi = db.execute(select(func.min(Registry.id), func.max(Registry.id)).where(pending)).one()
+        if lo is None:
+            continue
+        value = select(combine(dialect, Session.date, source))\
+            .where(Session.id == Registry.session_id).scalar_subquery()
+        for start in range(lo, hi + 1, batch_size):
+            try:
+                result = db.execute(
+                    update(Registry)
+                    .where(Registry.id.between(start, start + batch_size - 1), pending)
+                    .values({name: value})
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            total += max(result.rowcount or 0, 0)
+        logger.info(f"Backfilled registry.{name} for ids {lo}..{hi}")
+    return total
+
+
+def _backfill(engine, batch_size):
+    from db import SessionLocal
+    db = SessionLocal(bind=engine)
+    try:
+        return backfill(db, batch_size)
+    finally:
+        db.close()
+
+
+def migrate(engine, batch_size=BATCH_SIZE):
+    """ensure_columns() then backfill(). Safe to run repeatedly."""
+    ensure_columns(engine)
+    return _backfill(engine, batch_size)
+
+
+def backfill_in_background(engine, batch_size=BATCH_SIZE):
+    """Run backfill() in a daemon thread; call ensure_columns() first. Returns the thread."""
+    def run():
+        try:
+            rows = _backfill(engine, batch_size)
+        except Exception as e:
+            logger.error(f"Timestamp backfill failed: {e}")
+            return
+        if rows:
+            logger.info(f"Timestamp backfill done: {rows} rows")
+
+    thread = Thread(target=run, name="timestamp-backfill", daemon=True)
+    thread.start()
+    return thread
+
+
+# --- queries -----------------------------------------------------------------
+
+def checkin_range(filters):
+    """
+    checked_in_at bounds [start, end) for the start_date / end_date of a
+    session filter dict (scans happen on the session's day). None: unbounded.
+    """
+    filters = filters or {}
+    start = end = None
+    if filters.get("start_date"):
+        start = datetime.combine(date.fromisoformat(str(filters["start_date"])), datetime.min.time())
+    if filters.get("end_date"):
+        end = datetime.combine(date.fromisoformat(str(filters["end_date"])), datetime.min.time()) + timedelta(days=1)
+    return start, end
+
+
+def _checked_in_within(stmt, start, end):
+    if start is not None:
+        stmt = stmt.where(Registry.checked_in_at >= start)
+    if end is not None:
+        stmt = stmt.where(Registry.checked_in_at < end)
+    return stmt
+
+
+def scans_between(db, start=None, end=None, user_id=None, session_id=None):
+    """
+    Registry rows checked in within [start, end) (None: unbounded), with the
+    stay in seconds (None if still in).
+    """
+    dialect = db.get_bind().dialect.name
+    stmt = _checked_in_within(select(
+        Registry.id, Registry.session_id, Registry.student_id, Registry.checked_in_at, Registry.checked_out_at,
+        seconds_between(dialect, Registry.checked_in_at, Registry.checked_out_at),
+    ), start, end)
+    if user_id is not None:
+        stmt = stmt.join(Session, Registry.session_id == Session.id).where(Session.user_id == user_id)
+    if session_id is not None:
+        stmt = stmt.where(Registry.session_id == session_id)
+    return [ScanSpan._make(row) for row in db.execute(stmt.order_by(Registry.checked_in_at))]
+
+
+def lateness_by_session(db, start=None, end=None, user_id=None):
+    """
+    Per-session lateness and stay statistics for check-ins within [start, end)
+    (None: unbounded), aggregated in SQL. `late` counts is_late() rows; the
+    lateness columns measure every check-in against the session start.
+    """
+    dialect = db.get_bind().dialect.name
+    lateness = seconds_between(dialect, session_start(dialect), Registry.checked_in_at)
+    stmt = _checked_in_within(select(
+        Registry.session_id,
+        func.count(Registry.id),
+        func.sum(late_flag()),
+        func.avg(case((lateness > 0, lateness), else_=0)),
+        func.max(lateness),
+        func.avg(seconds_between(dialect, Registry.checked_in_at, Registry.checked_out_at)),
+    ).join(Session, Registry.session_id == Session.id), start, end)
+    if user_id is not None:
+        stmt = stmt.where(Session.user_id == user_id)
+    stmt = stmt.group_by(Registry.session_id).order_by(Registry.session_id)
+    return [SessionLateness._make(row) for row in db.execute(stmt)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain registry check-in/out timestamps.")
+    parser.add_argument("--migrate", action="store_true", help="add the columns if needed and backfill them")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if not args.migrate:
+        parser.print_help()
+        return
+    from db import engine
+    rows = migrate(engine, args.batch_size)
+    print(f"Backfilled {rows} timestamps.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Term timetables: create every session of a term from a weekly pattern.
+
+A timetable is a list of weekly slots (weekday, start, end, subject, faculty).
+expand() turns it into one session per slot per matching date between the
+first and last day of term, skipping holidays. Candidates are checked against
+the department's existing sessions in that range with one query, and against
+each other, then all accepted sessions are written with a single bulk INSERT.
+
+Two sessions conflict when they are on the same date, their times overlap and
+they share the faculty or the subject.
+
+    python -m utils.timetable timetable.csv --user 3 --from 2026-01-05 --to 2026-04-30
+                              [--holidays 2026-01-26,2026-03-02..2026-03-06] [--dry-run]
+
+The CSV has columns weekday (Mon..Sun), start and end (HH:MM), subject (title or
+course code), faculty (name or faculty number) and optional remarks.
+"""
+import argparse
+import csv
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import insert, or_, select
+from models import Session
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+Slot = namedtuple("Slot", "weekday start_time end_time subject_id faculty_id remarks", defaults=(None,))
+# weekday: 0 = Monday ... 6 = Sunday, as date.weekday()
+
+Conflict = namedtuple("Conflict", "date start_time end_time subject_id faculty_id with_session_id")
+# with_session_id: the existing session clashed with, None for a clash inside the timetable itself
+
+
+class TermPlan:
+    def __init__(self):
+        self.sessions = []      # dicts ready for INSERT
+        self.conflicts = []
+        self.holidays_skipped = 0
+        self.created = 0
+
+    def summary(self):
+        return (f"{len(self.sessions)} sessions planned, {self.created} created, "
+                f"{len(self.conflicts)} conflicts skipped, {self.holidays_skipped} on holidays skipped")
+
+
+def parse_weekday(text):
+    key = str(text).strip()[:3].title()
+    if key not in WEEKDAYS:
+        raise ValueError(f"Unknown weekday: {text!r}")
+    return WEEKDAYS.index(key)
+
+
+def parse_time(text):
+    return datetime.strptime(str(text).strip(), "%H:%M").time()
+
+
+def parse_holidays(text):
+    """'2026-01-26, 2026-03-02..2026-03-06' -> set of dates (ranges inclusive)."""
+    days = set()
+    for part in str(text or "").replace("\n", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("..")
+        start = datetime.strptime(first.strip(), "%Y-%m-%d").date()
+        end = datetime.strptime(last.strip(), "%Y-%m-%d").date() if last else start
+        if end < start:
+            raise ValueError(f"Holiday range ends before it starts: {part}")
+        days.update(start + timedelta(days=i) for i in range((end - start).days + 1))
+    return days
+
+
+def expand(user_id, slots, start_date, end_date, holidays=()):
+    """One session dict per slot per matching date. Returns (sessions, holidays skipped)."""
+    if end_date < start_date:
+        raise ValueError("The term ends before it starts")
+    by_weekday = {}
+    for slot in slots:
+        if slot.end_time <= slot.start_time:
+            raise ValueError(f"{WEEKDAYS[slot.weekday]} {slot.start_time:%H:%M}: end time must be after start time")
+        by_weekday.setdefault(slot.weekday, []).append(slot)
+
+    sessions, skipped = [], 0
+    day = start_date
+    while day <= end_date:
+        for slot in by_weekday.get(day.weekday(), ()):
+            if day in holidays:
+                skipped += 1
+                continue
+            sessions.append({
+                "user_id": user_id,
+                "subject_id": slot.subject_id,
+                "faculty_id": slot.faculty_id,
+                "date": day,
+                "start_time": slot.start_time,
+                "end_time": slot.end_time,
+                "is_active": True,
+                "remarks": slot.remarks,
+            })
+        day += timedelta(days=1)
+    return sessions, skipped
+
+
+def _clashes(a, b):
+    return (a["start_time"] < b["end_time"] and b["start_time"] < a["end_time"]
+            and (a["faculty_id"] == b["faculty_id"] or a["subject_id"] == b["subject_id"]))
+
+
+def find_conflicts(db, user_id, sessions):
+    """
+    Split candidate sessions into (accepted, [Conflict]). Existing sessions are
+    fetched with one range query; candidates are also checked against each other
+    (the earlier slot wins).
+    """
+    if not sessions:
+        return [], []
+    existing = db.execute(
+        select(Session.id, Session.date, Session.start_time, Session.end_time, Session.subject_id, Session.faculty_id)
+        .where(
+            Session.user_id == user_id,
+            Session.date.between(min(s["date"] for s in sessions), max(s["date"] for s in sessions)),
+            Session.start_time.isnot(None), Session.end_time.isnot(None),
+            or_(Session.faculty_id.in_({s["faculty_id"] for s in sessions}),
+                Session.subject_id.in_({s["subject_id"] for s in sessions})),
+        )
+    ).all()
+
+    taken = {}      # date -> [(session dict, existing id or None)]
+    for row in existing:
+        taken.setdefault(row.date, []).append((row._asdict(), row.id))
+
+    accepted, conflicts = [], []
+    for s in sessions:
+        same_day = taken.setdefault(s["date"], [])
+        clash = next((other_id for other, other_id in same_day if _clashes(s, other)), False)
+        if clash is not False:
+            conflicts.append(Conflict(s["date"], s["start_time"], s["end_time"], s["subject_id"], s["faculty_id"], clash))
+            continue
+        same_day.append((s, None))
+        accepted.append(s)
+    return accepted, conflicts
+
+
+def create_term(db, user_id, slots, start_date, end_date, holidays=(), dry_run=False):
+    """
+    Plan the term and bulk-insert every non-conflicting session in one
+    transaction. Returns a TermPlan; nothing is written when dry_run is set.
+    """
+    plan = TermPlan()
+    candidates, plan.holidays_skipped = expand(user_id, slots, start_date, end_date, holidays)
+    plan.sessions, plan.conflicts = find_conflicts(db, user_id, candidates)
+    if plan.sessions and not dry_run:
+        try:
+            db.execute(insert(Session), plan.sessions)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        plan.created = len(plan.sessions)
+    logger.info(f"Timetable for user {user_id} ({start_date}..{end_date}): {plan.summary()}")
+    return plan
+
+
+def read_slots(path, user_id):
+    """
+    Read a timetable CSV, resolving subject and faculty names through the
+    reference cache (reloaded once if a name is unknown to it).
+    """
+    from utils.ref_cache import ref_cache
+
+    def load():
+        subjects = ref_cache.subjects(user_id).values()
+        faculties = ref_cache.faculties(user_id).values()
+        return ({key: s.id for s in subjects for key in (s.title, s.course_code) if key},
+                {key: f.id for f in faculties for key in (f.name, f.faculty_no) if key})
+
+    subject_ids, faculty_ids = load()
+    reloaded = False
+    slots = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            row = {str(k).strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            if not reloaded and (row.get("subject") not in subject_ids or row.get("faculty") not in faculty_ids):
+                # added since the cache was loaded
+                ref_cache.invalidate(user_id)
+                subject_ids, faculty_ids = load()
+                reloaded = True
+            try:
+                subject_id = subject_ids[row["subject"]]
+            except KeyError:
+                raise ValueError(f"Line {line}: unknown subject {row.get('subject')!r}") from None
+            try:
+                faculty_id = faculty_ids[row["faculty"]]
+            except KeyError:
+                raise ValueError(f"Line {line}: unknown faculty {row.get('faculty')!r}") from None
+            slots.append(Slot(parse_weekday(row["weekday"]), parse_time(row["start"]), parse_time(row["end"]),
+                              subject_id, faculty_id, row.get("remarks") or None))
+    return slots
+
+
+def main(argv=None):
+    from db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Create a term's sessions from a weekly timetable.")
+    parser.add_argument("path", help="timetable CSV")
+    parser.add_argument("--user", type=int, required=True, help="department (user) id")
+    parser.add_argument("--from", dest="start_date", required=True, help="first day of term (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", required=True, help="last day of term (YYYY-MM-DD)")
+    parser.add_argument("--holidays", default="", help="dates and ranges, e.g. 2026-01-26,2026-03-02..2026-03-06")
+    parser.add_argument("--dry-run", action="store_true", help="plan and report conflicts only")
+    args = parser.parse_args(argv)
+
+    slots = read_slots(args.path, args.user)
+    db = SessionLocal()
+    try:
+        plan = create_term(
+            db, args.user, slots,
+            datetime.strptime(args.start_date, "%Y-%m-%d").date(),
+            datetime.strptime(args.end_date, "%Y-%m-%d").date(),
+            parse_holidays(args.holidays), args.dry_run,
+        )
+    finally:
+        db.close()
+    print(plan.summary())
+    for c in plan.conflicts[:20]:
+        target = f"session {c.with_session_id}" if c.with_session_id else "another timetable slot"
+        print(f"  {c.date} {c.start_time:%H:%M}-{c.end_time:%H:%M}: clashes with {target}")
+    if len(plan.conflicts) > 20:
+        print(f"  ... {len(plan.conflicts) - 20} more")
+
+
+if __name__ == "__main__":
+    main()
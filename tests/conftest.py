@@ -0,0 +1,61 @@
+import os
+import sys
+
+# The app imports its modules flat from src/ (run from that directory).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# Never touch a configured MySQL database or write logs into the tree.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("HAAJAR_LOG_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".test.log"))
+
+
+import pytest
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """A fresh SQLite file with the full schema."""
+    import models
+    engine = create_engine(f"sqlite:///{tmp_path / 'haajar.db'}")
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(db_engine):
+    session = sessionmaker(bind=db_engine, expire_on_commit=False)()
+    yield session
+    session.close()
+
+
+def add_session(db, lab, day, start=time(9, 0), end=time(10, 0), is_active=True):
+    import models
+    row = models.Session(user_id=lab.user.id, subject_id=lab.subject.id, faculty_id=lab.faculty.id,
+                         date=day, start_time=start, end_time=end, is_active=is_active)
+    db.add(row)
+    db.commit()
+    return row
+
+
+@pytest.fixture
+def lab(db):
+    """One department with a subject, a faculty member, three students and a session starting now."""
+    import models
+    user = models.User(department_email="lab@example.edu", department_name="MCA")
+    db.add(user)
+    db.flush()
+    subject = models.Subject(title="Networks", user_id=user.id)
+    faculty = models.Faculty(name="Dr. Rao", user_id=user.id)
+    students = [models.Student(name=f"Student {i}", roll_no=f"R{i:03d}", user_id=user.id) for i in range(1, 4)]
+    db.add_all([subject, faculty, *students])
+    db.commit()
+    lab = SimpleNamespace(user=user, subject=subject, faculty=faculty, students=students)
+    now = datetime.now()
+    lab.session = add_session(db, lab, now.date(), (now - timedelta(minutes=1)).time().replace(microsecond=0),
+                              (now + timedelta(hours=1)).time().replace(microsecond=0))
+    return lab
@@ -0,0 +1,70 @@
+import functools
+from datetime import date
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+from models import Registry
+from scanner import attendance
+from utils import analytics, archive
+from conftest import add_session
+
+TERM = {"start_date": "2026-01-01", "end_date": "2026-03-31"}
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    """Point the analytics reports' archive lookups at a temporary archive."""
+    directory = str(tmp_path / "archive")
+    monkeypatch.setattr(archive, "reaches_archive", functools.partial(archive.reaches_archive, archive_dir=directory))
+    monkeypatch.setattr(archive, "read_registry", functools.partial(archive.read_registry, archive_dir=directory))
+    return directory
+
+
+@pytest.fixture
+def term(db, lab):
+    """Closed sessions in January, February and March, with one late check-in in February."""
+    sessions = [add_session(db, lab, day, is_active=False)
+                for day in (date(2026, 1, 15), date(2026, 2, 10), date(2026, 3, 5))]
+    for session_row, rolls in zip(sessions, (("R001", "R002"), ("R001", "R003"), ("R002",))):
+        for roll in rolls:
+            attendance.record_scan(db, session_row, roll, True)
+    attendance.record_scan(db, sessions[1], "R002", False, late_reason="Bus")
+    attendance.record_scan(db, lab.session, "R001", True)
+    return sessions
+
+
+def _reports(db, lab, filters):
+    summary = analytics.session_summary(db, lab.user.id, filters, use_cache=False)
+    return (analytics.student_attendance(db, lab.user.id, filters, use_cache=False),
+            [row[:8] for row in summary])      # lateness / stay averages are not archived
+
+
+def test_read_registry_opens_only_the_months_in_range(db, lab, term, archive_dir, monkeypatch):
+    assert archive.archive_registry(db, date(2026, 4, 1), lab.user.id, archive_dir) == {lab.user.id: 6}
+    assert archive.boundary(lab.user.id, archive_dir) == date(2026, 4, 1)
+    assert db.execute(select(func.count(Registry.id))).scalar() == 1
+
+    opened = []
+    read_parquet = pd.read_parquet
+
+    def spy(path, *args, **kwargs):
+        opened.append(path)
+        return read_parquet(path, *args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_parquet", spy)
+    february = archive.read_registry(lab.user.id, {"start_date": "2026-02-01", "end_date": "2026-02-28"})
+    assert sorted(february["roll_no"]) == ["R001", "R002", "R003"]
+    assert list(february["late_reason"].dropna()) == ["Bus"]
+    assert opened and all("month=2026-02" in path for path in opened)
+
+    opened.clear()
+    assert len(archive.read_registry(lab.user.id, {"start_date": "2026-03-01"})) == 1
+    assert opened and all("month=2026-03" in path for path in opened)
+
+
+def test_reports_match_before_and_after_archiving(db, lab, term, archive_dir):
+    before = {key: _reports(db, lab, filters) for key, filters in (("all", None), ("term", TERM))}
+    archive.archive_registry(db, date(2026, 4, 1), lab.user.id, archive_dir)
+    after = {key: _reports(db, lab, filters) for key, filters in (("all", None), ("term", TERM))}
+    assert after == before
+    assert sum(row[5] for row in after["term"][1]) == 6
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from models import AttendanceRollup, Registry
+from scanner import attendance
+from utils import rollup
+
+
+def test_check_in_then_check_out(db, lab):
+    first = attendance.record_scan(db, lab.session, "R001", True)
+    again = attendance.record_scan(db, lab.session, "R001", True)
+    out = attendance.record_scan(db, lab.session, "R001", False)
+    assert (first.outcome, first.written) == (attendance.CHECKED_IN, "in")
+    assert again.outcome == attendance.ALREADY_IN
+    assert (out.outcome, out.written) == (attendance.CHECKED_OUT, "out")
+    assert rollup.totals(db, lab.user.id) == (1, 0, 1)
+
+
+def test_concurrent_duplicate_check_in_is_already_in(db, db_engine, lab, monkeypatch):
+    """Another kiosk commits the same check-in between our lookup and our insert."""
+    other = type(db)(bind=db_engine)
+    lookup = attendance._registry_row
+
+    def race(session, session_id, student_id):
+        row = lookup(session, session_id, student_id)
+        other.add(Registry(session_id=session_id, student_id=student_id, checked_in_at=datetime.now()))
+        other.commit()
+        return row
+
+    monkeypatch.setattr(attendance, "_registry_row", race)
+    result = attendance.record_scan(db, lab.session, "R001", True)
+    other.close()
+
+    assert result.outcome == attendance.ALREADY_IN
+    assert db.execute(select(func.count(Registry.id))).scalar() == 1
+    assert db.execute(select(func.count()).select_from(AttendanceRollup)).scalar() == 0
+
+
+def test_late_check_in_records_reason_once(db, lab):
+    now = datetime.now() + timedelta(minutes=30)
+    late = attendance.record_scan(db, lab.session, "R002", False, now=now, late_reason="bus delayed")
+    again = attendance.record_scan(db, lab.session, "R002", False, now=now, late_reason="bus delayed")
+    assert (late.outcome, late.written) == (attendance.CHECKED_IN, "in")
+    assert again.outcome == attendance.ALREADY_IN
+    assert db.get(Registry, late.registry_id).late_check_in_reason == "bus delayed"
+    assert rollup.totals(db, lab.user.id) == (1, 1, 0)
@@ -0,0 +1,63 @@
+import importlib.util
+import os
+import time
+import pytest
+from sqlalchemy import exc, text
+import models
+from utils import read_model
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "db.py")
+
+
+@pytest.fixture
+def routed_db(tmp_path, monkeypatch):
+    """A separate copy of db.py configured with a file primary, a replica and a one-connection read pool."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'primary.db'}")
+    monkeypatch.setenv("HAAJAR_DB_READ_URL", f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setenv("HAAJAR_DB_READ_POOL_SIZE", "1")
+    monkeypatch.setenv("HAAJAR_DB_READ_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("HAAJAR_DB_READ_POOL_TIMEOUT", "0.2")
+    spec = importlib.util.spec_from_file_location("db_under_test", DB_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    for name in ("engine", "kiosk_engine", "read_engine"):
+        getattr(module, name).dispose()
+
+
+def test_sessions_use_their_own_engines(routed_db):
+    with routed_db.ReadSessionLocal() as read, routed_db.KioskSessionLocal() as kiosk:
+        assert read.get_bind() is routed_db.read_engine
+        assert kiosk.get_bind() is routed_db.kiosk_engine
+    assert routed_db.read_engine.url.database.endswith("replica.db")
+    assert routed_db.kiosk_engine.url.database.endswith("primary.db")
+
+
+def test_read_schema_is_created_in_the_replica(routed_db):
+    models.Base.metadata.create_all(routed_db.engine)
+    routed_db.create_read_schema(models.Base.metadata)
+    with routed_db.ReadSessionLocal() as read:
+        assert read_model.home_stats(read, 1) == (0, 0, 0, 0)
+
+
+def test_read_sessions_refuse_writes(routed_db):
+    routed_db.create_read_schema(models.Base.metadata)
+    with routed_db.ReadSessionLocal() as read:
+        read.add(models.User(department_email="lab@example.edu", password="x"))
+        with pytest.raises(RuntimeError, match="read-only"):
+            read.flush()
+
+
+def test_exhausted_read_pool_does_not_block_kiosk_writes(routed_db):
+    held = routed_db.read_engine.connect()
+    try:
+        with pytest.raises(exc.TimeoutError):
+            routed_db.read_engine.connect()
+        started = time.monotonic()
+        with routed_db.KioskSessionLocal() as kiosk:
+            kiosk.execute(text("CREATE TABLE scans (id INTEGER PRIMARY KEY)"))
+            kiosk.execute(text("INSERT INTO scans DEFAULT VALUES"))
+            kiosk.commit()
+        assert time.monotonic() - started < 0.2
+    finally:
+        held.close()
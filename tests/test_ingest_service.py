@@ -0,0 +1,64 @@
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+import models
+from scanner import attendance
+from scanner.ingest_service import IngestService
+from utils import rollup
+
+
+@pytest.fixture
+def service(db_engine, tmp_path):
+    service = IngestService(session_factory=sessionmaker(bind=db_engine), flush_interval=0.05,
+                            dead_letter_path=str(tmp_path / "dead_letter.jsonl"))
+    yield service
+    service.close()
+
+
+def test_direct_mode_and_service_resolve_the_same_student(db, lab, service):
+    """A payload names the same student whichever path records the scan."""
+    other = models.User(department_email="other@example.edu", department_name="MBA")
+    db.add(other)
+    db.flush()
+    db.add_all([
+        models.Student(name="Other Dept", roll_no="X001", user_id=other.id),     # roll no only another department has
+        models.Student(name="R002", roll_no="R009", user_id=other.id),           # shadows R002 by name elsewhere
+        models.Student(name="Student 1", roll_no="R004", admission_no="R003", user_id=lab.user.id),
+        models.Student(name="Twin", roll_no="R005", admission_no="A100", user_id=lab.user.id),
+        models.Student(name="Twin", roll_no="R006", admission_no="A101", user_id=lab.user.id),
+    ])
+    db.commit()
+
+    for payload in ["R001", "R002", "R003", "A100", "Twin", "Student 1", "X001", "R009", "nobody", "R001,2024"]:
+        direct = attendance.find_student(db, attendance.normalize_payload(payload), lab.user.id)
+        via_service = service._lookup(lab.user.id, attendance.normalize_payload(payload))
+        assert (direct and direct.id) == (via_service and via_service[0]), payload
+
+    assert attendance.record_scan(db, lab.session, "X001", True).outcome == attendance.UNKNOWN
+    assert service.submit(lab.session.id, "X001", True).outcome == attendance.UNKNOWN
+
+
+def test_batch_with_a_bad_row_commits_the_rest(db, lab, service):
+    """The writer bisects a rejected batch: good rows commit, the bad one is dead-lettered and nacked."""
+    info = service._session_state(lab.session.id).info
+    now = datetime.now()
+    first, second, third = (student.id for student in lab.students)
+    acks = [service._queue("in", info, first, now, True),
+            service._queue("in", info, second, now, True),
+            service._queue("in", info, first, now, True),       # duplicate check-in: unique constraint
+            service._queue("in", info, third, now, True)]
+    for ack in acks:
+        assert ack.wait(5)
+
+    assert [ack.error is None for ack in acks] == [True, True, False, True]
+    assert isinstance(acks[2].error, IntegrityError)
+    rows = db.execute(select(models.Registry.student_id).where(models.Registry.session_id == lab.session.id)).scalars()
+    assert sorted(rows) == sorted([first, second, third])
+    assert rollup.totals(db, lab.user.id) == (3, 0, 0)
+
+    with open(service.dead_letter_path, encoding="utf-8") as f:
+        dead = [json.loads(line) for line in f]
+    assert [(d["kind"], d["session_id"], d["student_id"]) for d in dead] == [("in", lab.session.id, first)]
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from models import Registry, Session
+from scanner import attendance
+from utils import lifecycle, rollup
+from utils.events import bus, SESSION_CLOSED
+from conftest import add_session
+
+
+def test_close_overdue_checks_out_open_rows_once(db, lab):
+    past = add_session(db, lab, lab.session.date - timedelta(days=1))
+    for roll in ("R001", "R002", "R003"):
+        attendance.record_scan(db, past, roll, True)
+    out = attendance.record_scan(db, past, "R001", False)
+    attendance.record_scan(db, lab.session, "R001", True)      # still running: left alone
+    closed_events = []
+    bus.subscribe(SESSION_CLOSED, closed_events.append)
+    try:
+        assert lifecycle.close_overdue(db) == 1
+        first = (db.execute(select(Registry.id, Registry.check_out_time, Registry.checked_out_at)).all(),
+                 rollup.totals(db, lab.user.id))
+        assert lifecycle.close_overdue(db) == 0
+        assert (db.execute(select(Registry.id, Registry.check_out_time, Registry.checked_out_at)).all(),
+                rollup.totals(db, lab.user.id)) == first
+    finally:
+        bus.unsubscribe(SESSION_CLOSED, closed_events.append)
+
+    assert [(e.session_id, e.checked_out) for e in closed_events] == [(past.id, 2)]
+    active = dict(db.execute(select(Session.id, Session.is_active)).all())
+    assert active == {lab.session.id: True, past.id: False}
+
+    end_at = datetime.combine(past.date, past.end_time)
+    rows = db.execute(select(Registry.id, Registry.check_out_time, Registry.checked_out_at)
+                      .where(Registry.session_id == past.id)).all()
+    auto = [(r.check_out_time, r.checked_out_at) for r in rows if r.id != out.registry_id]
+    assert auto == [(past.end_time, end_at)] * 2
+    assert all(r.checked_out_at is not None for r in rows)
+    # the rollup's checked_out counter matches the registry
+    assert rollup.totals(db, lab.user.id, past.date, past.date) == (3, 0, 3)
+    assert rollup.totals(db, lab.user.id) == (4, 0, 3)
@@ -0,0 +1,39 @@
+from datetime import timedelta
+from sqlalchemy import update
+from models import Registry, Session
+from scanner import attendance
+from utils import lifecycle, read_model
+from conftest import add_session
+
+
+def test_refresh_picks_up_check_outs_after_the_watermark(db, lab):
+    attendance.record_scan(db, lab.session, "R001", True)
+    attendance.record_scan(db, lab.session, "R002", True)
+    changed_at = read_model.registry_change_mark(db)
+    # the check-ins happened well before the view loaded
+    db.execute(update(Registry).values(updated_at=changed_at - timedelta(hours=1)))
+    db.commit()
+    watermark = max(r.id for r in read_model.registry_rows(db, lab.user.id))
+    assert read_model.registry_rows(db, lab.user.id, since_id=watermark, changed_since=changed_at) == []
+
+    attendance.record_scan(db, lab.session, "R001", False)
+    changed = read_model.registry_rows(db, lab.user.id, since_id=watermark, changed_since=changed_at)
+    assert [(r.roll_no, r.check_out_time is not None) for r in changed] == [("R001", True)]
+
+    # auto check-out stamps the past session end, but still counts as a change
+    lifecycle.close_sessions(db, [lab.session.id])
+    changed = read_model.registry_rows(db, lab.user.id, since_id=watermark, changed_since=changed_at)
+    assert {r.roll_no: r.check_out_time for r in changed}["R002"] == lab.session.end_time
+
+
+def test_changed_sessions_lists_only_sessions_updated_after_the_watermark(db, lab):
+    yesterday = add_session(db, lab, lab.session.date - timedelta(days=1))
+    changed_at = read_model.session_change_mark(db)
+    db.execute(update(Session).values(updated_at=changed_at - timedelta(hours=1)))
+    db.commit()
+    assert read_model.changed_sessions(db, lab.user.id, changed_at) == {}
+
+    lifecycle.close_sessions(db, [yesterday.id])
+    changed = read_model.changed_sessions(db, lab.user.id, changed_at)
+    assert list(changed) == [yesterday.id]
+    assert read_model.session_rows_by_id(db, lab.user.id, changed)[yesterday.id].is_active is False
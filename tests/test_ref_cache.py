@@ -0,0 +1,17 @@
+from sqlalchemy.orm import sessionmaker
+import models
+from utils import ref_cache as ref_cache_module
+
+
+def test_lookup_miss_reloads_the_department(db, db_engine, lab, monkeypatch):
+    monkeypatch.setattr(ref_cache_module, "SessionLocal", sessionmaker(bind=db_engine))
+    cache = ref_cache_module.ReferenceCache()
+    assert [s.title for s in cache.subjects(lab.user.id).values()] == ["Networks"]
+
+    # added from another machine after the cache was loaded
+    added = models.Subject(title="Compilers", user_id=lab.user.id)
+    db.add(added)
+    db.commit()
+    assert cache.subject_by_title(lab.user.id, "Compilers").id == added.id
+    assert cache.subject(lab.user.id, added.id).title == "Compilers"
+    assert cache.faculty_by_name(lab.user.id, "Nobody") is None
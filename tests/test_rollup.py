@@ -0,0 +1,56 @@
+from datetime import timedelta
+from sqlalchemy import select
+from models import AttendanceRollup, Registry
+from scanner import attendance
+from utils import archive, rollup
+from conftest import add_session
+
+
+def _rollup_rows(db):
+    return sorted(db.execute(select(
+        AttendanceRollup.user_id, AttendanceRollup.subject_id, AttendanceRollup.faculty_id, AttendanceRollup.date,
+        AttendanceRollup.present, AttendanceRollup.late, AttendanceRollup.checked_out,
+    )).all())
+
+
+def _scan_two_days(db, lab):
+    yesterday = add_session(db, lab, lab.session.date - timedelta(days=1), is_active=False)
+    for roll in ("R001", "R002", "R003"):
+        attendance.record_scan(db, yesterday, roll, True)
+    attendance.record_scan(db, yesterday, "R001", False)
+    attendance.record_scan(db, lab.session, "R001", True)
+    attendance.record_scan(db, lab.session, "R002", False, late_reason="Bus")
+    attendance.record_scan(db, lab.session, "R002", False)
+    return yesterday
+
+
+def test_rebuild_matches_incremental_counts(db, lab, tmp_path):
+    _scan_two_days(db, lab)
+    incremental = _rollup_rows(db)
+    assert len(incremental) == 2
+
+    rollup.rebuild(db, archive_dir=str(tmp_path))
+    assert _rollup_rows(db) == incremental
+
+
+def test_late_and_checked_out_counters(db, lab):
+    attendance.record_scan(db, lab.session, "R001", True)
+    attendance.record_scan(db, lab.session, "R002", False, late_reason="Bus")
+    attendance.record_scan(db, lab.session, "R001", False)
+    attendance.record_scan(db, lab.session, "R001", False)     # second check-out only moves the time
+    attendance.record_scan(db, lab.session, "R003", False)     # no check-in: LATE, nothing written
+    assert rollup.totals(db, lab.user.id) == (2, 1, 1)
+    assert rollup.today_totals(db, lab.user.id) == (2, 1, 1)
+
+
+def test_rebuild_skips_archived_days(db, lab, tmp_path):
+    yesterday = _scan_two_days(db, lab)
+    before = _rollup_rows(db)
+    # archiving yesterday removes its registry rows; its counts must stay
+    archive.archive_registry(db, lab.session.date, lab.user.id, archive_dir=str(tmp_path))
+    assert db.execute(select(Registry.id).where(Registry.session_id == yesterday.id)).first() is None
+
+    rollup.rebuild(db, archive_dir=str(tmp_path))
+    assert _rollup_rows(db) == before
+    rollup.rebuild(db, user_id=lab.user.id, start_date=yesterday.date, archive_dir=str(tmp_path))
+    assert _rollup_rows(db) == before
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import create_engine, text
+from utils import sql_telemetry
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    sql_telemetry.install(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, roll_no TEXT)"))
+    return engine
+
+
+def test_query_budget_passes_within_budget(engine):
+    with engine.connect() as conn, sql_telemetry.query_budget(2) as stats:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    assert stats.count == 2
+
+
+def test_query_budget_raises_with_statement_counts(engine):
+    with pytest.raises(sql_telemetry.QueryBudgetExceeded) as excinfo:
+        with engine.connect() as conn, sql_telemetry.query_budget(1, name="lookup"):
+            for sid in range(3):
+                conn.execute(text("SELECT name FROM students WHERE id = :id"), {"id": sid})
+    assert "lookup: 3 statements executed, budget was 1" in str(excinfo.value)
+    assert "3x SELECT name FROM students" in str(excinfo.value)
+
+
+def test_install_is_idempotent(engine):
+    sql_telemetry.install(engine)
+    with engine.connect() as conn, sql_telemetry.capture() as stats:
+        conn.execute(text("SELECT 1"))
+    assert stats.count == 1
+
+
+def test_failed_statement_does_not_skew_timing(engine):
+    with engine.connect() as conn, sql_telemetry.capture() as stats:
+        with pytest.raises(Exception):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert not any(k for k in conn.info if "start" in k)
+    assert stats.count == 1
+
+
+def test_slow_query_log_omits_parameter_values(engine, monkeypatch):
+    lines = []
+
+    class _Log:
+        def info(self, msg):
+            lines.append(msg)
+
+    monkeypatch.setattr(sql_telemetry, "SLOW_QUERY_SECONDS", 0.0)
+    monkeypatch.setattr(sql_telemetry, "_slow_log", lambda: _Log())
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO students (name, roll_no) VALUES (:name, :roll)"),
+                     {"name": "Asha Rao", "roll": "CS-042"})
+        conn.execute(text("INSERT INTO students (name, roll_no) VALUES (:name, :roll)"),
+                     [{"name": "Ravi", "roll": "CS-043"}, {"name": "Meera", "roll": "CS-044"}])
+    logged = "\n".join(lines)
+    for value in ("Asha Rao", "CS-042", "Ravi", "CS-044"):
+        assert value not in logged
+    assert "2 params" in logged
+    assert "2 rows x 2 params" in logged